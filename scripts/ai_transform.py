@@ -6,6 +6,9 @@ Step 2 of the CSV conversion pipeline.
 
 Reads  : scripts/intermediate.csv    (output of preprocess.py)
 Writes : scripts/output_import.csv   (ready to import into b2b.chip.am)
+         scripts/output_delta.json   (added / changed / removed since the last run)
+         scripts/output_import.ndjson.gz (same catalog for portal_upload.py)
+         scripts/price_debug.csv + price_audit.sqlite (price breakdowns, see price_audit.py)
 
 Uses Gemini API to normalise product names, clean SKUs and assign categories.
 Fetches live USD→AMD exchange rate from Central Bank of Armenia.
@@ -13,6 +16,13 @@ Fetches live USD→AMD exchange rate from Central Bank of Armenia.
 Run from repo root:
     python scripts/ai_transform.py           # full run
     python scripts/ai_transform.py --test    # first 10 rows only
+    python scripts/ai_transform.py --gemini-backend synthetic --cb-rate 390   # offline
+    python scripts/ai_transform.py --profile --metrics-out metrics.json       # per-stage timings
+    python scripts/ai_transform.py --tiered    # cheap model first, escalate doubtful items
+    python scripts/ai_transform.py --max-calls 200 --deadline 45m   # budget mode (budget.py)
+    python scripts/ai_transform.py --similar   # reuse near-duplicate cached products (similarity.py)
+    python scripts/ai_transform.py --plan      # estimate calls, tokens, cost and time; no API calls
+    python scripts/ai_transform.py --no-debug-csv   # production: price breakdowns in the audit store only
 """
 
 import csv
@@ -22,6 +32,8 @@ import pathlib
 import re
 import sys
 import time
+from datetime import date, datetime, timedelta
+from itertools import chain
 import argparse
 import xml.etree.ElementTree as ET
 import requests
@@ -29,18 +41,33 @@ import os
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
 from config import (
-    GEMINI_API_KEY, GEMINI_MODEL, AI_BATCH_SIZE,
-    CB_RATE_URL,
+    AI_BATCH_SIZE, GEMINI_BACKEND, GEMINI_PROMPT_CACHE, GEMINI_NAME_MAX_CHARS, GEMINI_STREAM,
+    GEMINI_MODEL, GEMINI_TIERED, GEMINI_TIERS, GEMINI_ESCALATE_CONFIDENCE, GEMINI_ESCALATE_FLAGS,
+    GEMINI_RETRY_BATCH_SIZE, GEMINI_RETRY_BACKOFF_S, GEMINI_RETRY_BACKOFF_MAX_S, GEMINI_FAILED_CSV,
+    SIMILARITY_REUSE, SIMILARITY_THRESHOLD, PRODUCT_CACHE_INDEX, GEMINI_PLAN,
+    PRODUCT_CACHE_ARCHIVE_CSV,
+    CB_RATE_URL, CB_RATE_OVERRIDE,
     INTL_VAT_RATE, INTL_BTF_RATE, INTL_CBF_RATE,
     INTL_REGIONS, INTL_PRODUCT_SPECS,
     CATEGORY_TO_PRODUCT_TYPE,
     LOCAL_USD_MARGIN, LOCAL_AMD_MARGIN,
     INTERMEDIATE_CSV, OUTPUT_CSV, PRICE_DEBUG_CSV, PRODUCT_CACHE_CSV, CATEGORIES,
     SUPPLIERS_CSV, DELIVERY_TIMES_CSV,
+    CATALOG_MANIFEST, OUTPUT_DELTA_JSON, OUTPUT_NDJSON_GZ, OUTPUT_ALTERNATIVES_CSV,
+    CATALOG_MANIFEST_PENDING, OUTPUT_DUPLICATES_CSV,
+    CONSOLIDATE_OFFERS, CONSOLIDATION_POLICY, AI_PENDING_CSV,
 )
-
-from google import genai
-from google.genai import types as genai_types
+from catalog_delta import product_id, export_delta
+from portal_upload import write_ndjson_gz
+from consolidate import PricedRows, apply_consolidation, apply_dedupe
+from preprocess import IntermediateRow
+from records import record_type, read_records
+import budget as ai_budget
+from similarity import SimilarityIndex
+import gemini_backend
+from json_stream import JsonArrayStream, JsonStreamError
+from metrics import Metrics, add_metrics_args, finish_metrics
+import price_audit
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Exchange rate
@@ -294,11 +321,20 @@ def calculate_price_amd(price_raw: str, currency: str, supplier_type: str,
 # Product name cache
 # ─────────────────────────────────────────────────────────────────────────────
 
+# first_seen / last_seen: dates of the first and the latest run that looked the
+# product up; hits: cache hits so far (compact_cache.py archives stale entries);
+# updated: when the normalisation was made (cache_snapshot.py merges by it)
+CACHE_FIELDS = ["name_raw", "name", "sku", "category", "brand", "status",
+                "first_seen", "last_seen", "hits", "updated"]
+CacheEntry   = record_type("CacheEntry", CACHE_FIELDS)
+
+
 def load_product_cache(path: str) -> dict:
     """Load product_cache.csv → dict keyed by model_raw.strip().lower().
 
     Returns an empty dict if the file doesn't exist yet.
-    Only the AI-normalised text fields are cached (name, sku, category, brand).
+    Only the AI-normalised text fields are cached (name, sku, category, brand),
+    plus the raw name they were made from (for similarity.py).
     Volatile fields (price, eta, moq) are always re-calculated from live data.
     """
     cache = {}
@@ -309,36 +345,146 @@ def load_product_cache(path: str) -> dict:
         for row in csv.DictReader(f):
             key = row.get("model_raw", "").strip().lower()
             if key:
-                cache[key] = {
-                    "name":     row.get("name", ""),
-                    "sku":      row.get("sku", ""),
-                    "category": row.get("category", ""),
-                    "brand":    row.get("brand", ""),
-                    "status":   row.get("status", ""),
-                }
+                cache[key] = CacheEntry({f: row.get(f, "") for f in CACHE_FIELDS})
     return cache
 
 
+def new_cache_entry(fields: dict) -> CacheEntry:
+    """Cache entry for a fresh normalisation (status NEW, seen today, no hits yet)."""
+    today = date.today().isoformat()
+    return CacheEntry({**fields, "status": "NEW", "first_seen": today, "last_seen": today,
+                       "hits": "0", "updated": datetime.now().isoformat(timespec="seconds")})
+
+
+def mark_seen(product_cache: dict, seen: dict, today: str | None = None) -> int:
+    """Stamp last_seen and add this run's hits ({key: n}) to the entries → entries touched."""
+    today   = today or date.today().isoformat()
+    touched = 0
+    for key, n in seen.items():
+        entry = product_cache.get(key)
+        if entry is None:
+            continue
+        entry["first_seen"] = entry.get("first_seen") or today
+        entry["last_seen"]  = today
+        entry["hits"]       = str(int(entry.get("hits") or 0) + n)
+        touched += 1
+    return touched
+
+
+def archived_entry(key: str, stats: dict) -> CacheEntry | None:
+    """Entry of key in the cold archive (PRODUCT_CACHE_ARCHIVE_CSV), or None.
+
+    The archive is only read once a run has a product the hot cache doesn't
+    know — runs without misses never load it.
+    """
+    if stats["archive"] is None:
+        stats["archive"] = load_product_cache(PRODUCT_CACHE_ARCHIVE_CSV)
+    return stats["archive"].get(key)
+
+
 def save_product_cache(path: str, cache: dict) -> None:
     """Write the full product cache back to disk (sorted by key for stable diffs)."""
     with open(path, "w", newline="", encoding="utf-8-sig") as f:
         writer = csv.DictWriter(
-            f, fieldnames=["model_raw", "name", "sku", "category", "brand", "status"]
+            f, fieldnames=["model_raw", *CACHE_FIELDS]
         )
         writer.writeheader()
         for model_raw, ai in sorted(cache.items()):
             writer.writerow({"model_raw": model_raw, **ai})
 
 
+# ── Negative cache (failed Gemini results) ───────────────────────────────────
+
+FAILED_HEADERS = ["model_raw", "brand", "model", "name_raw", "category_raw",
+                  "attempts", "first_failed", "last_failed", "next_retry", "error"]
+
+
+def load_failed_cache(path: str) -> dict:
+    """Load gemini_failed.csv → dict keyed like the product cache ({} if missing)."""
+    p = pathlib.Path(path)
+    if not p.exists():
+        return {}
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return {r["model_raw"]: {**r, "attempts": int(r.get("attempts") or 1)}
+                for r in csv.DictReader(f) if r.get("model_raw")}
+
+
+def save_failed_cache(path: str, failed: dict) -> None:
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=FAILED_HEADERS)
+        writer.writeheader()
+        for key, entry in sorted(failed.items()):
+            writer.writerow({**entry, "model_raw": key})
+
+
+def record_failure(failed: dict, key: str, item: dict, error: str) -> None:
+    """Count one more failed attempt for key and schedule the next retry."""
+    now     = datetime.now()
+    entry   = failed.get(key) or {"attempts": 0, "first_failed": now.isoformat(timespec="seconds")}
+    attempts = entry["attempts"] + 1
+    backoff  = min(GEMINI_RETRY_BACKOFF_S * 2 ** (attempts - 1), GEMINI_RETRY_BACKOFF_MAX_S)
+    failed[key] = {
+        **entry,
+        "brand":        item.get("brand", ""),
+        "model":        item.get("model", ""),
+        "name_raw":     item.get("name_raw", ""),
+        "category_raw": item.get("category_raw", ""),
+        "attempts":     attempts,
+        "last_failed":  now.isoformat(timespec="seconds"),
+        "next_retry":   (now + timedelta(seconds=backoff)).isoformat(timespec="seconds"),
+        "error":        error,
+    }
+
+
+def retry_due(entry: dict, now: datetime | None = None) -> bool:
+    return (now or datetime.now()).isoformat(timespec="seconds") >= entry.get("next_retry", "")
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Gemini API
 # ─────────────────────────────────────────────────────────────────────────────
 
-_client = genai.Client(api_key=GEMINI_API_KEY)
+_backends = {}   # model → backend, created on first call (see gemini_backend.py)
+_gemini   = {"mode": GEMINI_BACKEND, "prompt_cache": GEMINI_PROMPT_CACHE, "tiered": GEMINI_TIERED}
+
+
+def set_gemini_backend(mode: str, prompt_cache: bool = GEMINI_PROMPT_CACHE,
+                       tiered: bool = GEMINI_TIERED) -> None:
+    """Select the backend for call_gemini(): live / record / replay / synthetic.
+
+    With tiered, uncached rows are routed through GEMINI_TIERS (call_gemini_tiered).
+    """
+    close_gemini_backend()
+    _gemini.update(mode=mode, prompt_cache=prompt_cache, tiered=tiered)
+    get_gemini_backend()     # fail now (missing key / recordings), not mid-run
+    if mode != "live":
+        print(f"Gemini backend: {mode}")
+    if tiered:
+        print("Gemini tiers: " + " → ".join(f"{t['name']} ({t['model']})" for t in GEMINI_TIERS))
+
+
+def close_gemini_backend() -> None:
+    """Release per-run backend resources (the cached system prompts)."""
+    for backend in _backends.values():
+        if hasattr(backend, "close"):
+            backend.close()
+    _backends.clear()
+
+
+def get_gemini_backend(model: str = GEMINI_MODEL):
+    backend = _backends.get(model)
+    if backend is None:
+        tier = next((t for t in GEMINI_TIERS if t["model"] == model), {})
+        backend = _backends[model] = gemini_backend.make_backend(
+            _gemini["mode"], _gemini["prompt_cache"], model, tier.get("synthetic"))
+    return backend
 
 SYSTEM_PROMPT = f"""You are a product data normaliser for an IT products B2B portal.
-You will receive a JSON array of raw product records and must return a JSON array
-(same length, same order) where each object has exactly these four fields:
+You will receive a JSON array of raw product records with these short keys
+(a missing key means the value is empty):
+  "b" = brand, "m" = model / part number, "n" = raw product name, "c" = raw category
+and must return a JSON array (same length, same order) where each object has
+exactly these four fields:
   "name", "sku", "category", "brand"
 
 ══════════════════════════════════════════════════
@@ -411,13 +557,13 @@ SKU FORMAT
   (e.g. MZ-77E250B/EU stays MZ-77E250B/EU, KVR32N22S8/8 stays KVR32N22S8/8)
 • Do NOT strip region suffixes (/EU, /AP, /RU, /WW, /EE, etc.) or any other suffix
 • Remove colour suffixes only if colour is NOT the product differentiator
-• If the input model field already looks like a valid part number, prefer it over guessing
+• If the input model ("m") already looks like a valid part number, prefer it over guessing
 
 ══════════════════════════════════════════════════
 BRAND FORMAT
 ══════════════════════════════════════════════════
 • Return the canonical manufacturer brand name (e.g. "Kingston", "Samsung", "HP")
-• Use the input "brand" field if it already looks like a valid brand name
+• Use the input brand ("b") if it already looks like a valid brand name
 • If the input brand is clearly wrong (e.g. a memory size like "16GB", a number, or a
   spec value), infer the correct brand from the model number or product name instead
 • Common model-number brand prefixes to recognise:
@@ -509,37 +655,286 @@ Return ONLY the JSON array. No markdown fences, no explanation, no extra text.
 Fallbacks if truly uncertain: empty string for name, sku, and category.
 """
 
+# Tiered mode (GEMINI_TIERS): every tier also rates its own answer, so the
+# cheap tier's doubtful items can be re-sent to a stronger model.
+TIERED_SYSTEM_PROMPT = SYSTEM_PROMPT + """
+══════════════════════════════════════════════════
+CONFIDENCE
+══════════════════════════════════════════════════
+In addition to the four fields, give every object:
+  "confidence": number from 0 to 1 — how sure you are that name, sku, category
+                and brand are all correct
+  "flags":      array (usually empty) of those that apply:
+                "brand_guessed"   — brand inferred, not stated in the input
+                "sku_guessed"     — part number inferred, not stated in the input
+                "category_unsure" — no category clearly fits
+                "unclear_input"   — input too short, garbled, or several products in one
+Be honest: low-confidence items are re-checked by a stronger model.
+"""
+
+_RESULT_FIELDS = ("name", "sku", "category", "brand")
+
+
+# Short payload keys (explained once in SYSTEM_PROMPT) instead of repeating
+# "brand"/"model"/"name_raw"/"category_raw" for every item of every batch.
+_PAYLOAD_KEYS = {"brand": "b", "model": "m", "name_raw": "n", "category_raw": "c"}
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _trim_name(name: str, max_chars: int = GEMINI_NAME_MAX_CHARS) -> str:
+    """Collapse whitespace and cut a raw name at a word boundary."""
+    name = _WHITESPACE_RE.sub(" ", name).strip()
+    if len(name) <= max_chars:
+        return name
+    cut = name[:max_chars]
+    return cut.rsplit(" ", 1)[0] if " " in cut else cut
+
+
+def encode_payload(batch: list[dict]) -> str:
+    """Compact JSON for one Gemini batch: short keys, empty fields omitted, no whitespace."""
+    items = []
+    for r in batch:
+        item = {}
+        for key, short in _PAYLOAD_KEYS.items():
+            value = r.get(key, "")
+            if key == "name_raw":
+                value = _trim_name(value)
+            if value:
+                item[short] = value
+        items.append(item)
+    return json.dumps(items, ensure_ascii=False, separators=(",", ":"))
+
+
+def _count_usage(metrics: Metrics, usage: dict, tier: dict | None) -> None:
+    for key, n in usage.items():
+        if key == "prompt_cache":
+            metrics.count("gemini_prompt_cache", n)
+        else:
+            metrics.count("gemini_tokens", key, n)
+            if tier:
+                metrics.count("gemini_tier_tokens", f"{tier['name']}.{key}", n)
+
 
-def call_gemini(batch: list[dict]) -> list[dict]:
-    """Send one batch to Gemini and return parsed JSON list."""
-    payload = json.dumps(batch, ensure_ascii=False)
+def call_gemini(batch: list[dict], metrics: Metrics | None = None,
+                tier: dict | None = None) -> list[dict]:
+    """Send one batch to Gemini and return parsed JSON list.
 
+    batch items use the full keys (brand / model / name_raw / category_raw);
+    they are sent in the compact encoding of encode_payload().
+    With metrics, records per-attempt latency, retries, fallbacks and token usage.
+    With a tier (one of GEMINI_TIERS), uses its model and TIERED_SYSTEM_PROMPT,
+    so results also carry "confidence" and "flags".
+    """
+    payload = encode_payload(batch)
+    backend = get_gemini_backend(tier["model"] if tier else GEMINI_MODEL)
+    prompt  = TIERED_SYSTEM_PROMPT if tier else SYSTEM_PROMPT
+    metrics = metrics or Metrics("call_gemini")
+
+    error = ""
     for attempt in range(3):
+        if attempt:
+            metrics.count("gemini", "retries")
+        metrics.count("gemini", "calls")
+        started = time.perf_counter()
         try:
-            response = _client.models.generate_content(
-                model=GEMINI_MODEL,
-                contents=payload,
-                config=genai_types.GenerateContentConfig(
-                    system_instruction=SYSTEM_PROMPT,
-                    temperature=0.1,
-                    response_mime_type="application/json",
-                ),
-            )
-            text = response.text.strip()
-            # Strip markdown code fences if present
-            text = re.sub(r"^```(?:json)?\s*", "", text)
-            text = re.sub(r"\s*```$", "", text)
-            result = json.loads(text)
+            try:
+                text, usage = backend.generate(payload, prompt)
+            finally:
+                metrics.observe("gemini_latency", time.perf_counter() - started)
+            _count_usage(metrics, usage, tier)
+            result = parse_answer(text)
             if isinstance(result, list) and len(result) == len(batch):
                 return result
             print(f"  ⚠  Gemini returned {len(result)} items for {len(batch)} — retrying")
+            metrics.count("gemini_errors", "length_mismatch")
+            error = "length_mismatch"
+        except gemini_backend.ReplayMissError as e:
+            print(f"  ⚠  Gemini replay: {e} — using raw values")
+            metrics.count("gemini_errors", "replay_miss")
+            error = "replay_miss"
+            break
         except Exception as e:
+            metrics.count("gemini_errors", type(e).__name__)
             print(f"  ⚠  Gemini error (attempt {attempt+1}/3): {e}")
+            error = type(e).__name__
+            time.sleep(2 ** attempt)
+
+    # Fallback: raw values so we don't lose the row (marked failed — never cached)
+    metrics.count("gemini", "fallback_batches")
+    metrics.count("gemini", "fallback_rows", len(batch))
+    return [fallback_result(r, error or "failed") for r in batch]
+
+
+def parse_answer(text: str):
+    """JSON value of a Gemini answer (markdown code fences stripped); raises ValueError."""
+    text = text.strip()
+    text = re.sub(r"^```(?:json)?\s*", "", text)
+    text = re.sub(r"\s*```$", "", text)
+    return json.loads(text)
+
+
+def fallback_result(r: dict, error: str | None = None) -> dict:
+    """Raw values for an item Gemini didn't answer.
+
+    With error, the result is marked "failed" (see store_result).
+    """
+    result = {"name": r.get("name_raw", ""), "sku": r.get("model", ""), "category": "", "brand": r.get("brand", "")}
+    if error:
+        result["failed"] = error
+    return result
+
+
+def call_gemini_stream(batch: list[dict], metrics: Metrics | None = None,
+                       tier: dict | None = None):
+    """Streaming variant of call_gemini(): yields (index in batch, result) per item.
+
+    Each item is yielded as soon as its JSON object is complete.  If a response
+    breaks off (truncated, malformed, dropped connection, too few items), the
+    completed items are kept and only the remaining ones are retried.  Extra
+    items beyond the batch length are ignored.  Rows still missing after three
+    attempts get raw-value fallbacks.
+    """
+    backend = get_gemini_backend(tier["model"] if tier else GEMINI_MODEL)
+    prompt  = TIERED_SYSTEM_PROMPT if tier else SYSTEM_PROMPT
+    metrics = metrics or Metrics("call_gemini")
+    done    = 0   # leading items of batch already yielded
+    error   = ""
+
+    for attempt in range(3):
+        if done == len(batch):
+            return
+        remaining = batch[done:]
+        if attempt:
+            metrics.count("gemini", "retries")
+        metrics.count("gemini", "calls")
+        parser  = JsonArrayStream()
+        got     = 0
+        extra   = 0
+        started = time.perf_counter()
+        try:
+            try:
+                for chunk, usage in backend.stream(encode_payload(remaining), prompt):
+                    _count_usage(metrics, usage or {}, tier)
+                    try:
+                        items, invalid = parser.feed(chunk), None
+                    except JsonStreamError as e:
+                        # Keep what the chunk completed before the bad character
+                        items, invalid = e.completed, e
+                    for item in items:
+                        if got == len(remaining):
+                            extra += 1
+                            continue
+                        if not isinstance(item, dict):
+                            raise ValueError(f"expected an object, got {type(item).__name__}")
+                        if got == 0:
+                            metrics.observe("gemini_first_item", time.perf_counter() - started)
+                        yield done + got, item
+                        got += 1
+                    if invalid:
+                        raise invalid
+            finally:
+                metrics.observe("gemini_latency", time.perf_counter() - started)
+                done += got
+            if got < len(remaining):
+                print(f"  ⚠  Gemini stream ended after {got}/{len(remaining)} items — "
+                      f"retrying the rest")
+                metrics.count("gemini_errors", "truncated")
+                error = "truncated"
+                continue
+            if extra:
+                print(f"  ⚠  Gemini returned {extra} extra item(s) — ignored")
+                metrics.count("gemini_errors", "length_mismatch")
+            return
+        except gemini_backend.ReplayMissError as e:
+            print(f"  ⚠  Gemini replay: {e} — using raw values")
+            metrics.count("gemini_errors", "replay_miss")
+            error = "replay_miss"
+            break
+        except Exception as e:
+            metrics.count("gemini_errors", type(e).__name__)
+            print(f"  ⚠  Gemini error (attempt {attempt+1}/3, {done}/{len(batch)} items kept): {e}")
+            error = type(e).__name__
             time.sleep(2 ** attempt)
 
-    # Fallback: return empty dicts so we don't lose the row
-    return [{"name": r.get("name_raw", ""), "sku": r.get("model", ""), "category": "", "brand": r.get("brand", "")}
-            for r in batch]
+    if done < len(batch):
+        metrics.count("gemini", "fallback_batches")
+        metrics.count("gemini", "fallback_rows", len(batch) - done)
+    for i in range(done, len(batch)):
+        yield i, fallback_result(batch[i], error or "failed")
+
+
+# ── Tiered routing (--tiered) ────────────────────────────────────────────────
+
+def escalation_reasons(result: dict, record: dict) -> list[str]:
+    """Why a tier's answer should go to the next tier ([] = accept it).
+
+    Fallback results carry no confidence, so they are always escalated.
+    """
+    reasons = []
+    name = result.get("name")
+    if not isinstance(name, str) or not name.strip() or len(name) > 150:
+        reasons.append("invalid_name")
+    if result.get("category") not in CATEGORIES:
+        reasons.append("category")
+    if record.get("model") and not str(result.get("sku") or "").strip():
+        reasons.append("missing_sku")
+    confidence = result.get("confidence")
+    if not isinstance(confidence, (int, float)) or confidence < GEMINI_ESCALATE_CONFIDENCE:
+        reasons.append("low_confidence")
+    flags = result.get("flags")
+    if isinstance(flags, list):
+        reasons += [f"flag:{f}" for f in flags if f in GEMINI_ESCALATE_FLAGS]
+    return reasons
+
+
+def _route_tiers(batch: list[dict], metrics: Metrics, call):
+    """Send batch through GEMINI_TIERS; yields (index in batch, result) per item.
+
+    call(sub_batch, metrics, tier) yields (index in sub_batch, result).  Each
+    tier only sees the items the previous tier's answers failed
+    escalation_reasons() for; the last tier's answers are accepted as they are.
+    """
+    pending = list(range(len(batch)))
+    for n, tier in enumerate(GEMINI_TIERS):
+        last = n == len(GEMINI_TIERS) - 1
+        metrics.count("gemini_tier_items", tier["name"], len(pending))
+        escalate = []
+        for j, result in call([batch[i] for i in pending], metrics, tier):
+            i = pending[j]
+            reasons = [] if last else escalation_reasons(result, batch[i])
+            if reasons:
+                escalate.append(i)
+                for reason in reasons:
+                    metrics.count("gemini_escalation_reasons", reason)
+            else:
+                out = {k: result.get(k, "") for k in _RESULT_FIELDS}
+                if result.get("failed"):
+                    out["failed"] = result["failed"]
+                yield i, out
+        if not last:
+            metrics.count("gemini_tier_escalated", tier["name"], len(escalate))
+        pending = escalate
+        if not pending:
+            return
+
+
+def call_gemini_tiered(batch: list[dict], metrics: Metrics | None = None) -> list[dict]:
+    """call_gemini() through GEMINI_TIERS: cheap tier first, doubtful items escalated."""
+    metrics = metrics or Metrics("call_gemini")
+    results = [None] * len(batch)
+    for i, result in _route_tiers(batch, metrics,
+                                  lambda sub, m, tier: enumerate(call_gemini(sub, m, tier))):
+        results[i] = result
+    return results
+
+
+def call_gemini_tiered_stream(batch: list[dict], metrics: Metrics | None = None):
+    """call_gemini_stream() through GEMINI_TIERS.
+
+    Accepted cheap-tier items are yielded as they stream in; escalated ones
+    follow once the next tier has answered them.
+    """
+    yield from _route_tiers(batch, metrics or Metrics("call_gemini"), call_gemini_stream)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -550,6 +945,7 @@ OUTPUT_HEADERS = [
     "id", "name", "sku", "price", "stock", "eta", "description",
     "availableQuantity", "moq", "brand", "category", "visibleCustomerTypes",
 ]
+OutputRow = record_type("OutputRow", OUTPUT_HEADERS, interned=False)
 
 # Matches capacity-like strings that suppliers sometimes put in the Brand column
 # e.g. "16GB", "32GB", "512MB", "1TB" — clearly not a brand name.
@@ -741,10 +1137,17 @@ def build_output_row(inter: dict, ai: dict, price_amd: int,
     # International suppliers don't hold stock locally — always "on_order".
     stock = "on_order" if supplier_type == "international" else inter["stock"]
 
-    return {
-        "id":                   "",
-        "name":                 (ai.get("name") or inter["name_raw"]).strip(),
-        "sku":                  _normalize_sku(ai.get("sku") or inter["model"], inter.get("brand_raw", "")),
+    name = (ai.get("name") or inter["name_raw"]).strip()
+    sku  = _normalize_sku(ai.get("sku") or inter["model"], inter.get("brand_raw", ""))
+
+    return OutputRow({
+        # Deterministic per (supplier, raw model) — the product cache key — so portal
+        # IDs survive re-imports.  Never keyed on Gemini's SKU: a fallback row or a
+        # re-normalised cache entry would re-key the product and break cart references.
+        "id":                   product_id(inter.get("supplier", ""), inter["model"],
+                                           inter["name_raw"]),
+        "name":                 name,
+        "sku":                  sku,
         "price":                price_amd,
         "stock":                stock,
         "eta":                  eta,
@@ -757,7 +1160,7 @@ def build_output_row(inter: dict, ai: dict, price_amd: int,
         "brand":                (ai.get("brand") or brand).strip(),
         "category":             ai.get("category") or "",
         "visibleCustomerTypes": inter["visibleCustomerTypes"],
-    }
+    })
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -770,6 +1173,7 @@ DEBUG_HEADERS = [
     "price_usd", "weight_kg", "freight_usd", "duty_usd", "broker_fee_usd",
     "dp_usd", "margin_pct", "price_amd", "eta",
 ]
+DebugRow = record_type("DebugRow", DEBUG_HEADERS, interned=False)
 
 
 def build_price_debug_row(inter: dict, ai: dict, price_amd: int,
@@ -848,22 +1252,797 @@ def build_price_debug_row(inter: dict, ai: dict, price_amd: int,
             "margin_pct":     margin_pct,
         })
 
-    return base
+    return DebugRow(base)
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Main
 # ─────────────────────────────────────────────────────────────────────────────
 
+def load_run_context(cb_rate: float | None = None) -> dict:
+    """Load everything pricing needs that doesn't change during a run.
+
+    cb_rate (or CB_RATE_OVERRIDE) replaces the live Central Bank rate.
+    """
+    # Live exchange rate
+    cb_rate = cb_rate or CB_RATE_OVERRIDE
+    if cb_rate:
+        print(f"Fixed rate: 1 USD = {cb_rate} AMD")
+    else:
+        cb_rate = fetch_cb_rate()
+
+    # Supplier type and region maps (loaded from suppliers.csv)
+    supplier_types, supplier_regions = load_suppliers(SUPPLIERS_CSV)
+    delivery_times = load_delivery_times(DELIVERY_TIMES_CSV)
+
+    return {
+        "cb_rate":          cb_rate,
+        "supplier_types":   supplier_types,
+        "supplier_regions": supplier_regions,
+        "delivery_times":   delivery_times,
+    }
+
+
+def new_run_stats(metrics: Metrics | None = None, failed: dict | None = None,
+                  similar: SimilarityIndex | None = None) -> dict:
+    """Per-run counters; failed is the negative cache (load_failed_cache),
+    similar the near-duplicate index (load_similarity_index) or None.
+    seen counts cache hits per key (see mark_seen); archive is loaded on
+    demand (see archived_entry)."""
+    return {"cache_hits": 0, "cache_misses": 0, "cache_updated": False, "duplicates": 0,
+            "deferred": 0, "deferred_rows": 0,
+            "failed": failed if failed is not None else {}, "failed_updated": False,
+            "similar": similar, "similar_hits": 0,
+            "seen": {}, "archive": None,
+            "metrics": metrics or Metrics("ai_transform")}
+
+
+def load_similarity_index(product_cache: dict,
+                          threshold: float = SIMILARITY_THRESHOLD) -> SimilarityIndex:
+    """Near-duplicate index over product_cache, reusing saved band hashes."""
+    index  = SimilarityIndex(product_cache, PRODUCT_CACHE_INDEX, threshold)
+    hashed = index.build()
+    print(f"Similarity index: {len(product_cache)} products ({hashed} newly hashed), "
+          f"reuse at ≥ {threshold}")
+    return index
+
+
+def _reuse_similar(r: dict, key: str, product_cache: dict, stats: dict) -> dict | None:
+    """Name / category / brand of the closest cached product, if it is close enough.
+
+    The row keeps its own model as SKU.  The result is cached under the row's
+    key like a Gemini result (status NEW).
+    """
+    index   = stats["similar"]
+    metrics = stats["metrics"]
+    match, score = index.lookup(r["brand_raw"], r["model"], r["name_raw"])
+    metrics.count("similarity", "lookups")
+    if match is None:
+        return None
+    src = product_cache[match]
+    ai  = {"name":     src["name"],
+           "sku":      _normalize_sku(r["model"] or src["sku"], r["brand_raw"]),
+           "category": src["category"],
+           "brand":    src["brand"]}
+    stats["similar_hits"] += 1
+    metrics.count("similarity", "reused")
+    if key:
+        product_cache[key] = new_cache_entry({**ai, "name_raw": r["name_raw"]})
+        stats["cache_updated"] = True
+        index.add(key, product_cache[key])
+        if stats["failed"].pop(key, None):
+            stats["failed_updated"] = True
+    return ai
+
+
+def _restore_archived(key: str, product_cache: dict, stats: dict) -> CacheEntry | None:
+    """Move key's archived entry back into the hot cache (the archive file keeps
+    its copy until the next compact_cache.py run, where the hot one wins)."""
+    entry = archived_entry(key, stats)
+    if entry is None:
+        return None
+    product_cache[key] = entry
+    stats["cache_updated"] = True
+    stats["metrics"].count("cache_archive", "restored")
+    if stats["similar"] is not None:
+        stats["similar"].add(key, entry)
+    return entry
+
+
+def _split_cached(batch_rows: list[dict], product_cache: dict,
+                  stats: dict) -> tuple[list, list[int], list[dict]]:
+    """→ (ai_results with cache hits filled in, uncached row indices, Gemini payload).
+
+    Products found in the cache archive are restored.  With --similar,
+    near-duplicates of cached products reuse their normalisation.  Rows in
+    the negative cache whose retry isn't due yet get raw-value fallbacks
+    without a Gemini call.
+    """
+    ai_results       = [None] * len(batch_rows)
+    uncached_indices = []
+    uncached_payload = []
+    failed           = stats["failed"]
+    similar          = stats["similar"]
+    seen             = stats["seen"]
+    now              = datetime.now()
+
+    for i, r in enumerate(batch_rows):
+        key = r["model"].strip().lower()
+        if key:
+            entry = product_cache.get(key)
+            if entry is None:
+                entry = _restore_archived(key, product_cache, stats)
+            if entry is not None:
+                ai_results[i] = entry
+                stats["cache_hits"] += 1
+                seen[key] = seen.get(key, 0) + 1
+                continue
+        if similar is not None:
+            ai = _reuse_similar(r, key, product_cache, stats)
+            if ai is not None:
+                ai_results[i] = ai
+                continue
+        item = {
+            "brand":        r["brand_raw"],
+            "model":        r["model"],
+            "name_raw":     r["name_raw"],
+            "category_raw": r["category_raw"],
+        }
+        if key in failed and not retry_due(failed[key], now):
+            fallback = fallback_result(item)
+            ai_results[i] = {**fallback, "sku": _normalize_sku(fallback["sku"], r["brand_raw"])}
+            stats["metrics"].count("gemini_retry_queue", "backing_off")
+        else:
+            uncached_indices.append(i)
+            uncached_payload.append(item)
+    return ai_results, uncached_indices, uncached_payload
+
+
+def _retry_positions(keys: list, stats: dict) -> tuple[list[int], list[int]]:
+    """Split positions of keys into (fresh, due retries from the negative cache)."""
+    failed = stats["failed"]
+    fresh, retry = [], []
+    for n, key in enumerate(keys):
+        (retry if key in failed else fresh).append(n)
+    return fresh, retry
+
+
+def _call_retries(items: list[dict], positions: list[int], stats: dict):
+    """Re-send earlier failures in GEMINI_RETRY_BATCH_SIZE batches; yields (position, result)."""
+    metrics = stats["metrics"]
+    call    = call_gemini_tiered if _gemini["tiered"] else call_gemini
+    for start in range(0, len(positions), GEMINI_RETRY_BATCH_SIZE):
+        chunk = positions[start:start + GEMINI_RETRY_BATCH_SIZE]
+        metrics.count("gemini_retry_queue", "retried", len(chunk))
+        yield from zip(chunk, call([items[n] for n in chunk], metrics))
+
+
+def call_for_uncached(items: list[dict], keys: list, stats: dict) -> list[dict]:
+    """Gemini results for uncached items (aligned with items).
+
+    Fresh items go out in one call; items that failed on an earlier run (keys
+    in the negative cache) go in small dedicated batches, so re-sending them
+    doesn't repeat a whole batch.
+    """
+    call    = call_gemini_tiered if _gemini["tiered"] else call_gemini
+    results = [None] * len(items)
+    fresh, retry = _retry_positions(keys, stats)
+    if fresh:
+        for n, result in zip(fresh, call([items[n] for n in fresh], stats["metrics"])):
+            results[n] = result
+    for n, result in _call_retries(items, retry, stats):
+        results[n] = result
+    return results
+
+
+def store_result(inter: dict, result: dict, product_cache: dict, stats: dict) -> dict:
+    """Normalise one fresh Gemini result and write it into the cache.
+
+    A failed result (raw-value fallback) goes to the negative cache instead,
+    so it is retried on a later run rather than cached for good.
+    """
+    stats["cache_misses"] += 1
+    key = inter["model"].strip().lower()
+    brand_raw = inter.get("brand_raw", "")
+    # Normalize SKU before caching so the cache reflects the final value
+    normalized = {**result, "sku": _normalize_sku(result.get("sku", ""), brand_raw)}
+    error = normalized.pop("failed", None)
+    if not key:
+        return normalized
+    failed = stats["failed"]
+    if error:
+        record_failure(failed, key, {"brand": brand_raw, "model": inter["model"],
+                                     "name_raw": inter["name_raw"],
+                                     "category_raw": inter["category_raw"]}, error)
+        stats["failed_updated"] = True
+        stats["metrics"].count("gemini_retry_queue", "failed")
+        return normalized
+    product_cache[key] = new_cache_entry({**{k: normalized.get(k, "") for k in _RESULT_FIELDS},
+                                          "name_raw": inter["name_raw"]})
+    stats["cache_updated"] = True
+    if stats["similar"] is not None:
+        stats["similar"].add(key, product_cache[key])
+    if failed.pop(key, None):
+        stats["failed_updated"] = True
+        stats["metrics"].count("gemini_retry_queue", "recovered")
+    return normalized
+
+
+def enrich_batch(batch_rows: list[dict], product_cache: dict, stats: dict,
+                 label: str | None) -> tuple[list[dict], bool]:
+    """Resolve AI fields for one batch: cache hits first, one Gemini call for the rest.
+
+    Fresh Gemini results are written into product_cache.  Returns
+    (ai_results aligned with batch_rows, whether Gemini was called).
+    label=None prints no progress line (quote_service.py).
+    """
+    metrics = stats["metrics"]
+    mark    = metrics.mark()
+
+    # ── Split batch into cache hits and misses ────────────────────────────────
+    ai_results, uncached_indices, uncached_payload = _split_cached(batch_rows, product_cache, stats)
+    mark = metrics.lap("cache_lookup", mark, rows=len(batch_rows))
+
+    # ── Call Gemini only for uncached rows ────────────────────────────────────
+    if not uncached_payload:
+        if label:
+            print(f"  {label} — all {len(batch_rows)} from cache ✓")
+        return ai_results, False
+
+    n_cached = len(batch_rows) - len(uncached_payload)
+    suffix   = f" ({n_cached} from cache)" if n_cached else ""
+    if label:
+        print(f"  {label} — {len(uncached_payload)} new{suffix}...", end=" ", flush=True)
+    keys = [batch_rows[i]["model"].strip().lower() for i in uncached_indices]
+    gemini_results = call_for_uncached(uncached_payload, keys, stats)
+    metrics.lap("gemini", mark, rows=len(uncached_payload))
+    if label:
+        print("✓")
+    for idx, result in zip(uncached_indices, gemini_results):
+        ai_results[idx] = store_result(batch_rows[idx], result, product_cache, stats)
+    return ai_results, True
+
+
+def enrich_batch_stream(batch_rows: list[dict], product_cache: dict, stats: dict,
+                        label: str):
+    """Streaming variant of enrich_batch() (--stream).
+
+    Yields (row index, ai) as soon as each result is ready: cache hits
+    immediately, Gemini results as their JSON objects complete.  Whether
+    Gemini was called shows in stats["cache_misses"].
+    """
+    metrics = stats["metrics"]
+    mark    = metrics.mark()
+    ai_results, uncached_indices, uncached_payload = _split_cached(batch_rows, product_cache, stats)
+    metrics.lap("cache_lookup", mark, rows=len(batch_rows))
+
+    for i, ai in enumerate(ai_results):
+        if ai is not None:
+            yield i, ai
+    if not uncached_payload:
+        print(f"  {label} — all {len(batch_rows)} from cache ✓")
+        return
+
+    n_cached = len(batch_rows) - len(uncached_payload)
+    suffix   = f" ({n_cached} from cache)" if n_cached else ""
+    print(f"  {label} — {len(uncached_payload)} new{suffix}, streaming...", end=" ", flush=True)
+    mark = metrics.mark()
+    call  = call_gemini_tiered_stream if _gemini["tiered"] else call_gemini_stream
+    keys  = [batch_rows[i]["model"].strip().lower() for i in uncached_indices]
+    fresh, retry = _retry_positions(keys, stats)
+    # Fresh items stream in; earlier failures follow in small dedicated batches
+    streamed = ((fresh[j], result) for j, result in
+                call([uncached_payload[n] for n in fresh], metrics)) if fresh else ()
+    for j, result in chain(streamed, _call_retries(uncached_payload, retry, stats)):
+        idx = uncached_indices[j]
+        ai  = store_result(batch_rows[idx], result, product_cache, stats)
+        metrics.lap("gemini", mark, rows=1)
+        yield idx, ai
+        # Pricing / writing done by the consumer between items is not Gemini time
+        mark = metrics.mark()
+    print("✓")
+
+
+def enrich_by_value(rows: list[dict], product_cache: dict, stats: dict, ctx: dict,
+                    budget: ai_budget.Budget) -> list[dict]:
+    """Budget mode: resolve AI fields for all rows before pricing.
+
+    Distinct uncached products are normalised in budget.rank() order (pending
+    from earlier runs first, then by value) until the budget runs out.  The
+    rest get raw-value fallbacks — not cached — and are saved to the pending
+    queue.  Returns ai results aligned with rows.
+    """
+    metrics = stats["metrics"]
+    mark    = metrics.mark()
+    ai_results, uncached_indices, uncached_payload = _split_cached(rows, product_cache, stats)
+
+    # One Gemini item per distinct product; rows without a model are their own product
+    products = {}   # cache key (or row index) → [payload item, row indices, value]
+    for i, item in zip(uncached_indices, uncached_payload):
+        key   = rows[i]["model"].strip().lower() or i
+        value = ai_budget.row_value(rows[i], ctx["cb_rate"], ctx["supplier_types"])
+        if key in products:
+            products[key][1].append(i)
+            products[key][2] = max(products[key][2], value)
+        else:
+            products[key] = [item, [i], value]
+    pending = ai_budget.load_pending(AI_PENDING_CSV)
+    order   = ai_budget.rank({k: p[2] for k, p in products.items()}, pending)
+    metrics.lap("budget_rank", mark, rows=len(rows))
+    print(f"Budget mode: {len(order)} uncached products ranked by value "
+          f"({sum(k in pending for k in order)} pending from earlier runs)")
+
+    n_batches = math.ceil(len(order) / AI_BATCH_SIZE)
+    done      = 0
+    for batch_idx in range(n_batches):
+        reason = budget.exhausted(metrics)
+        if reason:
+            print(f"  ⚠  Budget: {reason} — deferring {len(order) - done} products")
+            metrics.set("budget_stop", reason)
+            break
+        if batch_idx:
+            time.sleep(0.5)
+        keys = order[done:done + AI_BATCH_SIZE]
+        print(f"  Batch {batch_idx + 1}/{n_batches} — {len(keys)} products "
+              f"(value ≤ ${products[keys[0]][2]:,.0f})...", end=" ", flush=True)
+        started = time.perf_counter()
+        mark    = metrics.mark()
+        results = call_for_uncached([products[k][0] for k in keys], keys, stats)
+        metrics.lap("gemini", mark, rows=len(keys))
+        budget.spend(time.perf_counter() - started)
+        print("✓")
+        for key, result in zip(keys, results):
+            _, indices, _ = products[key]
+            ai = store_result(rows[indices[0]], result, product_cache, stats)
+            stats["cache_hits"] += len(indices) - 1
+            for i in indices:
+                ai_results[i] = ai
+        done += len(keys)
+
+    deferred = {}
+    for key in order[done:]:
+        item, indices, value = products[key]
+        fallback = fallback_result(item)
+        ai = {**fallback, "sku": _normalize_sku(fallback["sku"], rows[indices[0]]["brand_raw"])}
+        for i in indices:
+            ai_results[i] = ai
+        stats["deferred_rows"] += len(indices)
+        if isinstance(key, str):
+            deferred[key] = (rows[indices[0]], value)
+    stats["deferred"] = len(order) - done
+    metrics.count("budget", "normalised", done)
+    metrics.count("budget", "deferred", stats["deferred"])
+    ai_budget.save_pending(AI_PENDING_CSV, pending, deferred)
+    return ai_results
+
+
+def price_row(inter: dict, ai: dict, ctx: dict, stats: dict,
+              priced: PricedRows | None = None) -> tuple[dict, dict] | None:
+    """Price one enriched row → (output row, price debug row), or None if dropped.
+
+    Zero-price rows are dropped.  With priced (the run's deduped rows), a row
+    that loses to the row already kept for its product ID is recorded there as
+    a duplicate and dropped before its debug row is built; the caller adds the
+    rows returned.  Without it repeated IDs are returned (consolidation picks).
+    """
+    supplier_type = ctx["supplier_types"].get(inter["supplier"], "international")
+    region        = ctx["supplier_regions"].get(inter["supplier"], "Europe")
+    # Use AI-normalized name for product type detection: it starts with
+    # an unambiguous English prefix ("HDD ...", "SSD ...", etc.) that
+    # _AI_PREFIX_MAP can match exactly. Fall back to raw name if AI
+    # returned nothing (e.g. Gemini failure / fallback path).
+    ai_name = ai.get("name") or inter["name_raw"]
+    price_amd = calculate_price_amd(
+        inter["price_raw"], inter["currency"], supplier_type, ctx["cb_rate"],
+        region=region,
+        category=ai.get("category", ""),
+        product_name=ai_name,
+    )
+    if price_amd == 0:
+        print(f"  ⚠  Skipping zero-price: {inter['name_raw'][:70]}")
+        metrics = stats["metrics"]
+        metrics.count("skipped_by_reason", "zero_price")
+        metrics.count("skipped_by_supplier", inter["supplier"] or "?")
+        return None
+
+    if supplier_type == "international":
+        eta = get_intl_eta(region, ai.get("category", ""), ai_name, ctx["delivery_times"])
+    else:
+        eta = ctx["delivery_times"].get("Armenia (Local)", "1-2 дня")
+    out_row = build_output_row(inter, ai, price_amd, supplier_type, eta)
+    if priced is not None and not priced.keeps(out_row):
+        priced.drop(out_row, inter["supplier"])
+        return None
+    return out_row, build_price_debug_row(inter, ai, price_amd, supplier_type, eta,
+                                          ctx["cb_rate"], region=region)
+
+
+def price_batch(batch_rows: list[dict], ai_results: list[dict], ctx: dict, stats: dict,
+                priced: PricedRows | None = None) -> tuple[list[dict], list[dict]]:
+    """Price one enriched batch → (output rows, price debug rows); see price_row()."""
+    metrics     = stats["metrics"]
+    mark        = metrics.mark()
+    output_rows = []
+    debug_rows  = []
+    for inter, ai in zip(batch_rows, ai_results):
+        row = price_row(inter, ai, ctx, stats, priced)
+        if row:
+            output_rows.append(row[0])
+            debug_rows.append(row[1])
+    metrics.lap("pricing", mark, rows=len(batch_rows))
+    return output_rows, debug_rows
+
+
+def price_stream(batch_rows: list[dict], ai_stream, ctx: dict, stats: dict,
+                 priced: PricedRows | None = None):
+    """Price rows as enrich_batch_stream() delivers them → yields (output row, debug row)."""
+    metrics = stats["metrics"]
+    for idx, ai in ai_stream:
+        mark = metrics.mark()
+        row  = price_row(batch_rows[idx], ai, ctx, stats, priced)
+        metrics.lap("pricing", mark)
+        if row:
+            yield row
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Dry-run plan (--plan)
+# ─────────────────────────────────────────────────────────────────────────────
+
+_PLAN_FIELDS = ["rows", "hits", "similar", "backing_off", "misses", "key_variants", "items",
+                "calls", "input_tokens", "cached_tokens", "output_tokens", "cost_usd", "seconds"]
+_KEY_VARIANT_RE = re.compile(r"[^0-9a-zа-я]")
+# Typical answer item besides the echoed name / SKU / brand: category + JSON keys
+_PLAN_ITEM_EXTRA = '{"name":"","sku":"","category":"Компоненты ПК/Серверов","brand":""}'
+_PLAN_TIER_EXTRA = ',"confidence":0.85,"flags":[]'
+
+
+def _plan_call(plan: dict, items: list, model: str, prompt_tokens: int, tiered: bool,
+               prompt_cache: bool, pause_s: float = 0.0) -> None:
+    """Charge one Gemini call (items: [(supplier, payload item)]) to its suppliers."""
+    pricing = GEMINI_PLAN["pricing"].get(model, {"input": 0.0, "cached_input": 0.0, "output": 0.0})
+    latency = GEMINI_PLAN["latency"].get(model, {"per_call_s": 0.0, "per_item_s": 0.0})
+    cached  = prompt_tokens if prompt_cache else 0
+    seconds = latency["per_call_s"] + latency["per_item_s"] * len(items) + pause_s
+    callers = set()
+    for supplier, item in items:
+        share = 1 / len(items)
+        answer = item.get("name_raw", "") + item.get("model", "") + item.get("brand", "")
+        out_tokens = gemini_backend.estimate_tokens(
+            answer + _PLAN_ITEM_EXTRA + (_PLAN_TIER_EXTRA if tiered else ""))
+        in_tokens  = gemini_backend.estimate_tokens(encode_payload([item])) + prompt_tokens * share
+        s = plan[supplier]
+        s["input_tokens"]  += in_tokens
+        s["cached_tokens"] += cached * share
+        s["output_tokens"] += out_tokens
+        s["cost_usd"]      += ((in_tokens - cached * share) * pricing["input"]
+                               + cached * share * pricing["cached_input"]
+                               + out_tokens * pricing["output"]) / 1e6
+        s["seconds"]       += seconds * share
+        if supplier not in callers:
+            s["calls"] += 1          # a batch shared by two suppliers counts for both
+            callers.add(supplier)
+
+
+def plan_run(rows: list[dict], product_cache: dict, stats: dict, tiered: bool = GEMINI_TIERED,
+             prompt_cache: bool = GEMINI_PROMPT_CACHE) -> tuple[dict, int]:
+    """Estimate a run without calling Gemini → ({supplier: counters}, total calls).
+
+    Walks the rows in AI_BATCH_SIZE batches exactly like main(): cache hits
+    (archived entries included), --similar reuse, negative-cache back-offs,
+    and misses that a later batch would find cached because an earlier batch
+    resolved them.  Uncached keys
+    that match a cached key after dropping spaces and punctuation are counted
+    as key_variants — usually a cache-key regression, not a new product.
+    Token counts use estimate_tokens(); cost and time use GEMINI_PLAN.
+    """
+    plan     = {}
+    failed   = stats["failed"]
+    similar  = stats["similar"]
+    now      = datetime.now()
+    resolved = set()          # keys an earlier batch of this run would have cached
+    variants = {}
+    for key in product_cache:
+        variants.setdefault(_KEY_VARIANT_RE.sub("", key), key)
+    seen_misses = set()
+    tiers  = GEMINI_TIERS if tiered else [{"model": GEMINI_MODEL}]
+    prompt = gemini_backend.estimate_tokens(TIERED_SYSTEM_PROMPT if tiered else SYSTEM_PROMPT)
+    total_calls = 0
+
+    for start in range(0, len(rows), AI_BATCH_SIZE):
+        fresh, retry, batch_resolved = [], [], set()
+        for r in rows[start:start + AI_BATCH_SIZE]:
+            supplier = r["supplier"] or "?"
+            s = plan.get(supplier)
+            if s is None:
+                s = plan[supplier] = dict.fromkeys(_PLAN_FIELDS, 0)
+            s["rows"] += 1
+            s["seconds"] += GEMINI_PLAN["row_s"]
+            key = r["model"].strip().lower()
+            if key and (key in product_cache or key in resolved
+                        or archived_entry(key, stats) is not None):
+                s["hits"] += 1
+                continue
+            if similar is not None and similar.lookup(r["brand_raw"], r["model"], r["name_raw"])[0]:
+                s["similar"] += 1
+                resolved.add(key)
+                continue
+            if key in failed and not retry_due(failed[key], now):
+                s["backing_off"] += 1
+                continue
+            if key not in seen_misses:
+                seen_misses.add(key)
+                s["misses"] += 1
+                if _KEY_VARIANT_RE.sub("", key) in variants:
+                    s["key_variants"] += 1
+            s["items"] += 1
+            item = {"brand": r["brand_raw"], "model": r["model"], "name_raw": r["name_raw"],
+                    "category_raw": r["category_raw"]}
+            (retry if key in failed else fresh).append((supplier, item))
+            batch_resolved.add(key)
+        resolved |= batch_resolved
+
+        calls = [fresh] if fresh else []
+        calls += [retry[i:i + GEMINI_RETRY_BATCH_SIZE]
+                  for i in range(0, len(retry), GEMINI_RETRY_BATCH_SIZE)]
+        for c, items in enumerate(calls):
+            for n, tier in enumerate(tiers):
+                # Expected share of items escalated from the previous tier
+                sent = items[:round(len(items) * GEMINI_PLAN["escalation_rate"] ** n)]
+                if not sent:
+                    break
+                # main() sleeps 0.5s after each batch that called Gemini
+                _plan_call(plan, sent, tier["model"], prompt, tiered, prompt_cache,
+                           0.5 if c == 0 and n == 0 else 0.0)
+                total_calls += 1
+    return plan, total_calls
+
+
+def print_plan(plan: dict, total_calls: int, budget: ai_budget.Budget | None = None) -> None:
+    total = dict.fromkeys(_PLAN_FIELDS, 0)
+    for s in plan.values():
+        for k in _PLAN_FIELDS:
+            total[k] += s[k]
+    total["calls"] = total_calls
+
+    print(f"\n{'supplier':<16} {'rows':>8} {'hits':>8} {'hit %':>6} {'misses':>7} "
+          f"{'batches':>7} {'in tok':>10} {'out tok':>9} {'cost $':>8} {'time':>8}")
+
+    def line(name: str, s: dict) -> None:
+        hit_rate = (s["hits"] + s["similar"]) / s["rows"] if s["rows"] else 0.0
+        print(f"{name[:16]:<16} {s['rows']:>8,} {s['hits'] + s['similar']:>8,} {hit_rate:>6.1%} "
+              f"{s['misses']:>7,} {s['calls']:>7,} {round(s['input_tokens']):>10,} "
+              f"{round(s['output_tokens']):>9,} {s['cost_usd']:>8.3f} {_duration(s['seconds']):>8}")
+
+    for name, s in sorted(plan.items(), key=lambda kv: -kv[1]["seconds"]):
+        line(name, s)
+    print("─" * 92)
+    line("total", total)
+
+    notes = []
+    if total["similar"]:
+        notes.append(f"{total['similar']:,} rows reuse near-duplicates (--similar)")
+    if total["backing_off"]:
+        notes.append(f"{total['backing_off']:,} rows back off (negative cache, raw names)")
+    if total["items"] > total["misses"]:
+        notes.append(f"{total['items'] - total['misses']:,} items sent twice "
+                     f"(repeated within a batch, or without a model)")
+    for note in notes:
+        print(f"  · {note}")
+    for name, s in sorted(plan.items()):
+        if s["key_variants"]:
+            print(f"  ⚠  {name}: {s['key_variants']} of {s['misses']} misses match a cached model "
+                  f"once spaces/punctuation are dropped — check the model column / cache keys")
+    if budget is not None and budget.active:
+        used = round(total["input_tokens"] + total["output_tokens"])
+        if budget.max_calls is not None and total_calls > budget.max_calls:
+            print(f"  ⚠  --max-calls {budget.max_calls} < {total_calls} calls — the rest is deferred")
+        if budget.max_tokens is not None and used > budget.max_tokens:
+            print(f"  ⚠  --max-tokens {budget.max_tokens:,} < ~{used:,} tokens — the rest is deferred")
+        if budget.deadline is not None and time.time() + total["seconds"] > budget.deadline:
+            print(f"  ⚠  --deadline {datetime.fromtimestamp(budget.deadline):%H:%M} comes first "
+                  f"— the rest is deferred")
+    print("Estimates only: no Gemini calls were made, nothing was written.")
+
+
+def _duration(seconds: float) -> str:
+    seconds = round(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+
+
+def output_paths(test: bool) -> dict:
+    """Output file paths for a run (``_test`` suffixed in --test mode)."""
+    if not test:
+        return {"output": OUTPUT_CSV, "debug": PRICE_DEBUG_CSV, "ndjson": OUTPUT_NDJSON_GZ,
+                "alternatives": OUTPUT_ALTERNATIVES_CSV, "duplicates": OUTPUT_DUPLICATES_CSV}
+    return {
+        "output":       OUTPUT_CSV.replace(".csv", "_test.csv"),
+        "debug":        PRICE_DEBUG_CSV.replace(".csv", "_test.csv"),
+        "ndjson":       OUTPUT_NDJSON_GZ.replace(".ndjson.gz", "_test.ndjson.gz"),
+        "alternatives": OUTPUT_ALTERNATIVES_CSV.replace(".csv", "_test.csv"),
+        "duplicates":   OUTPUT_DUPLICATES_CSV.replace(".csv", "_test.csv"),
+    }
+
+
+def write_csv(path: str, fieldnames: list[str], rows: list[dict]) -> None:
+    """Write via path.tmp and move it into place when complete, so a failed run
+    never leaves a truncated file that looks like a whole catalog."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp, path)
+
+
+def write_price_debug(path: str, debug_rows: list, enabled: bool = True) -> None:
+    """Write price_debug.csv — or, with --no-debug-csv, remove the previous
+    run's file so it can't be taken for this run's prices."""
+    if enabled:
+        write_csv(path, DEBUG_HEADERS, debug_rows)
+    else:
+        pathlib.Path(path).unlink(missing_ok=True)
+
+
+def finish_run(output_rows: list[dict], paths: dict, test: bool, stats: dict,
+               product_cache: dict) -> None:
+    """Save the cache, write the catalog exports and print the run summary.
+
+    The output and debug CSVs are written by the caller (main and pipeline.py
+    once every row is priced, daemon.py after each drop).  The Gemini backend is left open for the caller.
+    """
+    metrics = stats["metrics"]
+
+    # Stamp this run's hits, then save the updated product cache
+    if stats["seen"]:
+        mark_seen(product_cache, stats["seen"])
+        stats["seen"].clear()
+        stats["cache_updated"] = True
+    if stats["cache_updated"]:
+        with metrics.stage("cache_save", rows=len(product_cache)):
+            save_product_cache(PRODUCT_CACHE_CSV, product_cache)
+        print(f"Product cache updated → {len(product_cache)} entries saved")
+    if stats["similar"] is not None:
+        with metrics.stage("similarity_save"):
+            stats["similar"].save()
+        print(f"Near-duplicates reused: {stats['similar_hits']} rows (no Gemini call)")
+        metrics.set("similar_reused", stats["similar_hits"])
+    print(f"Cache: {stats['cache_hits']} hits, {stats['cache_misses']} misses")
+    if stats["failed_updated"]:
+        save_failed_cache(GEMINI_FAILED_CSV, stats["failed"])
+    retry_queue = metrics.counters.get("gemini_retry_queue")
+    if retry_queue or stats["failed"]:
+        retry_queue = retry_queue or {}
+        print(f"Gemini failures: {retry_queue.get('failed', 0)} new/repeated, "
+              f"{retry_queue.get('recovered', 0)} recovered on retry, "
+              f"{len(stats['failed'])} queued for retry  → {GEMINI_FAILED_CSV}")
+    metrics.set("failed_queued", len(stats["failed"]))
+    looked_up = stats["cache_hits"] + stats["cache_misses"]
+    metrics.count("cache", "hits", stats["cache_hits"])
+    metrics.count("cache", "misses", stats["cache_misses"])
+    metrics.set("cache_hit_ratio", round(stats["cache_hits"] / looked_up, 4) if looked_up else None)
+    metrics.set("cache_entries", len(product_cache))
+    metrics.set("output_rows", len(output_rows))
+    metrics.set("duplicate_ids", stats["duplicates"])
+    tokens = metrics.counters.get("gemini_tokens")
+    if tokens:
+        paths_taken = metrics.counters.get("gemini_prompt_cache", {})
+        print(f"Gemini tokens: {tokens.get('prompt_tokens', 0):,} prompt "
+              f"({tokens.get('cached_tokens', 0):,} cached), {tokens.get('output_tokens', 0):,} output"
+              + ("  · prompt " + ", ".join(f"{k}={v}" for k, v in paths_taken.items())
+                 if paths_taken else ""))
+    tier_items = metrics.counters.get("gemini_tier_items")
+    if tier_items:
+        escalated   = metrics.counters.get("gemini_tier_escalated", {})
+        tier_tokens = metrics.counters.get("gemini_tier_tokens", {})
+        parts = []
+        for tier in GEMINI_TIERS:
+            name, n = tier["name"], tier_items.get(tier["name"], 0)
+            used = tier_tokens.get(f"{name}.prompt_tokens", 0) + tier_tokens.get(f"{name}.output_tokens", 0)
+            part = f"{name} {n:,} items, {used:,} tokens"
+            if name in escalated:
+                rate = escalated[name] / n if n else 0.0
+                metrics.set(f"escalation_rate_{name}", round(rate, 4))
+                part += f", {escalated[name]:,} escalated ({rate:.1%})"
+            parts.append(part)
+        print("Gemini tiers: " + "; ".join(parts))
+    faults = {}
+    for backend in _backends.values():
+        for k, v in getattr(backend, "faults", {}).items():
+            faults[k] = faults.get(k, 0) + v
+    if faults:
+        print("Synthetic Gemini faults: " + ", ".join(f"{k}={v}" for k, v in faults.items()))
+
+    # Compressed NDJSON export in insertProductSchema shape (uploaded by portal_upload.py)
+    with metrics.stage("export", rows=len(output_rows)):
+        write_ndjson_gz(paths["ndjson"], output_rows)
+
+        # Delta against the last exported catalog (full runs only — a 10-row test
+        # run would otherwise mark the whole catalog as removed)
+        delta = None
+        if not test:
+            delta = export_delta(output_rows, CATALOG_MANIFEST, OUTPUT_DELTA_JSON,
+                                 CATALOG_MANIFEST_PENDING)
+
+    print(f"\n{'─'*50}")
+    print(f"Products processed  : {len(output_rows)}")
+    if stats["duplicates"]:
+        print(f"Duplicate IDs       : {stats['duplicates']} (same supplier + model, best kept)"
+              f"  → {paths['duplicates']}")
+    if stats["deferred"]:
+        print(f"Deferred (budget)   : {stats['deferred']} products, {stats['deferred_rows']} rows "
+              f"with raw names  → {AI_PENDING_CSV}")
+    print(f"Output              : {paths['output']}")
+    print(f"Portal export       : {paths['ndjson']}")
+    if os.path.exists(paths["debug"]):
+        print(f"Price debug log     : {paths['debug']}")
+    if delta is not None:
+        print(f"Delta               : +{len(delta['added'])} added, "
+              f"~{len(delta['changed'])} changed, -{len(delta['removed'])} removed"
+              f"  → {OUTPUT_DELTA_JSON}")
+    print(f"{'─'*50}")
+    print("\nNext step: review output_import.csv then run portal_upload.py to import into b2b.chip.am.")
+
+
+def add_gemini_args(parser: argparse.ArgumentParser) -> None:
+    """--gemini-backend / --cb-rate, shared with pipeline.py."""
+    parser.add_argument("--gemini-backend", choices=gemini_backend.BACKENDS,
+                        default=GEMINI_BACKEND,
+                        help="live API, record responses, replay recordings, or synthetic (offline)")
+    parser.add_argument("--cb-rate", type=float, default=None,
+                        help="Fixed USD→AMD rate instead of the Central Bank API")
+    parser.add_argument("--prompt-cache", action=argparse.BooleanOptionalAction,
+                        default=GEMINI_PROMPT_CACHE,
+                        help="Upload SYSTEM_PROMPT once via Gemini context caching")
+    parser.add_argument("--stream", action=argparse.BooleanOptionalAction,
+                        default=GEMINI_STREAM,
+                        help="Stream Gemini responses and process each item as it completes")
+    parser.add_argument("--similar", action=argparse.BooleanOptionalAction,
+                        default=SIMILARITY_REUSE,
+                        help="Reuse the normalisation of near-duplicate cached products (similarity.py)")
+    parser.add_argument("--similar-threshold", type=float, default=SIMILARITY_THRESHOLD,
+                        help="Minimum similarity (0–1) for --similar reuse")
+    parser.add_argument("--tiered", action=argparse.BooleanOptionalAction,
+                        default=GEMINI_TIERED,
+                        help="Cheap model first, escalate low-confidence items (GEMINI_TIERS)")
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--test", action="store_true",
                         help="Process only the first 10 rows (for inspection)")
+    parser.add_argument("--consolidate", action=argparse.BooleanOptionalAction,
+                        default=CONSOLIDATE_OFFERS,
+                        help="Collapse offers with the same SKU to one product (see consolidate.py)")
+    parser.add_argument("--plan", action="store_true",
+                        help="Only estimate Gemini calls, tokens, cost and time per supplier "
+                             "(no API calls, nothing written)")
+    add_gemini_args(parser)
+    ai_budget.add_budget_args(parser)
+    price_audit.add_audit_args(parser)
+    add_metrics_args(parser)
     args = parser.parse_args()
+    if not args.plan:
+        set_gemini_backend(args.gemini_backend, args.prompt_cache, args.tiered)
+    try:
+        run(args)
+    finally:
+        close_gemini_backend()   # the cached system prompts are released on failure too
+
 
-    # Load intermediate rows
-    with open(INTERMEDIATE_CSV, newline="", encoding="utf-8-sig") as f:
-        rows = list(csv.DictReader(f))
+def run(args: argparse.Namespace) -> None:
+    """One ai_transform run with the parsed arguments; main() owns the Gemini backend."""
+    metrics = Metrics("ai_transform")
+    budget  = ai_budget.budget_from_args(args)
+
+    # Load intermediate rows (compact records, see records.py)
+    mark = metrics.mark()
+    rows = read_records(INTERMEDIATE_CSV, IntermediateRow)
+    metrics.lap("read", mark, rows=len(rows))
 
     if args.test:
         rows = rows[:10]
@@ -871,124 +2050,73 @@ def main():
 
     print(f"Loaded {len(rows)} rows from {INTERMEDIATE_CSV}")
 
-    # Live exchange rate
-    cb_rate = fetch_cb_rate()
-
-    # Supplier type and region maps (loaded from suppliers.csv)
-    supplier_types, supplier_regions = load_suppliers(SUPPLIERS_CSV)
-    delivery_times = load_delivery_times(DELIVERY_TIMES_CSV)
-
     # Load product name cache (persists across runs — skips Gemini for known products)
-    product_cache = load_product_cache(PRODUCT_CACHE_CSV)
-    cache_hits    = 0
-    cache_misses  = 0
-    cache_updated = False
+    with metrics.stage("cache_load"):
+        product_cache = load_product_cache(PRODUCT_CACHE_CSV)
     print(f"Product cache: {len(product_cache)} entries loaded")
+    similar = None
+    if args.similar:
+        with metrics.stage("similarity_index", rows=len(product_cache)):
+            similar = load_similarity_index(product_cache, args.similar_threshold)
+    stats = new_run_stats(metrics, load_failed_cache(GEMINI_FAILED_CSV), similar)
+
+    if args.plan:
+        with metrics.stage("plan", rows=len(rows)):
+            plan, calls = plan_run(rows, product_cache, stats, args.tiered, args.prompt_cache)
+        print_plan(plan, calls, budget)
+        finish_metrics(metrics, args)
+        return
+
+    with metrics.stage("context"):
+        ctx = load_run_context(args.cb_rate)
 
     # Process in batches
-    output_rows = []
-    debug_rows  = []
+    priced    = PricedRows(dedupe=not args.consolidate)
     n_batches = math.ceil(len(rows) / AI_BATCH_SIZE)
 
+    # Budget mode resolves every row up front (in value order), then prices in file order
+    budget_ai = enrich_by_value(rows, product_cache, stats, ctx, budget) if budget.active else None
+
     for batch_idx in range(n_batches):
         batch_rows = rows[batch_idx * AI_BATCH_SIZE : (batch_idx + 1) * AI_BATCH_SIZE]
 
-        # ── Split batch into cache hits and misses ────────────────────────────
-        ai_results       = [None] * len(batch_rows)
-        uncached_indices = []
-        uncached_payload = []
-
-        for i, r in enumerate(batch_rows):
-            key = r["model"].strip().lower()
-            if key and key in product_cache:
-                ai_results[i] = product_cache[key]
-                cache_hits += 1
-            else:
-                uncached_indices.append(i)
-                uncached_payload.append({
-                    "brand":        r["brand_raw"],
-                    "model":        r["model"],
-                    "name_raw":     r["name_raw"],
-                    "category_raw": r["category_raw"],
-                })
-
-        # ── Call Gemini only for uncached rows ────────────────────────────────
-        if uncached_payload:
-            n_cached = len(batch_rows) - len(uncached_payload)
-            suffix   = f" ({n_cached} from cache)" if n_cached else ""
-            print(f"  Batch {batch_idx + 1}/{n_batches} — {len(uncached_payload)} new{suffix}...",
-                  end=" ", flush=True)
-            gemini_results = call_gemini(uncached_payload)
-            print("✓")
-            for idx, result in zip(uncached_indices, gemini_results):
-                cache_misses += 1
-                key = batch_rows[idx]["model"].strip().lower()
-                brand_raw = batch_rows[idx].get("brand_raw", "")
-                # Normalize SKU before caching so the cache reflects the final value
-                normalized = {**result, "sku": _normalize_sku(result.get("sku", ""), brand_raw)}
-                ai_results[idx] = normalized
-                if key:
-                    product_cache[key] = {**normalized, "status": "NEW"}
-                    cache_updated = True
+        label = f"Batch {batch_idx + 1}/{n_batches}"
+        if budget_ai is not None:
+            ai_results = budget_ai[batch_idx * AI_BATCH_SIZE : (batch_idx + 1) * AI_BATCH_SIZE]
+            priced.extend(*price_batch(batch_rows, ai_results, ctx, stats, priced))
+            continue
+        if args.stream:
+            misses_before = stats["cache_misses"]
+            ai_stream = enrich_batch_stream(batch_rows, product_cache, stats, label)
+            for out_row, dbg_row in price_stream(batch_rows, ai_stream, ctx, stats, priced):
+                priced.add(out_row, dbg_row)
+            called_gemini = stats["cache_misses"] > misses_before
         else:
-            print(f"  Batch {batch_idx + 1}/{n_batches} — all {len(batch_rows)} from cache ✓")
-
-        # ── Process all rows (cached + freshly Gemini'd) ─────────────────────
-        for inter, ai in zip(batch_rows, ai_results):
-            supplier_type = supplier_types.get(inter["supplier"], "international")
-            region        = supplier_regions.get(inter["supplier"], "Europe")
-            # Use AI-normalized name for product type detection: it starts with
-            # an unambiguous English prefix ("HDD ...", "SSD ...", etc.) that
-            # _AI_PREFIX_MAP can match exactly. Fall back to raw name if AI
-            # returned nothing (e.g. Gemini failure / fallback path).
-            ai_name = ai.get("name") or inter["name_raw"]
-            price_amd = calculate_price_amd(
-                inter["price_raw"], inter["currency"], supplier_type, cb_rate,
-                region=region,
-                category=ai.get("category", ""),
-                product_name=ai_name,
-            )
-            if price_amd == 0:
-                print(f"  ⚠  Skipping zero-price: {inter['name_raw'][:70]}")
-                continue
-
-            if supplier_type == "international":
-                eta = get_intl_eta(region, ai.get("category", ""), ai_name, delivery_times)
-            else:
-                eta = delivery_times.get("Armenia (Local)", "1-2 дня")
-            output_rows.append(build_output_row(inter, ai, price_amd, supplier_type, eta))
-            debug_rows.append(build_price_debug_row(inter, ai, price_amd, supplier_type, eta, cb_rate, region=region))
+            ai_results, called_gemini = enrich_batch(batch_rows, product_cache, stats, label)
+            priced.extend(*price_batch(batch_rows, ai_results, ctx, stats, priced))
 
         # Small delay only when Gemini was actually called (to avoid rate-limiting)
-        if uncached_payload and batch_idx < n_batches - 1:
+        if called_gemini and batch_idx < n_batches - 1:
             time.sleep(0.5)
 
-    # Save updated product cache
-    if cache_updated:
-        save_product_cache(PRODUCT_CACHE_CSV, product_cache)
-        print(f"Product cache updated → {len(product_cache)} entries saved")
-    print(f"Cache: {cache_hits} hits, {cache_misses} misses")
-
-    # Write output
-    out_path = OUTPUT_CSV if not args.test else OUTPUT_CSV.replace(".csv", "_test.csv")
-    with open(out_path, "w", newline="", encoding="utf-8-sig") as f:
-        writer = csv.DictWriter(f, fieldnames=OUTPUT_HEADERS)
-        writer.writeheader()
-        writer.writerows(output_rows)
-
-    # Write price debug log
-    debug_path = PRICE_DEBUG_CSV if not args.test else PRICE_DEBUG_CSV.replace(".csv", "_test.csv")
-    with open(debug_path, "w", newline="", encoding="utf-8-sig") as f:
-        writer = csv.DictWriter(f, fieldnames=DEBUG_HEADERS)
-        writer.writeheader()
-        writer.writerows(debug_rows)
-
-    print(f"\n{'─'*50}")
-    print(f"Products processed  : {len(output_rows)}")
-    print(f"Output              : {out_path}")
-    print(f"Price debug log     : {debug_path}")
-    print(f"{'─'*50}")
-    print("\nNext step: review output_import.csv then import into b2b.chip.am portal.")
+    paths = output_paths(args.test)
+    output_rows, debug_rows = priced.output_rows, priced.debug_rows
+    if args.consolidate:
+        output_rows = apply_consolidation(output_rows, debug_rows, CONSOLIDATION_POLICY,
+                                          paths["alternatives"])
+    else:
+        stats["duplicates"] = apply_dedupe(priced, paths["duplicates"])
+
+    # Write output + price debug log
+    with metrics.stage("write", rows=len(output_rows)):
+        write_csv(paths["output"], OUTPUT_HEADERS, output_rows)
+        write_price_debug(paths["debug"], debug_rows, args.debug_csv)
+    if args.price_audit and not args.test:
+        with metrics.stage("price_audit", rows=len(debug_rows)):
+            price_audit.record_run(debug_rows, DEBUG_HEADERS, "ai_transform", ctx["cb_rate"])
+
+    finish_run(output_rows, paths, args.test, stats, product_cache)
+    finish_metrics(metrics, args)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+backfill.py
+───────────
+Bulk normalisation of every uncached product through a batch job — for cold
+backfills (a new supplier with tens of thousands of SKUs) where interactive
+calls would take hours and cost twice as much.
+
+  1. every distinct product of intermediate.csv that isn't in the product
+     cache (or its archive) goes into BACKFILL_JOB_JSONL — one
+     GenerateContent request per AI_BATCH_SIZE products, same compact
+     payload and SYSTEM_PROMPT as ai_transform.py
+  2. the file is submitted as one job (Gemini Batch API, or the local
+     stand-in batch_job_server.py); the job handle and the products of every
+     request are saved to BACKFILL_STATE_JSON before anything else happens
+  3. the job is polled every BACKFILL_POLL_S seconds.  Stopping backfill.py
+     (Ctrl-C, reboot) doesn't stop the job: the next run finds the state file
+     and resumes polling the same job instead of submitting a new one
+  4. once it succeeded, the results are downloaded to BACKFILL_RESULTS_JSONL
+     and ingested into the product cache (status NEW, like interactive
+     results).  Failed requests, unparseable answers and answers with the
+     wrong number of items go to the negative cache (gemini_failed.csv), so
+     the next interactive run retries them in small batches.  Products cached
+     in the meantime (e.g. by an interactive run) are left as they are.
+
+The following ai_transform.py / pipeline.py run then finds them cached.
+--tiered escalation isn't applied to batch results: doubtful answers are
+cached like any other NEW entry for review.
+
+Run from repo root:
+    python scripts/preprocess.py && python scripts/backfill.py     # submit, wait, ingest
+    python scripts/backfill.py --supplier "NX Electronics Ltd"     # one supplier only
+    python scripts/backfill.py --no-wait                           # submit and exit
+    python scripts/backfill.py                                     # (again) resume the job
+    python scripts/backfill.py --status | --cancel
+
+    python scripts/batch_job_server.py &                           # offline end-to-end run
+    python scripts/backfill.py --backend local --poll 2
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+from config import (
+    INTERMEDIATE_CSV, PRODUCT_CACHE_CSV, GEMINI_FAILED_CSV, GEMINI_MODEL, AI_BATCH_SIZE,
+    BACKFILL_BACKEND, BACKFILL_POLL_S, BACKFILL_JOB_JSONL, BACKFILL_STATE_JSON,
+    BACKFILL_RESULTS_JSONL, BATCH_SERVER_URL, PRODUCT_CACHE_ARCHIVE_CSV,
+)
+from gemini_backend import BATCH_BACKENDS, JOB_DONE_STATES, make_batch_jobs
+from metrics import Metrics
+from preprocess import IntermediateRow
+from records import read_records
+import ai_transform
+
+_ITEM_FIELDS = ["brand_raw", "model", "name_raw", "category_raw"]
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Job file
+# ─────────────────────────────────────────────────────────────────────────────
+
+def uncached_products(rows: list, product_cache: dict, suppliers: set | None = None) -> list:
+    """One intermediate row per distinct product that isn't cached (file order)."""
+    seen, products = set(), []
+    for r in rows:
+        key = r["model"].strip().lower()
+        if not key or key in product_cache or key in seen:
+            continue
+        if suppliers and r["supplier"] not in suppliers:
+            continue
+        seen.add(key)
+        products.append(r)
+    return products
+
+
+def write_job(path: str, products: list) -> dict:
+    """Write the JSONL request file → {request key: [[brand_raw, model, name_raw, category_raw]]}."""
+    system = {"parts": [{"text": ai_transform.SYSTEM_PROMPT}]}
+    requests = {}
+    with open(path, "w", encoding="utf-8") as f:
+        for n, start in enumerate(range(0, len(products), AI_BATCH_SIZE), start=1):
+            batch = products[start:start + AI_BATCH_SIZE]
+            items = [{"brand": r["brand_raw"], "model": r["model"], "name_raw": r["name_raw"],
+                      "category_raw": r["category_raw"]} for r in batch]
+            key = f"b{n:05d}"
+            request = {
+                "contents": [{"role": "user",
+                              "parts": [{"text": ai_transform.encode_payload(items)}]}],
+                "system_instruction": system,
+                "generation_config": {"temperature": 0.1, "response_mime_type": "application/json"},
+            }
+            f.write(json.dumps({"key": key, "request": request}, ensure_ascii=False) + "\n")
+            requests[key] = [[r[field] for field in _ITEM_FIELDS] for r in batch]
+    return requests
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Job state (survives restarts)
+# ─────────────────────────────────────────────────────────────────────────────
+
+def load_state(path: str) -> dict | None:
+    if not pathlib.Path(path).exists():
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(path: str, state: dict) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def clear_state(path: str) -> None:
+    pathlib.Path(path).unlink(missing_ok=True)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Ingest
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _answer_items(entry: dict, n_items: int) -> tuple[list | None, str]:
+    """Result line → (answer items, "") or (None, error)."""
+    if "error" in entry:
+        error = entry["error"]
+        return None, f"batch_error_{error.get('code', '')}" if isinstance(error, dict) else "batch_error"
+    try:
+        candidate = entry["response"]["candidates"][0]
+        text = "".join(part.get("text", "") for part in candidate["content"]["parts"])
+        answer = ai_transform.parse_answer(text)
+    except (KeyError, IndexError, TypeError):
+        return None, "empty_response"
+    except ValueError:
+        return None, "JSONDecodeError"
+    if not isinstance(answer, list) or len(answer) != n_items:
+        return None, "length_mismatch"
+    return answer, ""
+
+
+def ingest(results_path: str, requests: dict, product_cache: dict, stats: dict) -> dict:
+    """Store the job's answers in product_cache (failures in stats["failed"]) → counts."""
+    counts = {"cached": 0, "already_cached": 0, "failed": 0, "prompt_tokens": 0,
+              "output_tokens": 0}
+    metrics = stats["metrics"]
+    pending = dict(requests)
+
+    def store(item: list, result: dict) -> None:
+        inter = dict(zip(_ITEM_FIELDS, item))
+        if inter["model"].strip().lower() in product_cache:
+            counts["already_cached"] += 1
+            return
+        ai_transform.store_result(inter, result, product_cache, stats)
+        counts["failed" if result.get("failed") else "cached"] += 1
+
+    with open(results_path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            items = pending.pop(entry.get("key"), None)
+            if items is None:
+                continue
+            usage = entry.get("response", {}).get("usageMetadata", {})
+            counts["prompt_tokens"] += usage.get("promptTokenCount", 0)
+            counts["output_tokens"] += usage.get("candidatesTokenCount", 0)
+            answers, error = _answer_items(entry, len(items))
+            if error:
+                metrics.count("backfill_errors", error)
+            for n, item in enumerate(items):
+                answer = answers[n] if answers else None
+                if not isinstance(answer, dict):
+                    answer = ai_transform.fallback_result(
+                        {"brand": item[0], "model": item[1], "name_raw": item[2]},
+                        error or "invalid_item")
+                store(item, answer)
+    for items in pending.values():            # requests the job returned nothing for
+        metrics.count("backfill_errors", "missing")
+        for item in items:
+            store(item, ai_transform.fallback_result(
+                {"brand": item[0], "model": item[1], "name_raw": item[2]}, "missing"))
+    return counts
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Main
+# ─────────────────────────────────────────────────────────────────────────────
+
+def submit(args, jobs) -> dict | None:
+    rows = read_records(INTERMEDIATE_CSV, IntermediateRow)
+    product_cache = ai_transform.load_product_cache(PRODUCT_CACHE_CSV)
+    # Archived products are restored by the next run, not re-normalised
+    known = {**ai_transform.load_product_cache(PRODUCT_CACHE_ARCHIVE_CSV), **product_cache}
+    products = uncached_products(rows, known, set(args.supplier or ()))
+    print(f"{len(rows)} rows in {INTERMEDIATE_CSV}, {len(product_cache)} cached products "
+          f"→ {len(products)} uncached product(s)")
+    if not products:
+        print("Nothing to backfill.")
+        return None
+
+    requests = write_job(BACKFILL_JOB_JSONL, products)
+    size_mb  = pathlib.Path(BACKFILL_JOB_JSONL).stat().st_size / 1e6
+    print(f"Job file: {len(requests)} requests, {size_mb:.1f} MB  → {BACKFILL_JOB_JSONL}")
+    state = {"backend": args.backend, "url": args.url, "model": GEMINI_MODEL,
+             "created": datetime.now().isoformat(timespec="seconds"),
+             "products": len(products), "handle": None, "requests": requests}
+    # Saved before submitting: a crash in between leaves a state without a
+    # handle, which is reported instead of silently paying for a second job
+    save_state(BACKFILL_STATE_JSON, state)
+    display_name = f"b2b-backfill-{datetime.now():%Y%m%d-%H%M%S}"
+    state["handle"] = jobs.submit(BACKFILL_JOB_JSONL, GEMINI_MODEL, display_name)
+    save_state(BACKFILL_STATE_JSON, state)
+    print(f"Submitted {state['handle']} ({args.backend})")
+    return state
+
+
+def wait(jobs, state: dict, poll_s: float) -> str:
+    """Poll the job until it reaches a final state → that state."""
+    last = None
+    while True:
+        job_state, error = jobs.status(state["handle"])
+        if job_state != last:
+            print(f"  {datetime.now():%H:%M:%S}  {job_state}" + (f" — {error}" if error else ""))
+            last = job_state
+        if job_state in JOB_DONE_STATES:
+            return job_state
+        time.sleep(poll_s)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=BATCH_BACKENDS, default=BACKFILL_BACKEND,
+                        help="Gemini Batch API, or batch_job_server.py (offline)")
+    parser.add_argument("--url", default=BATCH_SERVER_URL, help="batch_job_server.py address")
+    parser.add_argument("--supplier", action="append",
+                        help="Only products of this supplier (repeatable)")
+    parser.add_argument("--poll", type=float, default=BACKFILL_POLL_S,
+                        help="Seconds between job status checks")
+    parser.add_argument("--no-wait", action="store_true",
+                        help="Submit (or check) the job and exit; run again later to ingest")
+    parser.add_argument("--status", action="store_true", help="Show the current job and exit")
+    parser.add_argument("--cancel", action="store_true", help="Cancel the current job")
+    args = parser.parse_args()
+
+    state = load_state(BACKFILL_STATE_JSON)
+    if state is not None and not state.get("handle"):
+        print(f"⚠  {BACKFILL_STATE_JSON} has no job handle — the previous submit was interrupted.\n"
+              f"   Check the provider's job list, then delete the file to submit again.")
+        sys.exit(1)
+    if state is None and (args.status or args.cancel):
+        print("No backfill job in progress.")
+        return
+    if state is not None:
+        # The job belongs to the backend it was submitted to, whatever the flags say
+        jobs = make_batch_jobs(state["backend"], state.get("url", ""))
+        print(f"Job {state['handle']} ({state['backend']}, {state['products']} products, "
+              f"submitted {state['created']})")
+        if args.status:
+            print(f"  {jobs.status(state['handle'])[0]}")
+            return
+        if args.cancel:
+            jobs.cancel(state["handle"])
+            clear_state(BACKFILL_STATE_JSON)
+            print("  Cancelled.")
+            return
+    else:
+        jobs  = make_batch_jobs(args.backend, args.url)
+        state = submit(args, jobs)
+        if state is None:
+            return
+    if args.no_wait:
+        print("Run backfill.py again to wait for the job and ingest its results.")
+        return
+
+    try:
+        job_state = wait(jobs, state, args.poll)
+    except KeyboardInterrupt:
+        print("\nStopped polling — the job keeps running; run backfill.py again to resume.")
+        return
+    if job_state != "JOB_STATE_SUCCEEDED":
+        clear_state(BACKFILL_STATE_JSON)
+        print(f"⚠  Job ended with {job_state} — nothing ingested; the products stay uncached.")
+        sys.exit(1)
+
+    jobs.download(state["handle"], BACKFILL_RESULTS_JSONL)
+    product_cache = ai_transform.load_product_cache(PRODUCT_CACHE_CSV)
+    stats  = ai_transform.new_run_stats(Metrics("backfill"),
+                                        ai_transform.load_failed_cache(GEMINI_FAILED_CSV))
+    counts = ingest(BACKFILL_RESULTS_JSONL, state["requests"], product_cache, stats)
+    if stats["cache_updated"]:
+        ai_transform.save_product_cache(PRODUCT_CACHE_CSV, product_cache)
+    if stats["failed_updated"]:
+        ai_transform.save_failed_cache(GEMINI_FAILED_CSV, stats["failed"])
+    clear_state(BACKFILL_STATE_JSON)
+
+    errors = stats["metrics"].counters.get("backfill_errors", {})
+    print(f"\n{'─'*50}")
+    print(f"Cached              : {counts['cached']} products  → {PRODUCT_CACHE_CSV}")
+    if counts["already_cached"]:
+        print(f"Already cached      : {counts['already_cached']} (cached since submitting, kept)")
+    if counts["failed"]:
+        print(f"Failed              : {counts['failed']} products ("
+              + ", ".join(f"{k}={v}" for k, v in errors.items())
+              + f")  → {GEMINI_FAILED_CSV}")
+    print(f"Tokens              : {counts['prompt_tokens']:,} prompt, "
+          f"{counts['output_tokens']:,} output")
+    print(f"{'─'*50}")
+
+
+if __name__ == "__main__":
+    main()
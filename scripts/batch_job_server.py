@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+batch_job_server.py
+───────────────────
+Local stand-in for the Gemini Batch API, so backfill.py can be run end to end
+offline (backfill.py --backend local).
+
+    POST /files                  JSONL body            → {"name": "files/<id>"}
+    POST /batches                {"model", "src", "display_name"}
+                                                       → {"name": "batches/<id>", "state"}
+    GET  /batches/<id>           → {"name", "state", "dest", "error"}
+    POST /batches/<id>:cancel
+    GET  /files/<id>             → file content (the job results once it succeeded)
+
+A job is PENDING for its first second, RUNNING until BATCH_SERVER_DELAY_S
+have passed, then SUCCEEDED.  Its results are produced on the first status
+check after that, by the synthetic backend (gemini_backend.SyntheticBackend,
+no latency): schema-valid normalisations with the usual injected faults —
+a rate-limit fault becomes an {"error"} line, truncated / malformed /
+length-mismatched answers are returned as they are.
+
+Jobs and files are kept in BATCH_SERVER_DIR, so a job survives a restart of
+this server just like a real one survives a restart of backfill.py.
+
+Run from repo root:
+    python scripts/batch_job_server.py                     # 127.0.0.1:8766
+    python scripts/batch_job_server.py --delay 60 --port 9001
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import signal
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+from config import BATCH_SERVER_URL, BATCH_SERVER_DIR, BATCH_SERVER_DELAY_S
+from gemini_backend import SyntheticBackend, RateLimitError
+
+
+class JobStore:
+    def __init__(self, root: str, delay_s: float):
+        self.root    = pathlib.Path(root)
+        self.delay_s = delay_s
+        self.lock    = threading.Lock()
+        (self.root / "files").mkdir(parents=True, exist_ok=True)
+        (self.root / "batches").mkdir(parents=True, exist_ok=True)
+        self.backend = SyntheticBackend({"latency_scale": 0}, prompt_cache=False)
+
+    def _job_path(self, name: str) -> pathlib.Path:
+        return self.root / f"{name}.json"
+
+    def _file_path(self, name: str) -> pathlib.Path:
+        return self.root / f"{name}.jsonl"
+
+    def put_file(self, data: bytes) -> str:
+        name = f"files/{uuid.uuid4().hex[:16]}"
+        self._file_path(name).write_bytes(data)
+        return name
+
+    def get_file(self, name: str) -> bytes | None:
+        path = self._file_path(name)
+        return path.read_bytes() if path.exists() else None
+
+    def create(self, model: str, src: str, display_name: str) -> dict:
+        if not self._file_path(src).exists():
+            raise KeyError(src)
+        job = {"name": f"batches/{uuid.uuid4().hex[:16]}", "model": model, "src": src,
+               "display_name": display_name, "created": time.time(), "state": "JOB_STATE_PENDING",
+               "dest": "", "error": ""}
+        self._save(job)
+        return job
+
+    def _save(self, job: dict) -> None:
+        with open(self._job_path(job["name"]), "w", encoding="utf-8") as f:
+            json.dump(job, f)
+
+    def get(self, name: str) -> dict | None:
+        path = self._job_path(name)
+        if not path.exists():
+            return None
+        with self.lock:
+            job = json.loads(path.read_text(encoding="utf-8"))
+            if job["state"] not in ("JOB_STATE_CANCELLED", "JOB_STATE_SUCCEEDED",
+                                    "JOB_STATE_FAILED"):
+                age = time.time() - job["created"]
+                if age >= self.delay_s:
+                    self._run(job)
+                elif age >= min(1.0, self.delay_s):
+                    job["state"] = "JOB_STATE_RUNNING"
+                self._save(job)
+        return job
+
+    def cancel(self, name: str) -> dict | None:
+        job = self.get(name)
+        if job is not None and job["state"] in ("JOB_STATE_PENDING", "JOB_STATE_RUNNING"):
+            job["state"] = "JOB_STATE_CANCELLED"
+            self._save(job)
+        return job
+
+    def _run(self, job: dict) -> None:
+        """Answer every request of the job's source file into its result file."""
+        lines = []
+        try:
+            for line in self.get_file(job["src"]).decode("utf-8").splitlines():
+                if line.strip():
+                    lines.append(self._answer(json.loads(line)))
+        except (ValueError, KeyError) as e:
+            job["state"], job["error"] = "JOB_STATE_FAILED", f"invalid request file: {e}"
+            return
+        dest = f"{job['src']}-results"
+        self._file_path(dest).write_text("".join(l + "\n" for l in lines), encoding="utf-8")
+        job["state"], job["dest"] = "JOB_STATE_SUCCEEDED", dest
+
+    def _answer(self, entry: dict) -> str:
+        request = entry["request"]
+        payload = "".join(p.get("text", "") for c in request["contents"] for p in c["parts"])
+        system  = "".join(p.get("text", "") for p in
+                          request.get("system_instruction", {}).get("parts", []))
+        try:
+            text, usage = self.backend.generate(payload, system)
+        except RateLimitError as e:
+            return json.dumps({"key": entry["key"],
+                               "error": {"code": 429, "message": str(e)}}, ensure_ascii=False)
+        response = {
+            "candidates": [{"content": {"role": "model", "parts": [{"text": text}]},
+                            "finishReason": "STOP"}],
+            "usageMetadata": {"promptTokenCount": usage["prompt_tokens"],
+                              "candidatesTokenCount": usage["output_tokens"]},
+        }
+        return json.dumps({"key": entry["key"], "response": response}, ensure_ascii=False)
+
+
+def make_handler(store: JobStore, verbose: bool = False):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, status: int, body, content_type: str = "application/json") -> None:
+            data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _path(self) -> str:
+            path = urlsplit(self.path).path.strip("/")
+            return "" if ".." in path else path      # names never leave BATCH_SERVER_DIR
+
+        def _body(self) -> bytes:
+            return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+        def do_GET(self):
+            path = self._path()
+            if path.startswith("batches/"):
+                job = store.get(path)
+                if job is None:
+                    self._reply(404, {"error": f"no job {path}"})
+                else:
+                    self._reply(200, job)
+            elif path.startswith("files/"):
+                data = store.get_file(path)
+                if data is None:
+                    self._reply(404, {"error": f"no file {path}"})
+                else:
+                    self._reply(200, data, "application/jsonl")
+            else:
+                self._reply(404, {"error": f"unknown path /{path}"})
+
+        def do_POST(self):
+            path = self._path()
+            body = self._body()
+            if path == "files":
+                self._reply(200, {"name": store.put_file(body)})
+            elif path == "batches":
+                try:
+                    params = json.loads(body or b"{}")
+                    self._reply(200, store.create(params["model"], params["src"],
+                                                  params.get("display_name", "")))
+                except (ValueError, KeyError) as e:
+                    self._reply(400, {"error": f"bad job request: {e}"})
+            elif path.startswith("batches/") and path.endswith(":cancel"):
+                job = store.cancel(path.removesuffix(":cancel"))
+                if job is None:
+                    self._reply(404, {"error": f"no job {path}"})
+                else:
+                    self._reply(200, job)
+            else:
+                self._reply(404, {"error": f"unknown path /{path}"})
+
+        def log_message(self, format, *args):
+            if verbose:
+                super().log_message(format, *args)
+
+    return Handler
+
+
+def main():
+    url = urlsplit(BATCH_SERVER_URL)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=url.hostname)
+    parser.add_argument("--port", type=int, default=url.port)
+    parser.add_argument("--delay", type=float, default=BATCH_SERVER_DELAY_S,
+                        help="Seconds until a submitted job completes")
+    parser.add_argument("--dir", default=BATCH_SERVER_DIR, help="Where jobs and files are kept")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    store  = JobStore(args.dir, args.delay)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(store, args.verbose))
+    print(f"Batch job stand-in on http://{args.host}:{args.port} (jobs in {args.dir}, "
+          f"complete after {args.delay:g}s)")
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
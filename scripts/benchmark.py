@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+benchmark.py
+────────────
+Micro-benchmarks for the pipeline's per-row hot functions.
+
+Benchmarks try_parse_row, extract_brand, extract_sku_from_offer_name,
+detect_product_type, calculate_price_amd, _compute_intl_moq and
+build_output_row on synthetic supplier data (see synthetic_data.py) at
+10k / 100k / 1M rows.  Inputs are a pool of distinct rows, cycled to the
+requested size.  No network or Gemini calls are made.
+
+Results are written to scripts/bench_results.json and compared against a
+stored baseline (scripts/bench_baseline.json) so speedups and regressions show
+up as numbers:
+
+    python scripts/benchmark.py                           # run + compare with baseline
+    python scripts/benchmark.py --save-baseline           # run + store as new baseline
+    python scripts/benchmark.py --sizes 10000 --only extract_brand,try_parse_row
+    python scripts/benchmark.py --fail-on-regression      # exit 1 if anything got slower
+"""
+
+import argparse
+import gc
+import json
+import os
+import pathlib
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+from itertools import cycle, islice
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+from config import (
+    SUPPLIERS_CSV, BRANDS_CSV,
+    BENCH_RESULTS_JSON, BENCH_BASELINE_JSON, BENCH_REGRESSION_PCT,
+)
+import preprocess
+import ai_transform
+from synthetic_data import generate_raw_lines, generate_offer_names
+
+POOL_SIZE     = 10_000
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+CB_RATE       = 390.0
+
+# AI-normalised name prefix + portal category, as Gemini would return them
+_AI_SHAPES = [
+    ("RAM",     "Компоненты ПК/Серверов"),
+    ("SSD",     "Компоненты ПК/Серверов"),
+    ("Laptop",  "Ноутбуки"),
+    ("Monitor", "Мониторы"),
+    ("Printer", "Принтеры/Сканеры"),
+    ("Camera",  "Системы безопасности"),
+]
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Inputs
+# ─────────────────────────────────────────────────────────────────────────────
+
+def build_pools(seed: int) -> dict:
+    """Build one pool of positional-argument tuples per benchmarked function."""
+    rng = random.Random(seed)
+    supplier_config = preprocess.load_supplier_config(SUPPLIERS_CSV)
+    known_brands    = preprocess.load_brands(BRANDS_CSV)
+    supplier_types, supplier_regions = ai_transform.load_suppliers(SUPPLIERS_CSV)
+
+    lines  = list(generate_raw_lines(POOL_SIZE, seed))
+    parsed = [r for r in map(preprocess.try_parse_row, lines) if r is not None]
+
+    stats = preprocess.new_stats()
+    inter_rows = []
+    for lineno, row in enumerate(parsed, start=2):
+        inter = preprocess.process_row(row, lineno, supplier_config, known_brands, stats)
+        if inter is not None:
+            inter_rows.append({k: str(v) for k, v in inter.items()})
+
+    priced = []   # (inter, ai, supplier_type, region)
+    for inter in inter_rows:
+        prefix, category = rng.choice(_AI_SHAPES)
+        ai = {
+            "name":     f"{prefix} {inter['brand_raw']} {inter['name_raw'][:60]}",
+            "sku":      inter["model"],
+            "category": category,
+            "brand":    inter["brand_raw"],
+        }
+        priced.append((inter, ai,
+                       supplier_types.get(inter["supplier"], "international"),
+                       supplier_regions.get(inter["supplier"], "Europe")))
+
+    return {
+        "try_parse_row": [(line,) for line in lines],
+        "extract_brand": [(r["Brand"], r["Name"], known_brands) for r in parsed],
+        "extract_sku_from_offer_name": [(n,) for n in generate_offer_names(POOL_SIZE, seed)],
+        # Half AI-normalised names (prefix map path), half raw names (keyword scan path)
+        "detect_product_type": [
+            (ai["category"], ai["name"] if i % 2 else inter["name_raw"])
+            for i, (inter, ai, _, _) in enumerate(priced)
+        ],
+        "calculate_price_amd": [
+            (inter["price_raw"], inter["currency"], stype, CB_RATE, region,
+             ai["category"], ai["name"])
+            for inter, ai, stype, region in priced
+        ],
+        "_compute_intl_moq": [
+            (inter["moq"], inter["price_raw"], inter["availableQuantity"])
+            for inter, _, _, _ in priced
+        ],
+        "build_output_row": [
+            (inter, ai, 125_000, stype, "14-21 дней")
+            for inter, ai, stype, _ in priced
+        ],
+    }
+
+
+FUNCTIONS = {
+    "try_parse_row":               preprocess.try_parse_row,
+    "extract_brand":               preprocess.extract_brand,
+    "extract_sku_from_offer_name": preprocess.extract_sku_from_offer_name,
+    "detect_product_type":         ai_transform.detect_product_type,
+    "calculate_price_amd":         ai_transform.calculate_price_amd,
+    "_compute_intl_moq":           ai_transform._compute_intl_moq,
+    "build_output_row":            ai_transform.build_output_row,
+}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Timing
+# ─────────────────────────────────────────────────────────────────────────────
+
+def time_call(fn, args_list: list, repeat: int) -> float:
+    """Best-of-`repeat` wall time (seconds) for calling fn over every args tuple."""
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        for args in args_list:
+            fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def run(sizes: list[int], names: list[str], repeat: int, seed: int) -> dict:
+    pools   = build_pools(seed)
+    results = {}
+    for name in names:
+        fn, pool = FUNCTIONS[name], pools[name]
+        results[name] = {}
+        for n in sizes:
+            args_list = list(islice(cycle(pool), n))
+            seconds   = time_call(fn, args_list, repeat)
+            results[name][str(n)] = {
+                "seconds":     round(seconds, 6),
+                "ns_per_row":  round(seconds / n * 1e9, 1),
+                "rows_per_sec": round(n / seconds) if seconds else None,
+            }
+            print(f"  {name:<30} {n:>9,} rows  {seconds / n * 1e9:>10,.0f} ns/row")
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python":    platform.python_version(),
+            "platform":  platform.platform(),
+            "seed":      seed,
+            "repeat":    repeat,
+            "pool_size": POOL_SIZE,
+        },
+        "results": results,
+    }
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Baseline comparison
+# ─────────────────────────────────────────────────────────────────────────────
+
+def compare(current: dict, baseline: dict, threshold_pct: float) -> list[dict]:
+    """Per function/size change in ns/row vs the baseline (positive = slower)."""
+    rows = []
+    for name, by_size in current["results"].items():
+        for size, cur in by_size.items():
+            base = baseline.get("results", {}).get(name, {}).get(size)
+            if not base or not base.get("ns_per_row"):
+                continue
+            change = (cur["ns_per_row"] - base["ns_per_row"]) / base["ns_per_row"] * 100
+            if change > threshold_pct:
+                verdict = "REGRESSION"
+            elif change < -threshold_pct:
+                verdict = "faster"
+            else:
+                verdict = "~"
+            rows.append({"function": name, "size": int(size),
+                         "baseline_ns": base["ns_per_row"], "current_ns": cur["ns_per_row"],
+                         "change_pct": round(change, 1), "verdict": verdict})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Comma-separated row counts (default: 10000,100000,1000000)")
+    parser.add_argument("--only", default="",
+                        help=f"Comma-separated subset of: {', '.join(FUNCTIONS)}")
+    parser.add_argument("--repeat", type=int, default=3, help="Best of N runs per measurement")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=BENCH_RESULTS_JSON)
+    parser.add_argument("--baseline", default=BENCH_BASELINE_JSON)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Also store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=BENCH_REGRESSION_PCT,
+                        help="%% change in ns/row counted as a regression/speedup")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="Exit with status 1 if any function regressed")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    names = [n for n in args.only.split(",") if n] or list(FUNCTIONS)
+    unknown = [n for n in names if n not in FUNCTIONS]
+    if unknown:
+        parser.error(f"unknown function(s): {', '.join(unknown)}")
+
+    print(f"Benchmarking {len(names)} function(s) at {', '.join(f'{s:,}' for s in sizes)} rows")
+    current = run(sizes, names, args.repeat, args.seed)
+
+    comparison = []
+    if pathlib.Path(args.baseline).exists() and not args.save_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        comparison = compare(current, baseline, args.threshold)
+        current["baseline"] = {"path": args.baseline,
+                               "timestamp": baseline.get("meta", {}).get("timestamp", ""),
+                               "comparison": comparison}
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(current, f, ensure_ascii=False, indent=1)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=1)
+
+    print(f"\n{'─'*72}")
+    if comparison:
+        print(f"{'function':<30} {'rows':>9}  {'baseline':>10}  {'current':>10}  {'change':>8}")
+        for c in comparison:
+            print(f"{c['function']:<30} {c['size']:>9,}  {c['baseline_ns']:>8,.0f}ns"
+                  f"  {c['current_ns']:>8,.0f}ns  {c['change_pct']:>+7.1f}%  {c['verdict']}")
+    elif args.save_baseline:
+        print(f"Baseline saved      : {args.baseline}")
+    else:
+        print(f"No baseline at {args.baseline} — run with --save-baseline to create one")
+    print(f"Results             : {args.out}")
+    print(f"{'─'*72}")
+
+    if args.fail_on_regression and any(c["verdict"] == "REGRESSION" for c in comparison):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
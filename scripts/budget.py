@@ -0,0 +1,184 @@
+"""
+budget.py
+─────────
+Budget mode for the AI stage (ai_transform.py --max-calls / --max-tokens / --deadline).
+
+Without a budget, uncached rows go to Gemini in file order, so when the quota
+or the time runs out, the rows left with raw-name fallbacks are simply the last
+ones in the file — servers and laptops as likely as cables.
+
+With a budget, ai_transform.py first ranks the distinct uncached products by
+commercial value
+
+    value = price (USD) × available quantity × supplier weight
+
+(weights from AI_BUDGET_SUPPLIER_WEIGHTS), puts products deferred by earlier
+runs ahead of everything else, and normalises in that order until a limit is
+reached.  The products it didn't get to are still exported, with raw-name
+fallbacks (not cached), and saved to scripts/ai_pending.csv so the next run
+starts with them.
+
+Limits are checked between batches: a batch whose retries push the call count
+past --max-calls is still finished.  --max-tokens and --deadline also stop one
+batch early when an average batch would no longer fit.
+
+pipeline.py streams rows into the AI stage as they are preprocessed, so it
+can't rank them — budget runs use preprocess.py + ai_transform.py (whose
+--stream option has no effect in budget mode).
+"""
+
+import argparse
+import csv
+import pathlib
+import re
+import time
+from datetime import date, datetime, timedelta
+
+from config import AI_BUDGET_SUPPLIER_WEIGHTS
+
+PENDING_HEADERS = ["key", "supplier", "brand_raw", "model", "name_raw", "category_raw",
+                   "value_usd", "first_deferred", "times_deferred"]
+
+_DURATION_RE = re.compile(r"^(\d+(?:\.\d+)?)\s*([smh]?)$")
+_CLOCK_RE    = re.compile(r"^(\d{1,2}):(\d{2})$")
+_UNIT_S      = {"": 1, "s": 1, "m": 60, "h": 3600}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Limits
+# ─────────────────────────────────────────────────────────────────────────────
+
+def parse_deadline(value: str) -> float:
+    """--deadline value → epoch seconds: "900", "45m", "2h" from now, or a clock time "18:30"."""
+    text = value.strip().lower()
+    m = _DURATION_RE.match(text)
+    if m:
+        return time.time() + float(m[1]) * _UNIT_S[m[2]]
+    m = _CLOCK_RE.match(text)
+    if m and int(m[1]) < 24 and int(m[2]) < 60:
+        now    = datetime.now()
+        target = now.replace(hour=int(m[1]), minute=int(m[2]), second=0, microsecond=0)
+        if target <= now:
+            target += timedelta(days=1)
+        return target.timestamp()
+    raise argparse.ArgumentTypeError(f"invalid deadline {value!r} (use 900, 45m, 2h or HH:MM)")
+
+
+class Budget:
+    def __init__(self, max_calls: int | None = None, max_tokens: int | None = None,
+                 deadline: float | None = None):
+        self.max_calls  = max_calls
+        self.max_tokens = max_tokens
+        self.deadline   = deadline     # epoch seconds
+        self.batches    = 0
+        self.seconds    = 0.0          # wall time spent in batches so far
+
+    @property
+    def active(self) -> bool:
+        return any(v is not None for v in (self.max_calls, self.max_tokens, self.deadline))
+
+    def spend(self, seconds: float) -> None:
+        """Record one finished batch."""
+        self.batches += 1
+        self.seconds += seconds
+
+    def exhausted(self, metrics) -> str | None:
+        """Reason to stop before the next batch, or None to go on."""
+        calls  = metrics.counters.get("gemini", {}).get("calls", 0)
+        tokens = metrics.counters.get("gemini_tokens", {})
+        used   = tokens.get("prompt_tokens", 0) + tokens.get("output_tokens", 0)
+        per_batch_tokens = used / self.batches if self.batches else 0
+        per_batch_s      = self.seconds / self.batches if self.batches else 0
+        if self.max_calls is not None and calls >= self.max_calls:
+            return f"--max-calls {self.max_calls} reached"
+        if self.max_tokens is not None and used + per_batch_tokens > self.max_tokens:
+            return f"--max-tokens {self.max_tokens:,} reached ({used:,} used)"
+        if self.deadline is not None and time.time() + per_batch_s > self.deadline:
+            return f"--deadline {datetime.fromtimestamp(self.deadline):%H:%M:%S} reached"
+        return None
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Ranking
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _number(value) -> float:
+    try:
+        return float(str(value).replace(",", "").strip())
+    except ValueError:
+        return 0.0
+
+
+def row_value(row: dict, cb_rate: float, supplier_types: dict) -> float:
+    """Commercial value (USD) of one intermediate row: price × available quantity × weight."""
+    price = _number(row.get("price_raw", ""))
+    if row.get("currency") == "AMD" and cb_rate:
+        price /= cb_rate
+    qty      = max(_number(row.get("availableQuantity", "")), 1.0)
+    supplier = row.get("supplier", "")
+    weight   = AI_BUDGET_SUPPLIER_WEIGHTS.get(
+        supplier, AI_BUDGET_SUPPLIER_WEIGHTS.get(supplier_types.get(supplier, ""), 1.0))
+    return price * qty * weight
+
+
+def rank(values: dict, pending: dict) -> list:
+    """Product keys in normalisation order: pending ones first, then by value (highest first)."""
+    return sorted(values, key=lambda k: (k not in pending, -values[k]))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Pending queue
+# ─────────────────────────────────────────────────────────────────────────────
+
+def load_pending(path: str) -> dict:
+    """key → queue row from a previous budget run ({} if there is none)."""
+    if not pathlib.Path(path).exists():
+        return {}
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return {r["key"]: r for r in csv.DictReader(f) if r.get("key")}
+
+
+def save_pending(path: str, pending: dict, deferred: dict) -> None:
+    """Replace the queue with this run's deferred products.
+
+    deferred: key → (intermediate row, value).  Products queued earlier keep
+    their first_deferred date; products no longer deferred (normalised, or
+    gone from the feed) drop out.
+    """
+    today = date.today().isoformat()
+    rows  = []
+    for key, (row, value) in deferred.items():
+        old = pending.get(key, {})
+        rows.append({
+            "key":            key,
+            "supplier":       row.get("supplier", ""),
+            "brand_raw":      row.get("brand_raw", ""),
+            "model":          row.get("model", ""),
+            "name_raw":       row.get("name_raw", ""),
+            "category_raw":   row.get("category_raw", ""),
+            "value_usd":      f"{value:.2f}",
+            "first_deferred": old.get("first_deferred") or today,
+            "times_deferred": int(old.get("times_deferred") or 0) + 1,
+        })
+    rows.sort(key=lambda r: -float(r["value_usd"]))
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=PENDING_HEADERS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Command-line glue
+# ─────────────────────────────────────────────────────────────────────────────
+
+def add_budget_args(parser) -> None:
+    parser.add_argument("--max-calls", type=int, metavar="N",
+                        help="Budget mode: stop normalising after N Gemini calls")
+    parser.add_argument("--max-tokens", type=int, metavar="N",
+                        help="Budget mode: stop before N prompt + output tokens are used")
+    parser.add_argument("--deadline", type=parse_deadline, metavar="WHEN",
+                        help="Budget mode: stop normalising at 900 / 45m / 2h from now, or HH:MM")
+
+
+def budget_from_args(args) -> Budget:
+    return Budget(args.max_calls, args.max_tokens, args.deadline)
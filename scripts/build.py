@@ -0,0 +1,508 @@
+#!/usr/bin/env python3
+"""
+build.py
+────────
+Incremental full run: every stage output is stored under a hash of its
+inputs, and a stage only runs when that hash changed.
+
+    stage        inputs (→ key)                                       artifact
+    preprocess   raw export, suppliers.csv, brands.csv, filter           intermediate.csv
+                 settings, preprocess code
+    enrich       intermediate artifact, cache entries of its products,   enriched.csv
+                 prompt + Gemini settings, --tiered/--similar, code      (intermediate + AI fields)
+    price        enriched artifact, pricing tables, exchange rate,       output_import.csv,
+                 suppliers.csv, delivery_times.csv, --consolidate,       price_debug.csv
+                 --debug-csv, code                                       (+ price audit run)
+    export       output_import.csv artifact, export code                 output_import.ndjson.gz
+    delta        — always runs (compares with the last exported catalog, catalog_manifest.json)
+
+So when only delivery_times.csv or a margin in config.py changed, preprocess
+and enrich are reused from the store and only price + export run.  A stage
+whose inputs changed but whose output came out byte-identical leaves the
+next stage skipped (keys use the artifact's content, not its run).
+
+Config settings are assigned to stages in STAGE_CONFIG.  Settings that cannot
+change any output (paths, upload / benchmark / service knobs) are ignored;
+any other setting that isn't assigned counts for every stage — a new setting
+can cause extra work, never a stale artifact.
+
+Enrichment writes new Gemini results into the product cache, which is one of
+its own inputs, so its artifact is stored under the key computed *after* the
+run (the inputs that reproduce it from cache hits alone).  A run with Gemini
+failures (raw-name fallbacks) isn't stored at all, so the failed products are
+retried next time.
+
+Artifacts live in STAGE_STORE_DIR/<stage>/<key>/ (the last STAGE_STORE_KEEP
+per stage are kept) and are copied to the usual output paths.
+
+Run from repo root:
+    python scripts/build.py                  # run what changed
+    python scripts/build.py --explain        # …and say why each stage ran or was skipped
+    python scripts/build.py --force price    # re-run a stage even if its inputs are unchanged
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import pathlib
+import re
+import shutil
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+import config
+from config import (
+    RAW_CSV, SUPPLIERS_CSV, BRANDS_CSV, DELIVERY_TIMES_CSV, INTERMEDIATE_CSV, ERROR_LOG,
+    PRODUCT_CACHE_CSV, GEMINI_FAILED_CSV, AI_BATCH_SIZE, CATALOG_MANIFEST, OUTPUT_DELTA_JSON,
+    CATALOG_MANIFEST_PENDING,
+    CONSOLIDATE_OFFERS, CONSOLIDATION_POLICY, STAGE_STORE_DIR, STAGE_STORE_KEEP,
+)
+from consolidate import PricedRows, apply_consolidation, apply_dedupe
+from catalog_delta import export_delta
+from metrics import Metrics, add_metrics_args, finish_metrics
+from portal_upload import write_ndjson_gz
+from records import read_records, record_type
+import preprocess
+import ai_transform
+import price_audit
+
+STAGES = ["preprocess", "enrich", "price", "export"]
+
+# config.py settings each stage's output depends on (see module docstring)
+STAGE_CONFIG = {
+    "preprocess": ["STOCK_LOW_MAX", "GLOBAL_BLOCKED_BRANDS", "PHONIX_BLOCKED_BRANDS",
+                   "PHONIX_BLOCKED_CATEGORIES", "REFURB_KEYWORDS", "HUBX_BLOCKED_CATEGORIES",
+                   "IMCOPEX_BLOCKED_CATEGORIES", "IMCOPEX_BLOCKED_BRANDS"],
+    "enrich":     ["AI_BATCH_SIZE", "CATEGORIES", "GEMINI_BACKEND", "GEMINI_MODEL",
+                   "GEMINI_NAME_MAX_CHARS", "GEMINI_TIERS", "GEMINI_ESCALATE_CONFIDENCE",
+                   "GEMINI_ESCALATE_FLAGS", "GEMINI_SYNTHETIC"],
+    "price":      ["INTL_VAT_RATE", "INTL_BTF_RATE", "INTL_CBF_RATE", "INTL_REGIONS",
+                   "INTL_PRODUCT_SPECS", "CATEGORY_TO_PRODUCT_TYPE", "LOCAL_USD_MARGIN",
+                   "LOCAL_AMD_MARGIN", "CB_RATE_OVERRIDE", "CONSOLIDATION_POLICY"],
+    "export":     [],
+}
+_NO_OUTPUT_EFFECT_RE = re.compile(
+    r"_(CSV|JSON|JSONL|GZ|DB|DIR|INDEX|LOG|URL)$|^(BENCH|DAEMON|QUOTE|UPLOAD|PORTAL|STAGE_STORE"
+    r"|BACKFILL|BATCH_SERVER|IMPORT_SERVER|CACHE_ARCHIVE|CACHE_SNAPSHOT|PRICE_AUDIT|LOAD_TEST)_"
+    r"|^(GEMINI_API_KEY|GEMINI_PROMPT_CACHE|GEMINI_PROMPT_CACHE_TTL_S|GEMINI_STREAM|GEMINI_TIERED"
+    r"|GEMINI_PLAN"
+    r"|GEMINI_RETRY_\w+|PIPELINE_QUEUE_SIZE|AI_BUDGET_SUPPLIER_WEIGHTS|CONSOLIDATE_OFFERS"
+    r"|SIMILARITY_REUSE|SIMILARITY_THRESHOLD|CATALOG_MANIFEST|CATALOG_MANIFEST_PENDING|PRICE_AUDIT|WRITE_PRICE_DEBUG_CSV)$"
+)   # the last few are CLI defaults; the flags themselves are stage inputs
+
+# Source files whose code shapes each stage's output
+STAGE_CODE = {
+    "preprocess": ["preprocess.py", "records.py"],
+    "enrich":     ["ai_transform.py", "gemini_backend.py", "similarity.py", "records.py"],
+    "price":      ["ai_transform.py", "catalog_delta.py", "consolidate.py", "records.py"],
+    "export":     ["portal_upload.py", "catalog_delta.py"],
+}
+
+AI_FIELDS       = ["name", "sku", "category", "brand"]
+ENRICHED_FIELDS = preprocess.INTERMEDIATE_HEADERS + [f"ai_{f}" for f in AI_FIELDS]
+EnrichedRow     = record_type("EnrichedRow", ENRICHED_FIELDS)
+
+_SCRIPTS_DIR = pathlib.Path(__file__).parent
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Hashing
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _canonical(value):
+    """JSON-able form with a stable order (sets and dict keys sorted)."""
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (set, frozenset)):
+        return sorted((_canonical(v) for v in value), key=repr)
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+
+def digest_value(value) -> str:
+    data = json.dumps(_canonical(value), sort_keys=True, ensure_ascii=False, default=repr)
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def digest_file(path: str) -> str | None:
+    """Content hash of a file (None if it doesn't exist)."""
+    if not pathlib.Path(path).exists():
+        return None
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def config_inputs(stage: str) -> dict:
+    """{"config:NAME": digest} of the settings the stage depends on."""
+    claimed = {name for names in STAGE_CONFIG.values() for name in names}
+    names = set(STAGE_CONFIG[stage])
+    for name in dir(config):
+        if name.isupper() and name not in claimed and not _NO_OUTPUT_EFFECT_RE.search(name):
+            names.add(name)          # unassigned → counts for every stage
+    return {f"config:{n}": digest_value(getattr(config, n)) for n in sorted(names)
+            if hasattr(config, n)}
+
+
+def code_inputs(stage: str) -> dict:
+    return {f"code:{name}": digest_file(str(_SCRIPTS_DIR / name)) for name in STAGE_CODE[stage]}
+
+
+def cache_digest(rows: list, product_cache: dict) -> str:
+    """Hash of the cache entries (AI fields) of the products in rows."""
+    h = hashlib.blake2b(digest_size=16)
+    for key in sorted({r["model"].strip().lower() for r in rows}):
+        entry = product_cache.get(key)
+        fields = "\x1f".join(entry.get(f, "") for f in AI_FIELDS) if entry is not None else "\x00"
+        h.update(f"{key}\x1e{fields}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def stage_key(inputs: dict) -> str:
+    return digest_value(inputs)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Artifact store
+# ─────────────────────────────────────────────────────────────────────────────
+
+class StageStore:
+    def __init__(self, root: str, keep: int = STAGE_STORE_KEEP):
+        self.root = pathlib.Path(root)
+        self.keep = keep
+
+    def path(self, stage: str, key: str) -> pathlib.Path:
+        return self.root / stage / key
+
+    def get(self, stage: str, key: str) -> pathlib.Path | None:
+        p = self.path(stage, key)
+        return p if (p / "meta.json").exists() else None
+
+    def last(self, stage: str) -> dict | None:
+        """meta.json of the stage's most recent run or reuse."""
+        p = self.root / stage / "last.json"
+        if not p.exists():
+            return None
+        with open(p, encoding="utf-8") as f:
+            return json.load(f)
+
+    def put(self, stage: str, key: str, inputs: dict, work: pathlib.Path) -> pathlib.Path:
+        """Move the files a stage wrote to work/ into the store under key."""
+        meta = {"key": key, "stage": stage, "created": datetime.now().isoformat(timespec="seconds"),
+                "inputs": inputs, "files": sorted(p.name for p in work.iterdir())}
+        with open(work / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=1)
+        p = self.path(stage, key)
+        shutil.rmtree(p, ignore_errors=True)
+        work.rename(p)
+        self._prune(stage, keep_key=key)
+        return p
+
+    def mark_last(self, stage: str, key: str) -> dict:
+        """Record key as the stage's current artifact (for --explain and pruning)."""
+        p = self.path(stage, key)
+        with open(p / "meta.json", encoding="utf-8") as f:
+            meta = json.load(f)
+        os.utime(p)
+        with open(self.root / stage / "last.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=1)
+        return meta
+
+    def _prune(self, stage: str, keep_key: str) -> None:
+        dirs = [d for d in (self.root / stage).iterdir()
+                if d.is_dir() and d.name not in (keep_key, ".work")]
+        dirs.sort(key=lambda d: d.stat().st_mtime, reverse=True)
+        for d in dirs[self.keep - 1:]:
+            shutil.rmtree(d, ignore_errors=True)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Explain
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _label(component: str) -> str:
+    kind, _, name = component.partition(":")
+    return {"config": f"{name} (config.py)", "code": f"{name} (code)",
+            "file": name, "artifact": f"{name} output", "flag": f"--{name}",
+            "cache": "product cache entries", "prompt": "Gemini prompt",
+            "rate": "exchange rate"}.get(kind, component)
+
+
+def explain_change(previous: dict | None, inputs: dict) -> str:
+    if previous is None:
+        return "no earlier run"
+    before = previous.get("inputs", {})
+    changed = [c for c in inputs if before.get(c) != inputs[c]]
+    changed += [c for c in before if c not in inputs]
+    if not changed:
+        return "inputs unchanged but no stored artifact"
+    shown = ", ".join(_label(c) for c in changed[:6])
+    more  = f" and {len(changed) - 6} more" if len(changed) > 6 else ""
+    return f"changed: {shown}{more}"
+
+
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Stages  (each writes its artifact files into work/)
+# ─────────────────────────────────────────────────────────────────────────────
+
+def run_preprocess(work: pathlib.Path, metrics: Metrics) -> bool:
+    supplier_config = preprocess.load_supplier_config(SUPPLIERS_CSV)
+    known_brands    = preprocess.load_brands(BRANDS_CSV)
+    stats = preprocess.new_stats(metrics)
+    rows  = list(preprocess.iter_intermediate_rows(RAW_CSV, supplier_config, known_brands, stats))
+    preprocess.report_unknown_suppliers(stats)
+    preprocess.write_intermediate(str(work / "intermediate.csv"), rows)
+    preprocess.write_error_log(str(work / "parse_errors.csv"), stats["errors"])
+    print(f"  {stats['total_raw']} raw lines → {len(rows)} rows "
+          f"({stats['skipped']} skipped, {len(stats['errors'])} parse errors)")
+    return True
+
+
+def run_enrich(work: pathlib.Path, rows: list, product_cache: dict, stats: dict) -> bool:
+    """Enrich rows into work/enriched.csv; False if any row fell back to raw values."""
+    n_batches = -(-len(rows) // AI_BATCH_SIZE)
+    with open(work / "enriched.csv", "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(ENRICHED_FIELDS)
+        for b in range(n_batches):
+            batch = rows[b * AI_BATCH_SIZE:(b + 1) * AI_BATCH_SIZE]
+            ai_results, called_gemini = ai_transform.enrich_batch(
+                batch, product_cache, stats, f"Batch {b + 1}/{n_batches}")
+            for r, ai in zip(batch, ai_results):
+                writer.writerow([r[h] for h in preprocess.INTERMEDIATE_HEADERS]
+                                + [ai.get(field, "") for field in AI_FIELDS])
+            # Small delay only when Gemini was actually called (to avoid rate-limiting)
+            if called_gemini and b < n_batches - 1:
+                time.sleep(0.5)
+
+    if stats["seen"]:
+        ai_transform.mark_seen(product_cache, stats["seen"])
+        stats["cache_updated"] = True
+    if stats["cache_updated"]:
+        ai_transform.save_product_cache(PRODUCT_CACHE_CSV, product_cache)
+    if stats["failed_updated"]:
+        ai_transform.save_failed_cache(GEMINI_FAILED_CSV, stats["failed"])
+    if stats["similar"] is not None:
+        stats["similar"].save()
+    print(f"  Cache: {stats['cache_hits']} hits, {stats['cache_misses']} misses")
+    if any(r["model"].strip().lower() in stats["failed"] for r in rows):
+        print("  ⚠  Gemini failures (raw-name fallbacks) — not stored, retried next run")
+        return False
+    return True
+
+
+def run_price(work: pathlib.Path, enriched: list, ctx: dict, stats: dict,
+              consolidate: bool, debug_csv: bool = True, audit: bool = False) -> bool:
+    inter = [preprocess.IntermediateRow({h: r[h] for h in preprocess.INTERMEDIATE_HEADERS})
+             for r in enriched]
+    ai = [{field: r[f"ai_{field}"] for field in AI_FIELDS} for r in enriched]
+    priced = PricedRows(dedupe=not consolidate)
+    priced.extend(*ai_transform.price_batch(inter, ai, ctx, stats, priced))
+    output_rows, debug_rows = priced.output_rows, priced.debug_rows
+    if consolidate:
+        output_rows = apply_consolidation(output_rows, debug_rows, CONSOLIDATION_POLICY,
+                                          str(work / "output_alternatives.csv"))
+    else:
+        stats["duplicates"] = apply_dedupe(priced, str(work / "output_duplicates.csv"))
+    ai_transform.write_csv(str(work / "output_import.csv"), ai_transform.OUTPUT_HEADERS, output_rows)
+    if debug_csv:
+        ai_transform.write_csv(str(work / "price_debug.csv"), ai_transform.DEBUG_HEADERS, debug_rows)
+    if audit:
+        price_audit.record_run(debug_rows, ai_transform.DEBUG_HEADERS, "build", ctx["cb_rate"])
+    print(f"  {len(output_rows)} products priced"
+          + (f" ({stats['duplicates']} duplicate IDs dropped)" if stats["duplicates"] else ""))
+    return True
+
+
+def read_output(path: pathlib.Path) -> list[dict]:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return list(csv.DictReader(f))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Build
+# ─────────────────────────────────────────────────────────────────────────────
+
+class Build:
+    def __init__(self, store: StageStore, metrics: Metrics, force: list[str]):
+        self.store   = store
+        self.metrics = metrics
+        self.force   = set(force)
+        self.report  = []      # (stage, "ran" / "reused", key, reason)
+        paths = ai_transform.output_paths(False)
+        # Artifact file → the output path it is published to
+        self.destinations = {
+            "intermediate.csv": INTERMEDIATE_CSV, "parse_errors.csv": ERROR_LOG,
+            "output_import.csv": paths["output"], "price_debug.csv": paths["debug"],
+            "output_alternatives.csv": paths["alternatives"],
+            "output_duplicates.csv": paths["duplicates"],
+            "output_import.ndjson.gz": paths["ndjson"],
+        }
+
+    def stage(self, name: str, inputs: dict, run, rekey=None) -> pathlib.Path:
+        """Directory holding the stage's artifact for inputs — reused, or run(work) now.
+
+        run returns False when its output must not be stored (it's then used
+        from the work directory for this build only).  rekey() gives the
+        inputs to store the artifact under, if the run changed them.
+        """
+        key      = stage_key(inputs)
+        previous = self.store.last(name)
+        forced   = bool(self.force & {name, "all"})
+        found    = None if forced else self.store.get(name, key)
+        if found is not None:
+            meta = self.store.mark_last(name, key)
+            same = previous is not None and previous.get("key") == key
+            self.report.append((name, "reused", key, "inputs unchanged" if same else
+                                f"inputs match the artifact from {meta['created']}"))
+            self._publish(found)
+            return found
+
+        reason = "--force" if forced else explain_change(previous, inputs)
+        print(f"\n▶  {name} — {reason}")
+        work = self.store.root / name / ".work"
+        shutil.rmtree(work, ignore_errors=True)
+        work.mkdir(parents=True)
+        with self.metrics.stage(name):
+            keep = run(work)
+        if not keep:
+            self.report.append((name, "ran", key, reason + " (not stored)"))
+            self._publish(work)
+            return work
+        if rekey is not None:
+            inputs = rekey()
+            key    = stage_key(inputs)
+        found = self.store.put(name, key, inputs, work)
+        self.store.mark_last(name, key)
+        self.report.append((name, "ran", key, reason))
+        self._publish(found)
+        return found
+
+    def _publish(self, artifact_dir: pathlib.Path) -> None:
+        """Copy the artifact files to the usual output paths."""
+        for name, dest in self.destinations.items():
+            if (artifact_dir / name).exists():
+                shutil.copyfile(artifact_dir / name, dest)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--explain", action="store_true",
+                        help="Print why each stage ran or was reused")
+    parser.add_argument("--force", action="append", default=[], choices=STAGES + ["all"],
+                        help="Re-run a stage even if its inputs are unchanged (repeatable)")
+    parser.add_argument("--consolidate", action=argparse.BooleanOptionalAction,
+                        default=CONSOLIDATE_OFFERS,
+                        help="Collapse offers with the same SKU to one product (see consolidate.py)")
+    ai_transform.add_gemini_args(parser)
+    price_audit.add_audit_args(parser)
+    add_metrics_args(parser)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    metrics = Metrics("build")
+    build   = Build(StageStore(STAGE_STORE_DIR), metrics, args.force)
+
+    # ── preprocess ──
+    inputs = {"file:raw export": digest_file(RAW_CSV),
+              "file:suppliers.csv": digest_file(SUPPLIERS_CSV),
+              "file:brands.csv": digest_file(BRANDS_CSV),
+              **config_inputs("preprocess"), **code_inputs("preprocess")}
+    pre_dir = build.stage("preprocess", inputs, lambda work: run_preprocess(work, metrics))
+
+    # ── enrich ──
+    with metrics.stage("cache_load"):
+        product_cache = ai_transform.load_product_cache(PRODUCT_CACHE_CSV)
+        rows = read_records(str(pre_dir / "intermediate.csv"), preprocess.IntermediateRow)
+    prompt = ai_transform.TIERED_SYSTEM_PROMPT if args.tiered else ai_transform.SYSTEM_PROMPT
+
+    def enrich_inputs() -> dict:
+        return {"artifact:preprocess": digest_file(str(pre_dir / "intermediate.csv")),
+                "cache": cache_digest(rows, product_cache),
+                "prompt": digest_value(prompt),
+                "flag:tiered": args.tiered,
+                "flag:similar": args.similar_threshold if args.similar else False,
+                **config_inputs("enrich"), **code_inputs("enrich")}
+
+    gemini_used = False
+
+    def enrich(work: pathlib.Path) -> bool:
+        nonlocal gemini_used
+        ai_transform.set_gemini_backend(args.gemini_backend, args.prompt_cache, args.tiered)
+        gemini_used = True
+        similar = (ai_transform.load_similarity_index(product_cache, args.similar_threshold)
+                   if args.similar else None)
+        stats = ai_transform.new_run_stats(
+            metrics, ai_transform.load_failed_cache(GEMINI_FAILED_CSV), similar)
+        return run_enrich(work, rows, product_cache, stats)
+
+    # Stored under the inputs *after* the run: the cache now holds its Gemini results
+    try:
+        enrich_dir = build.stage("enrich", enrich_inputs(), enrich, rekey=enrich_inputs)
+    finally:
+        if gemini_used:
+            ai_transform.close_gemini_backend()   # also when the stage fails
+    if not gemini_used:
+        # Reused: the products were still seen in this export (cache last_seen / hits)
+        seen = {}
+        for r in rows:
+            key = r["model"].strip().lower()
+            seen[key] = seen.get(key, 0) + 1
+        if ai_transform.mark_seen(product_cache, seen):
+            ai_transform.save_product_cache(PRODUCT_CACHE_CSV, product_cache)
+
+    # ── price ──
+    with metrics.stage("context"):
+        ctx = ai_transform.load_run_context(args.cb_rate)
+    inputs = {"artifact:enrich": digest_file(str(enrich_dir / "enriched.csv")),
+              "rate": ctx["cb_rate"],
+              "file:suppliers.csv": digest_file(SUPPLIERS_CSV),
+              "file:delivery_times.csv": digest_file(DELIVERY_TIMES_CSV),
+              "flag:consolidate": args.consolidate,
+              "flag:debug-csv": args.debug_csv,
+              **config_inputs("price"), **code_inputs("price")}
+
+    def price(work: pathlib.Path) -> bool:
+        enriched = read_records(str(enrich_dir / "enriched.csv"), EnrichedRow)
+        return run_price(work, enriched, ctx, ai_transform.new_run_stats(metrics), args.consolidate,
+                         args.debug_csv, args.price_audit)
+
+    price_dir = build.stage("price", inputs, price)
+    if not args.debug_csv:
+        ai_transform.write_price_debug(build.destinations["price_debug.csv"], [], enabled=False)
+    output_rows = read_output(price_dir / "output_import.csv")
+
+    # ── export ──
+    inputs = {"artifact:price": digest_file(str(price_dir / "output_import.csv")),
+              **code_inputs("export")}
+    build.stage("export", inputs, lambda work: write_ndjson_gz(
+        str(work / "output_import.ndjson.gz"), output_rows) or True)
+
+    # ── delta (always: it compares with the catalog the portal last applied) ──
+    with metrics.stage("delta", rows=len(output_rows)):
+        delta = export_delta(output_rows, CATALOG_MANIFEST, OUTPUT_DELTA_JSON,
+                             CATALOG_MANIFEST_PENDING)
+    build.report.append(("delta", "ran", "", "always (compares with the last applied catalog)"))
+
+    print(f"\n{'─'*50}")
+    for name, action, key, reason in build.report:
+        print(f"{name:<11} {action:<7}" + (f" {key[:12]:<12}  {reason}" if args.explain else ""))
+    print(f"{'─'*50}")
+    print(f"Products            : {len(output_rows)}  → {build.destinations['output_import.csv']}")
+    print(f"Delta               : +{len(delta['added'])} added, ~{len(delta['changed'])} changed, "
+          f"-{len(delta['removed'])} removed  → {OUTPUT_DELTA_JSON}")
+    print(f"Elapsed             : {time.perf_counter() - started:.1f}s")
+    finish_metrics(metrics, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+cache_snapshot.py
+─────────────────
+Export, merge and import product cache snapshots, so Gemini results paid for
+on one workstation don't get requested again on another.
+
+A snapshot is the product cache (hot cache + archive) split into
+CACHE_SNAPSHOT_SHARDS shards by a hash of the key.  Each shard is JSONL
+(one entry per line, sorted by key, with its status and timestamps),
+gzip-compressed and stored as objects/<hash>.jsonl.gz under the hash of its
+content.  The manifest <id>.json lists the shards; the id is the hash of
+that list, so the same entries always give the same id.  Snapshots from
+every machine can share one folder (a network drive, a synced directory):
+no two files ever have the same name with different content, and a shard
+that didn't change between two snapshots is stored once.
+
+Two entries for the same product are merged deterministically, whatever the
+order of the snapshots:
+  1. a reviewed entry (any status other than NEW) wins over a NEW one
+  2. then the newer one (updated — when the normalisation was made)
+  3. then the greater content, as a tie-break
+first_seen / last_seen / hits are combined (earliest, latest, largest), so
+importing the same snapshot twice changes nothing.
+
+Run from repo root:
+    python scripts/cache_snapshot.py export --note "after DG backfill"
+    python scripts/cache_snapshot.py list
+    python scripts/cache_snapshot.py import 3f9c0a1e          # merge into product_cache.csv
+    python scripts/cache_snapshot.py merge 3f9c0a1e 77b2d5c0  # → a new combined snapshot
+    python scripts/cache_snapshot.py export --dir /mnt/shared/b2b-cache
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import pathlib
+import socket
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+from config import (
+    PRODUCT_CACHE_CSV, PRODUCT_CACHE_ARCHIVE_CSV, GEMINI_FAILED_CSV,
+    CACHE_SNAPSHOT_DIR, CACHE_SNAPSHOT_SHARDS,
+)
+import ai_transform
+from ai_transform import CACHE_FIELDS, CacheEntry
+
+SNAPSHOT_FORMAT = 1
+_CONTENT_FIELDS = [f for f in CACHE_FIELDS if f not in ("first_seen", "last_seen", "hits")]
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def shard_of(key: str, shards: int) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=4).digest(),
+                          "big") % shards
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Merge
+# ─────────────────────────────────────────────────────────────────────────────
+
+def entry_rank(entry) -> tuple:
+    """Sort key of a cache entry: the greatest one wins a merge."""
+    status = entry.get("status") or "NEW"
+    return (status != "NEW", entry.get("updated") or "",
+            tuple(entry.get(f) or "" for f in _CONTENT_FIELDS))
+
+
+def merge_entries(a, b) -> CacheEntry:
+    """One entry out of two for the same product (see module docstring)."""
+    win    = max(a, b, key=entry_rank)
+    merged = CacheEntry({f: win.get(f) or "" for f in CACHE_FIELDS})
+    merged["first_seen"] = min((e.get("first_seen") for e in (a, b) if e.get("first_seen")),
+                               default="")
+    merged["last_seen"]  = max(a.get("last_seen") or "", b.get("last_seen") or "")
+    merged["hits"]       = str(max(int(a.get("hits") or 0), int(b.get("hits") or 0)))
+    return merged
+
+
+def merge_caches(caches: list[dict]) -> dict:
+    merged = {}
+    for cache in caches:
+        for key, entry in cache.items():
+            merged[key] = entry if key not in merged else merge_entries(merged[key], entry)
+    return merged
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Snapshot store
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _write_new(path: pathlib.Path, data: bytes) -> None:
+    """Write via a temporary file, so a reader never sees half an object."""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def write_snapshot(root: str, entries: dict, shards: int = CACHE_SNAPSHOT_SHARDS,
+                   note: str = "") -> tuple[str, int]:
+    """Store entries as a snapshot → (snapshot id, shard objects newly written)."""
+    objects = pathlib.Path(root) / "objects"
+    objects.mkdir(parents=True, exist_ok=True)
+    buckets = [[] for _ in range(shards)]
+    for key in sorted(entries):
+        buckets[shard_of(key, shards)].append(key)
+
+    shard_list, written = [], 0
+    for keys in buckets:
+        data = "".join(
+            json.dumps({"model_raw": key, **{f: entries[key].get(f) or "" for f in CACHE_FIELDS}},
+                       ensure_ascii=False) + "\n"
+            for key in keys).encode("utf-8")
+        digest = _digest(data)
+        path   = objects / f"{digest}.jsonl.gz"
+        if not path.exists():
+            _write_new(path, gzip.compress(data, mtime=0))
+            written += 1
+        shard_list.append({"object": digest, "entries": len(keys)})
+
+    snap_id  = _digest(json.dumps(shard_list, sort_keys=True).encode("utf-8"))
+    manifest = {"format": SNAPSHOT_FORMAT, "id": snap_id, "entries": len(entries),
+                "shards": shard_list, "created": datetime.now().isoformat(timespec="seconds"),
+                "host": socket.gethostname(), "note": note}
+    path = pathlib.Path(root) / f"{snap_id}.json"
+    if not path.exists():           # same entries → same snapshot; keep the first manifest
+        _write_new(path, json.dumps(manifest, indent=2, ensure_ascii=False).encode("utf-8"))
+    return snap_id, written
+
+
+def list_snapshots(root: str) -> list[dict]:
+    manifests = []
+    for path in pathlib.Path(root).glob("*.json"):
+        with open(path, encoding="utf-8") as f:
+            manifests.append(json.load(f))
+    return sorted(manifests, key=lambda m: m["created"])
+
+
+def resolve(root: str, ref: str) -> pathlib.Path:
+    """Manifest path of a snapshot id, unique id prefix or manifest file path."""
+    if ref.endswith(".json") and pathlib.Path(ref).exists():
+        return pathlib.Path(ref)
+    matches = sorted(pathlib.Path(root).glob(f"{ref}*.json"))
+    if len(matches) != 1:
+        raise SystemExit(f"❌  {'No' if not matches else 'Ambiguous'} snapshot {ref!r} in {root}")
+    return matches[0]
+
+
+def read_snapshot(manifest_path: pathlib.Path) -> dict:
+    """Entries of a snapshot; its shard objects are read from the same folder."""
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise SystemExit(f"❌  {manifest_path}: unsupported snapshot format {manifest.get('format')}")
+    objects = manifest_path.parent / "objects"
+    entries = {}
+    for shard in manifest["shards"]:
+        data = gzip.decompress((objects / f"{shard['object']}.jsonl.gz").read_bytes())
+        if _digest(data) != shard["object"]:
+            raise SystemExit(f"❌  {manifest_path}: shard {shard['object']} is corrupt")
+        for line in data.decode("utf-8").splitlines():
+            row = json.loads(line)
+            entries[row["model_raw"]] = CacheEntry({f: row.get(f, "") for f in CACHE_FIELDS})
+    return entries
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Commands
+# ─────────────────────────────────────────────────────────────────────────────
+
+def import_entries(entries: dict, product_cache: dict, archive: dict,
+                   failed: dict) -> dict:
+    """Merge snapshot entries into the local caches (in place) → counters.
+
+    A merged entry goes into the hot cache unless it is the local archived
+    entry unchanged.  Products cached now are dropped from the negative cache.
+    """
+    counts = {"added": 0, "updated": 0, "unchanged": 0}
+    for key, entry in entries.items():
+        local = product_cache.get(key)
+        if local is None:
+            local = archive.get(key)
+        if local is None:
+            product_cache[key] = entry
+            counts["added"] += 1
+        else:
+            merged = merge_entries(local, entry)
+            if merged == local:
+                counts["unchanged"] += 1
+                continue
+            product_cache[key] = merged
+            counts["updated"] += 1
+        failed.pop(key, None)
+    return counts
+
+
+def _local_entries() -> dict:
+    """Hot cache and archive (the hot entry wins, see compact_cache.py)."""
+    return {**ai_transform.load_product_cache(PRODUCT_CACHE_ARCHIVE_CSV),
+            **ai_transform.load_product_cache(PRODUCT_CACHE_CSV)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["export", "import", "merge", "list"])
+    parser.add_argument("snapshots", nargs="*",
+                        help="Snapshot ids (or unique prefixes) for import / merge")
+    parser.add_argument("--dir", default=CACHE_SNAPSHOT_DIR, help="Snapshot folder")
+    parser.add_argument("--shards", type=int, default=CACHE_SNAPSHOT_SHARDS)
+    parser.add_argument("--note", default="", help="Description stored in the manifest")
+    args = parser.parse_args()
+
+    if args.command in ("import", "merge") and not args.snapshots:
+        parser.error(f"{args.command} needs at least one snapshot id")
+
+    if args.command == "list":
+        for m in list_snapshots(args.dir):
+            print(f"{m['id']}  {m['created']}  {m['entries']:>7} entries  {m['host']}"
+                  + (f"  — {m['note']}" if m["note"] else ""))
+        return
+
+    if args.command == "export":
+        entries = _local_entries()
+        snap_id, written = write_snapshot(args.dir, entries, args.shards, args.note)
+        print(f"Snapshot {snap_id}: {len(entries)} entries, {written} of {args.shards} "
+              f"shards new → {args.dir}")
+        return
+
+    snapshots = [read_snapshot(resolve(args.dir, ref)) for ref in args.snapshots]
+    for ref, entries in zip(args.snapshots, snapshots):
+        print(f"Snapshot {ref}: {len(entries)} entries")
+    entries = merge_caches(snapshots)
+
+    if args.command == "merge":
+        snap_id, written = write_snapshot(args.dir, entries, args.shards, args.note)
+        print(f"Merged snapshot {snap_id}: {len(entries)} entries, {written} shards new")
+        return
+
+    product_cache = ai_transform.load_product_cache(PRODUCT_CACHE_CSV)
+    archive       = ai_transform.load_product_cache(PRODUCT_CACHE_ARCHIVE_CSV)
+    failed        = ai_transform.load_failed_cache(GEMINI_FAILED_CSV)
+    n_failed      = len(failed)
+    counts = import_entries(entries, product_cache, archive, failed)
+    if counts["added"] or counts["updated"]:
+        ai_transform.save_product_cache(PRODUCT_CACHE_CSV, product_cache)
+    if len(failed) != n_failed:
+        ai_transform.save_failed_cache(GEMINI_FAILED_CSV, failed)
+    print(f"Product cache: +{counts['added']} added, ~{counts['updated']} updated, "
+          f"{counts['unchanged']} unchanged → {len(product_cache)} entries")
+    if len(failed) != n_failed:
+        print(f"  {n_failed - len(failed)} products dropped from the negative cache")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+catalog_delta.py
+────────────────
+Stable product IDs and catalog delta export for ai_transform.py.
+
+Every output row gets a deterministic ID derived from (supplier, normalised raw
+model) — the supplier's own model, as keyed in the product cache, not the SKU
+Gemini returns — so the same supplier offer keeps the same portal ID across
+runs, whatever the AI answered this time.  Cart and order references stay
+valid after re-imports.
+
+The manifest (scripts/catalog_manifest.json) is the catalog the portal is
+known to hold.  Each full run compares its output against it and writes
+scripts/output_delta.json:
+
+    {
+      "base":      "<generated timestamp of the previous manifest>",
+      "generated": "<timestamp of this run>",
+      "added":     [ {full product}, ... ],
+      "changed":   [ {"id": ..., <only the fields that changed>}, ... ],
+      "removed":   [ "<id>", ... ]
+    }
+
+Product fields in the manifest and delta use the portal's insertProductSchema
+types (integers for price/availableQuantity/moq, an array for
+visibleCustomerTypes) so the delta can be posted to /api/products/delta-import
+as-is.
+
+The run's own catalog goes to scripts/catalog_manifest.pending.json; it only
+becomes the manifest once the portal confirms the delta (portal_upload.py
+--delta, or --mark-applied below after applying it by other means) or a full
+upload replaces the portal catalog.  Until then every run diffs against the
+last applied catalog, so a delta that was never applied is folded into the
+next one rather than lost — only the latest delta needs to be applied.
+
+Run from repo root:
+    python scripts/catalog_delta.py --mark-applied   # output_delta.json was applied by hand
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import re
+import sys
+import uuid
+from datetime import datetime
+
+# Fixed namespace — changing it would re-key every product in the portal.
+PRODUCT_ID_NAMESPACE = uuid.UUID("6f1c7a52-3d0b-4b8e-9a41-b2b0c41da7e1")
+
+_WS_RE = re.compile(r"\s+")
+
+# Output columns that are integers in shared/schema.ts `products`.
+_INT_FIELDS = ("price", "availableQuantity", "moq")
+
+
+def normalize_sku_key(sku: str) -> str:
+    """Canonical form of a SKU for ID derivation: trimmed, upper-case, single spaces."""
+    return _WS_RE.sub(" ", (sku or "").strip()).upper()
+
+
+def product_id(supplier: str, sku: str, name: str = "") -> str:
+    """Deterministic portal ID for one supplier offer.
+
+    Keyed by (supplier, normalised SKU) — ai_transform.py passes the supplier's
+    raw model, never the SKU Gemini returned.  Rows without any SKU fall back to
+    the normalised product name so they still get a stable (if weaker) identity.
+    """
+    key = normalize_sku_key(sku)
+    if not key:
+        key = "NAME:" + normalize_sku_key(name)
+    return str(uuid.uuid5(PRODUCT_ID_NAMESPACE, f"{supplier.strip()}|{key}"))
+
+
+def _to_int(value) -> int:
+    try:
+        return int(float(value))
+    except (ValueError, TypeError):
+        return 0
+
+
+def to_portal_product(row: dict) -> dict:
+    """Convert one output_import.csv row into insertProductSchema field types."""
+    product = {}
+    for field, value in row.items():
+        if field == "id":
+            continue
+        if field in _INT_FIELDS:
+            product[field] = _to_int(value)
+        elif field == "visibleCustomerTypes":
+            product[field] = [t.strip() for t in str(value or "").split(";") if t.strip()]
+        else:
+            product[field] = "" if value is None else str(value)
+    return product
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Manifest
+# ─────────────────────────────────────────────────────────────────────────────
+
+def load_manifest(path: str) -> dict:
+    """Load the previous catalog manifest → {"generated": str, "products": {id: product}}.
+
+    Returns an empty manifest if the file doesn't exist yet (first run: everything is "added").
+    """
+    p = pathlib.Path(path)
+    if not p.exists():
+        return {"generated": "", "products": {}}
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return {"generated": data.get("generated", ""), "products": data.get("products", {})}
+
+
+def save_manifest(path: str, products: dict, generated: str) -> None:
+    """Write the exported catalog manifest (sorted by ID for stable diffs)."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"generated": generated, "products": dict(sorted(products.items()))},
+                  f, ensure_ascii=False, indent=1)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Delta
+# ─────────────────────────────────────────────────────────────────────────────
+
+def build_catalog(output_rows: list[dict]) -> dict:
+    """Return {id: portal product} for the rows of one run."""
+    return {row["id"]: to_portal_product(row) for row in output_rows}
+
+
+def compute_delta(previous: dict, current: dict) -> dict:
+    """Diff two {id: product} catalogs → {"added", "changed", "removed"}.
+
+    "changed" entries carry the ID plus only the fields whose value differs.
+    """
+    added, changed = [], []
+    for pid, product in current.items():
+        old = previous.get(pid)
+        if old is None:
+            added.append({"id": pid, **product})
+            continue
+        diff = {k: v for k, v in product.items() if old.get(k) != v}
+        if diff:
+            changed.append({"id": pid, **diff})
+    removed = sorted(pid for pid in previous if pid not in current)
+    return {"added": added, "changed": changed, "removed": removed}
+
+
+def write_delta(path: str, delta: dict, base: str, generated: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"base": base, "generated": generated, **delta},
+                  f, ensure_ascii=False, indent=1)
+
+
+def export_delta(output_rows: list[dict], manifest_path: str, delta_path: str,
+                 pending_path: str) -> dict:
+    """Diff this run against the applied manifest, write the delta file and the
+    pending manifest (the manifest itself only moves in mark_applied).
+
+    Returns the delta dict so the caller can print a summary.
+    """
+    previous  = load_manifest(manifest_path)
+    current   = build_catalog(output_rows)
+    generated = datetime.now().isoformat(timespec="seconds")
+    delta     = compute_delta(previous["products"], current)
+    write_delta(delta_path, delta, previous["generated"], generated)
+    save_manifest(pending_path, current, generated)
+    return delta
+
+
+def mark_applied(manifest_path: str, pending_path: str, delta_path: str) -> bool:
+    """The portal applied delta_path → promote its pending manifest to the manifest.
+
+    Returns False (nothing changed) if the pending manifest is not the one of
+    that delta — a later run replaced it, or it was promoted already.
+    """
+    if not (os.path.exists(pending_path) and os.path.exists(delta_path)):
+        return False
+    with open(delta_path, encoding="utf-8") as f:
+        generated = json.load(f).get("generated")
+    if load_manifest(pending_path)["generated"] != generated:
+        return False
+    os.replace(pending_path, manifest_path)
+    return True
+
+
+def mark_replaced(manifest_path: str, products: dict) -> None:
+    """A full upload replaced the portal catalog with products ({id: product})."""
+    save_manifest(manifest_path, products, datetime.now().isoformat(timespec="seconds"))
+
+
+def main():
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+    from config import CATALOG_MANIFEST, CATALOG_MANIFEST_PENDING, OUTPUT_DELTA_JSON
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mark-applied", action="store_true",
+                        help=f"Record that {OUTPUT_DELTA_JSON} was applied to the portal")
+    args = parser.parse_args()
+    if not args.mark_applied:
+        parser.error("nothing to do (see --mark-applied)")
+    if not mark_applied(CATALOG_MANIFEST, CATALOG_MANIFEST_PENDING, OUTPUT_DELTA_JSON):
+        sys.exit(f"❌  No pending manifest for {OUTPUT_DELTA_JSON} — already applied, "
+                 f"or a newer run replaced it (apply that run's delta instead)")
+    print(f"Manifest advanced → {CATALOG_MANIFEST}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+compact_cache.py
+────────────────
+Moves product cache entries that no run has looked up for a long time from
+product_cache.csv to the cold archive (PRODUCT_CACHE_ARCHIVE_CSV), so the hot
+cache every run loads only holds products suppliers still offer.
+
+Every run stamps the entries it uses (first_seen, last_seen, hits — see
+ai_transform.mark_seen).  An entry whose last_seen is older than --days
+(CACHE_ARCHIVE_AFTER_DAYS) is archived.  Nothing is lost: a run that meets an
+archived model again restores its entry into the hot cache instead of calling
+Gemini, and reviewed statuses survive the round trip.
+
+Entries cached before these columns existed have no last_seen; they are
+stamped with today's date, i.e. their clock starts with the first compaction.
+Archive entries that are also in the hot cache (restored since the last
+compaction) are dropped from the archive — the hot copy wins.
+
+The archive is written before the hot cache, so an interrupted run leaves an
+entry in both files at worst, never in neither.
+
+Run from repo root:
+    python scripts/compact_cache.py                  # archive entries unseen for a year
+    python scripts/compact_cache.py --days 180 --dry-run
+"""
+
+import argparse
+import os
+import pathlib
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+from config import PRODUCT_CACHE_CSV, PRODUCT_CACHE_ARCHIVE_CSV, CACHE_ARCHIVE_AFTER_DAYS
+import ai_transform
+
+
+def compact(product_cache: dict, archive: dict, days: int,
+            today: date | None = None) -> tuple[list[str], int, int]:
+    """Move stale entries from product_cache to archive (both modified in place).
+
+    → (archived keys, legacy entries stamped today, archive copies dropped)
+    """
+    today   = today or date.today()
+    cutoff  = (today - timedelta(days=days)).isoformat()
+    stamped = 0
+    stale   = []
+    for key, entry in product_cache.items():
+        if not entry.get("last_seen"):
+            entry["first_seen"] = entry.get("first_seen") or today.isoformat()
+            entry["last_seen"]  = today.isoformat()
+            entry["hits"]       = entry.get("hits") or "0"
+            stamped += 1
+        elif entry["last_seen"] < cutoff:
+            stale.append(key)
+
+    dropped = 0
+    for key in list(archive):
+        if key in product_cache:
+            del archive[key]
+            dropped += 1
+    for key in stale:
+        archive[key] = product_cache.pop(key)
+    return stale, stamped, dropped
+
+
+def _size(path: str) -> str:
+    p = pathlib.Path(path)
+    return f"{p.stat().st_size / 1024:,.0f} KB" if p.exists() else "—"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=CACHE_ARCHIVE_AFTER_DAYS,
+                        help="Archive entries not looked up for this many days")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Only report what would be archived")
+    args = parser.parse_args()
+
+    product_cache = ai_transform.load_product_cache(PRODUCT_CACHE_CSV)
+    archive       = ai_transform.load_product_cache(PRODUCT_CACHE_ARCHIVE_CSV)
+    print(f"Product cache: {len(product_cache)} entries ({_size(PRODUCT_CACHE_CSV)}), "
+          f"archive: {len(archive)} ({_size(PRODUCT_CACHE_ARCHIVE_CSV)})")
+
+    stale, stamped, dropped = compact(product_cache, archive, args.days)
+    if stamped:
+        print(f"  {stamped} entries without last_seen — stamped today")
+    if dropped:
+        print(f"  {dropped} restored entries dropped from the archive")
+    print(f"  {len(stale)} entries unseen for more than {args.days} days → archive")
+    for key in stale[:10]:
+        print(f"    {key}  (last seen {archive[key]['last_seen']}, "
+              f"{archive[key].get('hits') or 0} hits)")
+    if len(stale) > 10:
+        print(f"    … and {len(stale) - 10} more")
+
+    if args.dry_run:
+        print("Dry run — nothing written")
+        return
+    if not (stale or stamped or dropped):
+        print("Nothing to do")
+        return
+    # Archive first: an interrupted run duplicates an entry, never loses one
+    ai_transform.save_product_cache(PRODUCT_CACHE_ARCHIVE_CSV, archive)
+    ai_transform.save_product_cache(PRODUCT_CACHE_CSV, product_cache)
+    print(f"Product cache: {len(product_cache)} entries ({_size(PRODUCT_CACHE_CSV)}), "
+          f"archive: {len(archive)} ({_size(PRODUCT_CACHE_ARCHIVE_CSV)})")
+
+
+if __name__ == "__main__":
+    main()
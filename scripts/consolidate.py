@@ -0,0 +1,243 @@
+"""
+consolidate.py
+──────────────
+Optional cross-supplier offer consolidation (ai_transform.py / pipeline.py --consolidate).
+
+The same manufacturer SKU often arrives from several suppliers (DG, Compstyle,
+Proks SIA, ELKO, Siewert & Kau, …) or twice from one supplier (Offer and Price
+List rows).  Without consolidation every copy becomes its own portal product.
+
+This stage runs after pricing.  Rows are grouped by a normalised SKU key and one
+winning offer per group is kept, chosen by CONSOLIDATION_POLICY in config.py —
+an ordered list of criteria, compared left to right:
+
+    "price"  → lowest final AMD price
+    "stock"  → in_stock before low_stock before on_order
+    "eta"    → shortest delivery time (lower bound of "14-21 дней")
+
+The losing offers are written to scripts/output_alternatives.csv so sales can
+still see who else offers the product and at what price.
+Rows without a SKU are only merged with rows carrying the same product ID
+(same supplier and name), so IDs stay unique in the consolidated output.
+Without consolidation, rows sharing a product ID are reduced to one while
+the run is priced (PricedRows: in stock first, then the lowest price).
+
+A consolidated product's portal ID is derived from its SKU key alone
+(product_id("", key)), not from the winning supplier: when another supplier
+wins next run, the product keeps its ID, so carts and orders still point at
+it and the delta shows a change instead of a removal plus an addition.  The
+winner's own supplier offer ID is kept in the alternatives file
+(winner_offer_id).
+"""
+
+import csv
+import re
+import tempfile
+
+from catalog_delta import product_id
+
+# Separators that suppliers format inconsistently ("MZ-77E250B/EU" vs "MZ77E250B/EU")
+_SKU_NOISE_RE = re.compile(r"[\s\-_.]+")
+_ETA_DAYS_RE  = re.compile(r"\d+")
+
+_STOCK_RANK = {"in_stock": 0, "low_stock": 1, "on_order": 2, "out_of_stock": 3}
+
+ALTERNATIVES_HEADERS = [
+    "sku_key", "winner_id", "winner_offer_id", "winner_supplier", "winner_price",
+    "supplier", "id", "name", "sku", "price", "stock", "eta", "availableQuantity", "moq",
+]
+
+
+def sku_key(sku: str) -> str:
+    """Grouping key for one SKU: upper-case with spaces, hyphens, underscores and dots removed."""
+    return _SKU_NOISE_RE.sub("", (sku or "").upper())
+
+
+def eta_days(eta: str) -> int:
+    """Lower bound in days of an ETA string ("14-21 дней" → 14); unknown ETAs sort last."""
+    m = _ETA_DAYS_RE.search(eta or "")
+    return int(m.group()) if m else 10_000
+
+
+def _price(row: dict) -> int:
+    try:
+        return int(row["price"])
+    except (ValueError, TypeError, KeyError):
+        return 0
+
+
+_CRITERIA = {
+    "price": _price,
+    "stock": lambda row: _STOCK_RANK.get(row.get("stock", ""), len(_STOCK_RANK)),
+    "eta":   lambda row: eta_days(row.get("eta", "")),
+}
+
+
+def rank_key(policy: list[str]):
+    """Build a sort key for output rows from a policy such as ["price", "stock", "eta"]."""
+    unknown = [c for c in policy if c not in _CRITERIA]
+    if unknown:
+        raise ValueError(f"Unknown consolidation criteria {unknown}; use {sorted(_CRITERIA)}")
+    criteria = [_CRITERIA[c] for c in policy]
+    return lambda row: tuple(fn(row) for fn in criteria)
+
+
+def consolidate_offers(output_rows: list[dict], suppliers: list[str],
+                       policy: list[str]) -> tuple[list[dict], list[dict]]:
+    """Keep one offer per SKU key.
+
+    output_rows and suppliers are parallel lists (supplier of each output row).
+    Returns (winners in first-seen order, alternative rows for output_alternatives.csv).
+    Ties keep the earliest row, so results are stable for a given input order.
+    Winners with a SKU get the supplier-independent ID of their SKU key.
+    """
+    key_fn = rank_key(policy)
+    groups = {}      # sku_key → [(position, row, supplier), ...]  (insertion = first-seen order)
+
+    for pos, (row, supplier) in enumerate(zip(output_rows, suppliers)):
+        key = sku_key(row.get("sku", "")) or f"#{row['id']}"
+        groups.setdefault(key, []).append((pos, row, supplier))
+
+    winners      = []
+    alternatives = []
+    for key, offers in groups.items():
+        _, offer, best_supplier = min(offers, key=lambda o: (key_fn(o[1]), o[0]))
+        best = offer
+        if not key.startswith("#"):
+            # A copy: the daemon keeps the supplier rows and consolidates them again
+            best = type(offer)(offer)
+            best["id"] = product_id("", key)
+        winners.append(best)
+        for _, row, supplier in offers:
+            if row is offer:
+                continue
+            alternatives.append({
+                "sku_key":         key,
+                "winner_id":       best["id"],
+                "winner_offer_id": offer["id"],
+                "winner_supplier": best_supplier,
+                "winner_price":    best["price"],
+                "supplier":        supplier,
+                **{h: row.get(h, "") for h in ALTERNATIVES_HEADERS[6:]},
+            })
+    return winners, alternatives
+
+
+def write_alternatives(path: str, alternatives: list[dict]) -> None:
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=ALTERNATIVES_HEADERS)
+        writer.writeheader()
+        writer.writerows(alternatives)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Duplicate product IDs (runs without consolidation)
+# ─────────────────────────────────────────────────────────────────────────────
+# One supplier can list the same model twice (Offer and Price List rows); both
+# rows get the same product ID, and the portal needs unique IDs.  One row per ID
+# is kept by DEDUPE_POLICY — not by file order — and the others are written to
+# scripts/output_duplicates.csv.
+
+DEDUPE_POLICY = ["stock", "price"]
+
+DUPLICATES_HEADERS = [
+    "kept_price", "kept_stock",
+    "supplier", "id", "name", "sku", "price", "stock", "eta", "availableQuantity", "moq",
+]
+
+
+class PricedRows:
+    """The output and price debug rows of a run, collected as they are priced.
+
+    With dedupe, only the best row per product ID (DEDUPE_POLICY) is kept: a
+    better row takes the place of the one kept so far, ties keep the earliest
+    row, and the loser goes straight to a temporary duplicates file — neither
+    its output and debug dicts nor a list of dropped rows are held until the
+    end of the run.  Kept rows stay at the position of their ID's first row.
+    Without dedupe (consolidation follows) every row is kept.
+    """
+
+    def __init__(self, dedupe: bool = True, policy: list[str] = DEDUPE_POLICY):
+        self.output_rows = []
+        self.debug_rows  = []            # parallel to output_rows
+        self.dedupe      = dedupe
+        self._key_fn     = rank_key(policy)
+        self._index      = {}            # id → position in output_rows
+        self._ranks      = []            # rank of each kept row (parallel to output_rows)
+        self.n_dropped   = 0
+        self._spool      = None          # temp file: supplier + DUPLICATES_HEADERS[3:] per row
+
+    def keeps(self, out_row: dict) -> bool:
+        """Whether out_row would be kept (it beats the row kept so far for its ID)."""
+        pos = self._index.get(out_row["id"]) if self.dedupe else None
+        return pos is None or self._key_fn(out_row) < self._ranks[pos]
+
+    def add(self, out_row: dict, dbg_row: dict) -> None:
+        if self.dedupe:
+            rank = self._key_fn(out_row)
+            pos  = self._index.get(out_row["id"])
+            if pos is not None:
+                if rank < self._ranks[pos]:
+                    self.drop(self.output_rows[pos], self.debug_rows[pos]["supplier"])
+                    self.output_rows[pos] = out_row
+                    self.debug_rows[pos]  = dbg_row
+                    self._ranks[pos]      = rank
+                else:
+                    self.drop(out_row, dbg_row["supplier"])
+                return
+            self._index[out_row["id"]] = len(self.output_rows)
+            self._ranks.append(rank)
+        self.output_rows.append(out_row)
+        self.debug_rows.append(dbg_row)
+
+    def extend(self, out_rows: list[dict], dbg_rows: list[dict]) -> None:
+        for out_row, dbg_row in zip(out_rows, dbg_rows):
+            self.add(out_row, dbg_row)
+
+    def drop(self, row: dict, supplier: str) -> None:
+        """Record a losing row (see keeps()) for the duplicates file."""
+        if self._spool is None:
+            self._spool  = tempfile.TemporaryFile("w+", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._spool)
+        self._writer.writerow([supplier, *(row.get(h, "") for h in DUPLICATES_HEADERS[3:])])
+        self.n_dropped += 1
+
+    def duplicates(self):
+        """Dropped rows in DUPLICATES_HEADERS order, next to the row finally kept for their ID."""
+        if self._spool is None:
+            return
+        self._spool.seek(0)
+        for fields in csv.reader(self._spool):
+            kept = self.output_rows[self._index[fields[1]]]
+            yield [kept["price"], kept["stock"], *fields]
+        self._spool.close()
+        self._spool = None
+
+
+def apply_dedupe(priced: PricedRows, duplicates_path: str) -> int:
+    """Write the duplicates file of a deduped run and print a summary → rows dropped."""
+    with open(duplicates_path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(DUPLICATES_HEADERS)
+        writer.writerows(priced.duplicates())
+    if priced.n_dropped:
+        print(f"Duplicate IDs ({' > '.join(DEDUPE_POLICY)}): {priced.n_dropped} row(s) dropped"
+              f"  → {duplicates_path}")
+    return priced.n_dropped
+
+
+def apply_consolidation(output_rows: list[dict], debug_rows: list[dict],
+                        policy: list[str], alternatives_path: str) -> list[dict]:
+    """Consolidate a run's output, write the alternatives file and print a summary.
+
+    debug_rows must be the price debug rows parallel to output_rows (they carry
+    the supplier name).  Returns the consolidated output rows.
+    """
+    suppliers = [d["supplier"] for d in debug_rows]
+    winners, alternatives = consolidate_offers(output_rows, suppliers, policy)
+    write_alternatives(alternatives_path, alternatives)
+    n_groups = len({a["sku_key"] for a in alternatives})
+    print(f"Consolidation ({' > '.join(policy)}): {len(output_rows)} → {len(winners)} products, "
+          f"{len(alternatives)} duplicate offer(s) collapsed across {n_groups} SKU(s)"
+          f"  → {alternatives_path}")
+    return winners
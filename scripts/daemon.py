@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+daemon.py
+─────────
+Long-running pipeline: keeps everything a run loads warm and processes raw
+exports as they are dropped into an inbox directory.
+
+A one-shot run (pipeline.py) imports the Gemini client, loads brands.csv,
+suppliers.csv, delivery_times.csv and the product cache, fetches the exchange
+rate — and throws it all away at exit.  The daemon loads them once, then:
+
+  • polls DAEMON_INBOX_DIR every DAEMON_POLL_S seconds for *.csv files in the
+    raw export format; a file is picked up once its size and mtime stop
+    changing between two polls (i.e. the upload has finished)
+  • a file named like RAW_CSV is a full export and replaces the catalog;
+    any other file is a supplier drop and replaces only the rows of the
+    suppliers it contains — the rest of the catalog stays as it was
+  • only the dropped rows are preprocessed, enriched (cache first, then
+    Gemini) and priced; the full set of outputs (output_import.csv,
+    price_debug.csv, NDJSON export, delta, product cache) is then rewritten
+  • processed files move to inbox/done/, files that failed to inbox/failed/
+
+Hot reload (checked before every poll):
+  config.py          re-executed; changed constants are rebound in every loaded
+                     scripts/ module, the catalog is re-priced, and the Gemini
+                     backend is recreated if a GEMINI_* setting changed
+  suppliers.csv      registries reloaded, catalog re-priced
+  brands.csv         used for the next drops (rows already in the catalog keep
+                     their brand until their supplier sends a new file)
+  delivery_times.csv catalog re-priced
+  product_cache.csv  edited outside the daemon (e.g. reviewed names): reloaded
+                     and applied to the catalog
+
+Values derived from config.py at import time are not reloaded: the Gemini
+system prompt (CATEGORIES) and function default arguments.  Changing those
+needs a restart.  The exchange rate is re-fetched when the date changes.
+
+On start the daemon seeds the catalog from RAW_CSV (the last full export) so
+that the first supplier drop doesn't publish a one-supplier catalog.
+
+Run from repo root:
+    python scripts/daemon.py                          # watch inbox/
+    python scripts/daemon.py --inbox /srv/drops --poll 5
+    python scripts/daemon.py --once                   # process the inbox, then exit
+    python scripts/daemon.py --no-seed --gemini-backend synthetic
+"""
+
+import argparse
+import importlib
+import os
+import pathlib
+import shutil
+import sys
+import time
+import traceback
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+import config
+from config import (
+    RAW_CSV, SUPPLIERS_CSV, BRANDS_CSV, PRODUCT_CACHE_CSV,
+    GEMINI_FAILED_CSV, ERROR_LOG, AI_BATCH_SIZE, CONSOLIDATE_OFFERS, CONSOLIDATION_POLICY,
+    DAEMON_INBOX_DIR, DAEMON_POLL_S,
+)
+from consolidate import PricedRows, apply_consolidation, apply_dedupe
+from metrics import Metrics, add_metrics_args, finish_metrics
+import preprocess
+import ai_transform
+import price_audit
+
+_SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Hot reload
+# ─────────────────────────────────────────────────────────────────────────────
+
+def reload_config() -> list[str]:
+    """Re-execute config.py and rebind changed constants in the pipeline modules.
+
+    Modules import constants by name (``from config import X``), so every
+    loaded scripts/ module gets the new values set on it.  Returns the names
+    that changed.  Raises SyntaxError (and leaves everything as it was) if
+    config.py doesn't compile.
+    """
+    path = config.__file__
+    compile(pathlib.Path(path).read_text(encoding="utf-8"), path, "exec")
+    old = {k: v for k, v in vars(config).items() if k.isupper()}
+    importlib.reload(config)
+    new = {k: v for k, v in vars(config).items() if k.isupper()}
+    changed = sorted(k for k in new if k not in old or old[k] != new[k])
+    for module in list(sys.modules.values()):
+        file = getattr(module, "__file__", None)
+        if module is config or not file or os.path.dirname(os.path.abspath(file)) != _SCRIPTS_DIR:
+            continue
+        for k in changed:
+            if k in vars(module):
+                setattr(module, k, new[k])
+    return changed
+
+
+def _mtime(path: str) -> int | None:
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Daemon
+# ─────────────────────────────────────────────────────────────────────────────
+
+class PipelineDaemon:
+    def __init__(self, args):
+        self.args    = args
+        self.inbox   = pathlib.Path(args.inbox)
+        self.catalog = {}      # supplier → {"rows", "ai", "out", "dbg"}  (insertion = output order)
+        self.seen    = {}      # inbox file → (size, mtime_ns) on the last poll
+        self.mtimes  = {}      # watched file → mtime_ns when last loaded
+        for sub in ("done", "failed"):
+            (self.inbox / sub).mkdir(parents=True, exist_ok=True)
+
+        started = time.perf_counter()
+        self.load_registries()
+        self.load_context()
+        self.load_caches()
+        print(f"Warm start in {time.perf_counter() - started:.1f}s")
+
+    # ── Warm state ────────────────────────────────────────────────────────────
+
+    def _watched(self) -> dict:
+        # Read through the config module so a reload can move the files
+        return {"config":         config.__file__,
+                "suppliers":      config.SUPPLIERS_CSV,
+                "brands":         config.BRANDS_CSV,
+                "delivery_times": config.DELIVERY_TIMES_CSV,
+                "product_cache":  config.PRODUCT_CACHE_CSV}
+
+    def _remember(self, *names: str) -> None:
+        watched = self._watched()
+        for name in names:
+            self.mtimes[name] = _mtime(watched[name])
+
+    def load_registries(self) -> None:
+        self.supplier_config = preprocess.load_supplier_config(SUPPLIERS_CSV)
+        self.known_brands    = preprocess.load_brands(BRANDS_CSV)
+        print(f"Loaded {len(self.supplier_config)} supplier(s), {len(self.known_brands)} brand(s)")
+        self._remember("config", "suppliers", "brands")
+
+    def load_context(self) -> None:
+        """Exchange rate + supplier / delivery tables; the rate is fetched once per day."""
+        same_day = getattr(self, "rate_day", None) == date.today()
+        cb_rate  = self.args.cb_rate or (self.ctx["cb_rate"] if same_day else None)
+        self.ctx      = ai_transform.load_run_context(cb_rate)
+        self.rate_day = date.today()
+        self._remember("suppliers", "delivery_times")
+
+    def load_caches(self) -> None:
+        self.product_cache = ai_transform.load_product_cache(PRODUCT_CACHE_CSV)
+        self.failed        = ai_transform.load_failed_cache(GEMINI_FAILED_CSV)
+        print(f"Product cache: {len(self.product_cache)} entries loaded")
+        self.similar = None
+        if self.args.similar:
+            self.similar = ai_transform.load_similarity_index(self.product_cache,
+                                                              self.args.similar_threshold)
+        self._remember("product_cache")
+
+    def new_stats(self) -> dict:
+        return ai_transform.new_run_stats(Metrics("daemon"), self.failed, self.similar)
+
+    # ── Reloads ───────────────────────────────────────────────────────────────
+
+    def check_reloads(self) -> None:
+        watched = self._watched()
+        changed = {name for name, path in watched.items() if _mtime(path) != self.mtimes.get(name)}
+        if self.rate_day != date.today():
+            changed.add("rate")
+        if not changed:
+            return
+
+        reprice = False
+        if "config" in changed:
+            try:
+                names = reload_config()
+            except Exception as e:
+                print(f"  ⚠  config.py not reloaded: {e}")
+                names = None
+            self._remember("config")
+            if names:
+                print(f"↻  config.py: {', '.join(names)}")
+                if any(n.startswith("GEMINI_") for n in names):
+                    ai_transform.set_gemini_backend(self.args.gemini_backend,
+                                                    self.args.prompt_cache, self.args.tiered)
+                if "CATEGORIES" in names:
+                    print("  ⚠  CATEGORIES is baked into the Gemini system prompt — restart to apply")
+                reprice = True
+        if changed & {"suppliers", "brands"}:
+            print("↻  supplier / brand registries")
+            self.load_registries()
+            reprice = True
+        if changed & {"suppliers", "delivery_times", "rate"}:
+            print("↻  run context (suppliers, delivery times, exchange rate)")
+            self.load_context()
+            reprice = True
+        if "product_cache" in changed:
+            print("↻  product cache (edited outside the daemon)")
+            self.load_caches()
+            self.refresh_from_cache()
+            reprice = True
+
+        if reprice and self.catalog:
+            stats = self.new_stats()
+            self.reprice_all(stats)
+            self.publish(stats)
+
+    def refresh_from_cache(self) -> None:
+        """Point catalog rows at the (reloaded) cache entries of their products."""
+        for part in self.catalog.values():
+            for i, r in enumerate(part["rows"]):
+                entry = self.product_cache.get(r["model"].strip().lower())
+                if entry is not None:
+                    part["ai"][i] = entry
+
+    def reprice_all(self, stats: dict) -> None:
+        started = time.perf_counter()
+        for part in self.catalog.values():
+            self._price(part, stats)
+        n = sum(len(p["rows"]) for p in self.catalog.values())
+        print(f"Re-priced {n} rows in {time.perf_counter() - started:.1f}s")
+
+    def _price(self, part: dict, stats: dict) -> None:
+        # Repeated product IDs are resolved in publish(), over the whole catalog
+        part["out"], part["dbg"] = ai_transform.price_batch(
+            part["rows"], part["ai"], self.ctx, stats)
+
+    # ── Inbox ─────────────────────────────────────────────────────────────────
+
+    def scan_inbox(self) -> list[pathlib.Path]:
+        """Files whose size and mtime didn't change since the last poll, oldest first."""
+        ready, current = [], {}
+        for path in self.inbox.glob("*.csv"):
+            if path.name.startswith("."):
+                continue
+            st = path.stat()
+            current[path] = (st.st_size, st.st_mtime_ns)
+            if self.args.once or self.seen.get(path) == current[path]:
+                ready.append(path)
+        self.seen = {p: sig for p, sig in current.items() if p not in ready}
+        return sorted(ready, key=lambda p: current[p][1])
+
+    def process_file(self, path: pathlib.Path, move: bool = True) -> None:
+        started = time.perf_counter()
+        full    = path.name == pathlib.Path(RAW_CSV).name
+        print(f"\n▶  {path.name} ({'full export' if full else 'supplier drop'})")
+        stats     = self.new_stats()
+        pre_stats = preprocess.new_stats(stats["metrics"])
+        try:
+            with stats["metrics"].stage("preprocess"):
+                rows = [preprocess.IntermediateRow({k: str(v) for k, v in r.items()})
+                        for r in preprocess.iter_intermediate_rows(
+                            str(path), self.supplier_config, self.known_brands, pre_stats)]
+            preprocess.report_unknown_suppliers(pre_stats)
+            if pre_stats["errors"]:
+                preprocess.write_error_log(ERROR_LOG, pre_stats["errors"])
+
+            ai_results = []
+            n_batches  = -(-len(rows) // AI_BATCH_SIZE)
+            for b in range(n_batches):
+                batch = rows[b * AI_BATCH_SIZE:(b + 1) * AI_BATCH_SIZE]
+                ai, called_gemini = ai_transform.enrich_batch(
+                    batch, self.product_cache, stats, f"Batch {b + 1}/{n_batches}")
+                ai_results.extend(ai)
+                if called_gemini and b < n_batches - 1:
+                    time.sleep(0.5)
+
+            parts = {}
+            for r, ai in zip(rows, ai_results):
+                part = parts.setdefault(r["supplier"], {"rows": [], "ai": []})
+                part["rows"].append(r)
+                part["ai"].append(ai)
+            for part in parts.values():
+                self._price(part, stats)
+
+            # Only adopted once published: if writing the outputs fails, the
+            # in-memory catalog still matches the files on disk
+            catalog = parts if full else {**self.catalog, **parts}
+            print(f"{len(rows)} rows from {len(parts)} supplier(s): {', '.join(parts) or '—'}"
+                  f" ({pre_stats['skipped']} skipped, {len(pre_stats['errors'])} parse errors)")
+            self.publish(stats, catalog)
+            self.catalog = catalog
+        except Exception:
+            traceback.print_exc()
+            print(f"  ⚠  {path.name} failed — catalog unchanged")
+            if move:
+                shutil.move(str(path), self.inbox / "failed" / self._stamped(path))
+            return
+        if move:
+            shutil.move(str(path), self.inbox / "done" / self._stamped(path))
+        print(f"✔  {path.name} in {time.perf_counter() - started:.1f}s")
+
+    @staticmethod
+    def _stamped(path: pathlib.Path) -> str:
+        return f"{datetime.now():%Y%m%d-%H%M%S}_{path.name}"
+
+    # ── Outputs ───────────────────────────────────────────────────────────────
+
+    def publish(self, stats: dict, catalog: dict | None = None) -> None:
+        """Write the outputs of catalog (default: the current one) as a pipeline.py run would."""
+        catalog = self.catalog if catalog is None else catalog
+        priced  = PricedRows(dedupe=not self.args.consolidate)
+        for part in catalog.values():
+            priced.extend(part["out"], part["dbg"])
+        output_rows, debug_rows = priced.output_rows, priced.debug_rows
+        paths   = ai_transform.output_paths(False)
+        metrics = stats["metrics"]
+        if self.args.consolidate:
+            output_rows = apply_consolidation(output_rows, debug_rows, CONSOLIDATION_POLICY,
+                                              paths["alternatives"])
+        else:
+            stats["duplicates"] = apply_dedupe(priced, paths["duplicates"])
+        with metrics.stage("write", rows=len(output_rows)):
+            ai_transform.write_csv(paths["output"], ai_transform.OUTPUT_HEADERS, output_rows)
+            ai_transform.write_price_debug(paths["debug"], debug_rows, self.args.debug_csv)
+        if self.args.price_audit:
+            with metrics.stage("price_audit", rows=len(debug_rows)):
+                price_audit.record_run(debug_rows, ai_transform.DEBUG_HEADERS, "daemon",
+                                       self.ctx["cb_rate"])
+        ai_transform.finish_run(output_rows, paths, False, stats, self.product_cache)
+        self._remember("product_cache")     # our own save is not an outside edit
+        finish_metrics(metrics, self.args)
+
+    # ── Main loop ─────────────────────────────────────────────────────────────
+
+    def run(self) -> None:
+        if self.args.seed and pathlib.Path(RAW_CSV).exists():
+            self.process_file(pathlib.Path(RAW_CSV), move=False)
+        print(f"\nWatching {self.inbox} every {self.args.poll}s — Ctrl+C to stop")
+        while True:
+            self.check_reloads()
+            for path in self.scan_inbox():
+                self.process_file(path)
+            if self.args.once:
+                break
+            time.sleep(self.args.poll)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--inbox", default=DAEMON_INBOX_DIR,
+                        help="Directory watched for raw export / supplier drop CSVs")
+    parser.add_argument("--poll", type=float, default=DAEMON_POLL_S,
+                        help="Seconds between inbox and reload checks")
+    parser.add_argument("--once", action="store_true",
+                        help="Process the files already in the inbox, then exit")
+    parser.add_argument("--seed", action=argparse.BooleanOptionalAction, default=True,
+                        help=f"Start from the catalog in {RAW_CSV}")
+    parser.add_argument("--consolidate", action=argparse.BooleanOptionalAction,
+                        default=CONSOLIDATE_OFFERS,
+                        help="Collapse offers with the same SKU to one product (see consolidate.py)")
+    ai_transform.add_gemini_args(parser)
+    price_audit.add_audit_args(parser)
+    add_metrics_args(parser)
+    args = parser.parse_args()
+    ai_transform.set_gemini_backend(args.gemini_backend, args.prompt_cache, args.tiered)
+
+    try:
+        PipelineDaemon(args).run()
+    except KeyboardInterrupt:
+        print("\nStopped")
+    finally:
+        ai_transform.close_gemini_backend()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,603 @@
+"""
+gemini_backend.py
+─────────────────
+Pluggable backends behind ai_transform.call_gemini().
+
+    live       → real Gemini API (default)
+    record     → real Gemini API, every request/response pair appended to
+                 scripts/gemini_recordings.jsonl
+    replay     → serve recorded responses by payload hash — no network, fully
+                 deterministic (a payload recorded several times, e.g. a retry
+                 after a truncated answer, replays its responses in order)
+    synthetic  → schema-valid fake normalisations with simulated latency and
+                 injected faults (429s, truncated / length-mismatched arrays,
+                 malformed JSON), tuned by GEMINI_SYNTHETIC in config.py
+
+Every backend exposes generate(payload, system_prompt) → (raw response text,
+token usage dict) and raises on API errors, so call_gemini()'s retry /
+fence-stripping / fallback logic is exercised the same way in every mode.
+stream(payload, system_prompt) yields (text chunk, None) pieces as they are
+generated and finally ("", usage) — used by call_gemini_stream().
+Usage keys: prompt_tokens, output_tokens, cached_tokens (missing = unknown)
+and prompt_cache — "cached" if the system prompt was referenced through the
+context cache, "inline" if it was sent with the request.
+
+The live and synthetic backends upload SYSTEM_PROMPT once per run through the
+context-caching API (GEMINI_PROMPT_CACHE) and fall back to sending it inline
+when the model / prompt size doesn't support caching.  The synthetic backend
+emulates both paths (and cache expiry) so the choice can be verified offline.
+
+Select with GEMINI_BACKEND in scripts/.env or --gemini-backend on the command
+line, e.g. a local 50k-row throughput run with no network:
+
+    python scripts/ai_transform.py --gemini-backend synthetic --cb-rate 390
+"""
+
+import hashlib
+import json
+import math
+import pathlib
+import random
+import re
+import threading
+import time
+
+from config import (
+    GEMINI_API_KEY, GEMINI_MODEL, GEMINI_RECORDINGS_JSONL, GEMINI_SYNTHETIC,
+    GEMINI_PROMPT_CACHE, GEMINI_PROMPT_CACHE_TTL_S,
+    CATEGORIES,
+)
+
+BACKENDS = ["live", "record", "replay", "synthetic"]
+
+
+class ReplayMissError(LookupError):
+    """Replay mode got a payload that was never recorded (not worth retrying)."""
+
+
+class RateLimitError(RuntimeError):
+    """Synthetic stand-in for the API's 429 RESOURCE_EXHAUSTED error."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) for backends without real usage."""
+    return (len(text) + 3) // 4
+
+
+def _usage_from_response(response) -> dict:
+    meta = getattr(response, "usage_metadata", None)
+    if meta is None:
+        return {}
+    return {
+        "prompt_tokens": meta.prompt_token_count or 0,
+        "output_tokens": meta.candidates_token_count or 0,
+        "cached_tokens": meta.cached_content_token_count or 0,
+    }
+
+
+def payload_hash(payload: str, system_prompt: str, model: str = GEMINI_MODEL) -> str:
+    """Recording key: a changed system prompt invalidates old recordings.
+
+    Other models (the tiers of GEMINI_TIERS) are part of the key, so the same
+    payload escalated to a stronger model replays that model's answer.
+    """
+    h = hashlib.sha256()
+    if model != GEMINI_MODEL:
+        h.update(model.encode("utf-8"))
+        h.update(b"\0")
+    h.update(system_prompt.encode("utf-8"))
+    h.update(b"\0")
+    h.update(payload.encode("utf-8"))
+    return h.hexdigest()
+
+
+def _is_cache_missing(error: Exception) -> bool:
+    """True if a request failed because its cached prompt expired or was deleted."""
+    msg = str(error).lower()
+    return "cachedcontent" in msg.replace(" ", "") or ("not_found" in msg and "cache" in msg)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# System prompt context cache
+# ─────────────────────────────────────────────────────────────────────────────
+
+class _PromptCaching:
+    """Uploads each distinct system prompt once and reuses its cache handle.
+
+    Subclasses implement _create_prompt_cache(prompt) → handle (raise if the
+    model can't cache it) and _delete_prompt_cache(handle).  A handle of None
+    means "send the prompt inline".  prompt_cache_paths counts which path each
+    request took.
+    """
+
+    def _init_prompt_cache(self, enabled: bool) -> None:
+        self.prompt_cache       = enabled
+        self._handles           = {}    # sha256(prompt) → handle | None
+        self.prompt_cache_paths = {"cached": 0, "inline": 0}
+
+    def _prompt_handle(self, system_prompt: str) -> tuple[str, str | None]:
+        key = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+        if key not in self._handles:
+            handle = None
+            if self.prompt_cache:
+                try:
+                    handle = self._create_prompt_cache(system_prompt)
+                    print(f"Gemini prompt cache: {handle}")
+                except Exception as e:
+                    print(f"  ⚠  Gemini prompt cache unavailable ({e}) — sending the prompt inline")
+            self._handles[key] = handle
+        handle = self._handles[key]
+        self.prompt_cache_paths["cached" if handle else "inline"] += 1
+        return key, handle
+
+    def _forget_prompt_handle(self, key: str) -> None:
+        """Drop an expired handle — the next request re-creates the cache."""
+        print("  ⚠  Gemini prompt cache expired — re-creating")
+        self._handles.pop(key, None)
+
+    def close(self) -> None:
+        """Delete the run's prompt caches instead of waiting for their TTL."""
+        for handle in filter(None, self._handles.values()):
+            try:
+                self._delete_prompt_cache(handle)
+            except Exception as e:
+                print(f"  ⚠  Could not delete Gemini prompt cache {handle}: {e}")
+        self._handles.clear()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Live / record
+# ─────────────────────────────────────────────────────────────────────────────
+
+class LiveBackend(_PromptCaching):
+    name = "live"
+
+    def __init__(self, model: str = GEMINI_MODEL, prompt_cache: bool = GEMINI_PROMPT_CACHE):
+        if not GEMINI_API_KEY:
+            raise RuntimeError(
+                "GEMINI_API_KEY not set.\n"
+                "Add it to scripts/.env:  GEMINI_API_KEY=<your key>\n"
+                "Get a key at: https://aistudio.google.com/app/apikey\n"
+                "(or run offline with --gemini-backend replay / synthetic)"
+            )
+        # Imported here so offline modes work without google-genai installed
+        from google import genai
+        from google.genai import types as genai_types
+        self._client = genai.Client(api_key=GEMINI_API_KEY)
+        self._types  = genai_types
+        self.model   = model
+        self._init_prompt_cache(prompt_cache)
+
+    def _create_prompt_cache(self, system_prompt: str) -> str:
+        cache = self._client.caches.create(
+            model=self.model,
+            config=self._types.CreateCachedContentConfig(
+                system_instruction=system_prompt,
+                display_name="b2b-product-normaliser",
+                ttl=f"{GEMINI_PROMPT_CACHE_TTL_S}s",
+            ),
+        )
+        return cache.name
+
+    def _delete_prompt_cache(self, handle: str) -> None:
+        self._client.caches.delete(name=handle)
+
+    def _request_config(self, system_prompt: str):
+        key, handle = self._prompt_handle(system_prompt)
+        config = {"temperature": 0.1, "response_mime_type": "application/json"}
+        if handle:
+            config["cached_content"] = handle
+        else:
+            config["system_instruction"] = system_prompt
+        return key, handle, self._types.GenerateContentConfig(**config)
+
+    def generate(self, payload: str, system_prompt: str) -> tuple[str, dict]:
+        key, handle, config = self._request_config(system_prompt)
+        try:
+            response = self._client.models.generate_content(
+                model=self.model, contents=payload, config=config)
+        except Exception as e:
+            if handle and _is_cache_missing(e):
+                self._forget_prompt_handle(key)
+            raise
+        usage = _usage_from_response(response)
+        usage["prompt_cache"] = "cached" if handle else "inline"
+        return response.text, usage
+
+    def stream(self, payload: str, system_prompt: str):
+        key, handle, config = self._request_config(system_prompt)
+        usage = {}
+        try:
+            for response in self._client.models.generate_content_stream(
+                    model=self.model, contents=payload, config=config):
+                # usage_metadata is cumulative — only the last chunk's counts matter
+                usage = _usage_from_response(response) or usage
+                yield response.text or "", None
+        except Exception as e:
+            if handle and _is_cache_missing(e):
+                self._forget_prompt_handle(key)
+            raise
+        usage["prompt_cache"] = "cached" if handle else "inline"
+        yield "", usage
+
+
+class RecordBackend(LiveBackend):
+    name = "record"
+
+    def __init__(self, path: str = GEMINI_RECORDINGS_JSONL, model: str = GEMINI_MODEL,
+                 prompt_cache: bool = GEMINI_PROMPT_CACHE):
+        super().__init__(model, prompt_cache)
+        self.path  = path
+        self._lock = threading.Lock()
+
+    def _record(self, payload: str, system_prompt: str, text: str, usage: dict,
+                started: float) -> None:
+        entry = {
+            "hash":      payload_hash(payload, system_prompt, self.model),
+            "model":     self.model,
+            "latency_s": round(time.perf_counter() - started, 3),
+            "usage":     usage,
+            "payload":   payload,
+            "response":  text,
+        }
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def generate(self, payload: str, system_prompt: str) -> tuple[str, dict]:
+        started = time.perf_counter()
+        text, usage = super().generate(payload, system_prompt)
+        self._record(payload, system_prompt, text, usage, started)
+        return text, usage
+
+    def stream(self, payload: str, system_prompt: str):
+        # Recorded once complete, so replay serves it like any other response
+        started = time.perf_counter()
+        parts = []
+        for chunk, usage in super().stream(payload, system_prompt):
+            parts.append(chunk)
+            if usage is not None:
+                self._record(payload, system_prompt, "".join(parts), usage, started)
+            yield chunk, usage
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Replay
+# ─────────────────────────────────────────────────────────────────────────────
+
+class ReplayBackend:
+    name = "replay"
+
+    def __init__(self, path: str = GEMINI_RECORDINGS_JSONL, with_latency: bool = False,
+                 model: str = GEMINI_MODEL):
+        self.model      = model
+        self.recordings = {}    # hash → [(response, usage), ...] in recording order
+        self.latencies  = {}
+        self._served    = {}    # hash → how many responses were served so far
+        self.with_latency = with_latency
+        if not pathlib.Path(path).exists():
+            raise FileNotFoundError(f"No Gemini recordings at {path} — run with "
+                                    f"--gemini-backend record first")
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                self.recordings.setdefault(entry["hash"], []).append(
+                    (entry["response"], entry.get("usage", {})))
+                self.latencies.setdefault(entry["hash"], []).append(entry.get("latency_s", 0))
+        print(f"Gemini replay: {sum(map(len, self.recordings.values()))} recorded "
+              f"response(s) for {len(self.recordings)} payload(s) from {path}")
+
+    def generate(self, payload: str, system_prompt: str) -> tuple[str, dict]:
+        key = payload_hash(payload, system_prompt, self.model)
+        responses = self.recordings.get(key)
+        if not responses:
+            raise ReplayMissError(f"no recording for payload {key[:12]}")
+        # Repeated requests walk through the recorded sequence, then stick to the last
+        n = self._served.get(key, 0)
+        self._served[key] = n + 1
+        i = min(n, len(responses) - 1)
+        if self.with_latency:
+            time.sleep(self.latencies[key][i])
+        return responses[i]
+
+    def stream(self, payload: str, system_prompt: str, chunk_chars: int = 256):
+        text, usage = self.generate(payload, system_prompt)
+        for i in range(0, len(text), chunk_chars):
+            yield text[i:i + chunk_chars], None
+        yield "", usage
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Synthetic
+# ─────────────────────────────────────────────────────────────────────────────
+
+# Raw-text keyword → (English name prefix, portal category) for fake normalisations
+_SYNTHETIC_TYPES = [
+    (("laptop", "notebook", "thinkpad", "elitebook", "latitude"), "Laptop", "Ноутбуки"),
+    (("monitor", "ultrasharp", "display"), "Monitor", "Мониторы"),
+    (("printer", "laserjet", "ecosys", "i-sensys", "mfp"), "Printer", "Принтеры/Сканеры"),
+    (("ssd", "nvme", "evo"), "SSD", "Компоненты ПК/Серверов"),
+    (("ddr", "dimm", "ram"), "RAM", "Компоненты ПК/Серверов"),
+    (("ryzen", "core i", "xeon", "cpu"), "CPU", "Компоненты ПК/Серверов"),
+    (("rtx", "radeon", "rx"), "GPU", "Компоненты ПК/Серверов"),
+    (("switch", "router", "access point"), "Switch", "Сетевое оборудование"),
+    (("camera", "nvr"), "Camera", "Системы безопасности"),
+    (("ups",), "UPS", "ИБП (UPS)"),
+]
+_WORD_RE = re.compile(r"[^\w\-/.]+")
+
+
+class SyntheticBackend(_PromptCaching):
+    """Fake Gemini: deterministic per seed, never touches the network.
+
+    settings (see GEMINI_SYNTHETIC in config.py):
+        seed                 RNG seed (faults and latency are reproducible)
+        latency_median_s     median call latency
+        latency_sigma        log-normal spread of the latency
+        latency_per_item_s   extra latency per product in the batch
+        latency_scale        multiplies all latencies (0 = no sleeping)
+        rate_limit           probability of a 429 error
+        truncated            probability of a response cut off mid-array
+        length_mismatch      probability of one item too few / too many
+        malformed            probability of syntactically broken JSON
+        fenced               probability of a ```json … ``` wrapped answer
+        prompt_cache_supported   whether "caches.create" succeeds at all
+        prompt_cache_min_tokens  prompts below this size can't be cached (API minimum)
+        prompt_cache_expire_every  every Nth cached request fails with an expired
+                                   cache (0 = never), exercising re-creation
+        ttft_frac            stream(): share of the latency before the first chunk
+        stream_chunk_chars   stream(): characters per chunk
+        strength             answer quality when asked for a confidence
+                             (0 = cheap tier, 1 = strong tier)
+    """
+    name = "synthetic"
+
+    def __init__(self, settings: dict | None = None, prompt_cache: bool = GEMINI_PROMPT_CACHE):
+        self.settings = {**GEMINI_SYNTHETIC, **(settings or {})}
+        self._rng  = random.Random(self.settings["seed"])
+        self._lock = threading.Lock()
+        self.faults = {k: 0 for k in ("rate_limit", "truncated", "length_mismatch",
+                                      "malformed", "fenced")}
+        self._cached_requests = 0
+        self._init_prompt_cache(prompt_cache)
+
+    def _create_prompt_cache(self, system_prompt: str) -> str:
+        s = self.settings
+        if not s["prompt_cache_supported"]:
+            raise RuntimeError("400 INVALID_ARGUMENT (synthetic): model does not support caching")
+        if estimate_tokens(system_prompt) < s["prompt_cache_min_tokens"]:
+            raise RuntimeError(f"400 INVALID_ARGUMENT (synthetic): cached content is too small "
+                               f"(min {s['prompt_cache_min_tokens']} tokens)")
+        digest = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+        return f"cachedContents/synthetic-{digest[:12]}"
+
+    def _delete_prompt_cache(self, handle: str) -> None:
+        pass
+
+    def _latency(self, n_items: int) -> float:
+        s = self.settings
+        base = s["latency_median_s"] * math.exp(self._rng.gauss(0, s["latency_sigma"]))
+        return (base + s["latency_per_item_s"] * n_items) * s["latency_scale"]
+
+    @staticmethod
+    def normalise(record: dict, confidence: bool = False, strength: float = 0) -> dict:
+        """Schema-valid fake output for one compact input record (b / m / n / c).
+
+        With confidence (the prompt asked for it) adds "confidence" and "flags":
+        a weak model is unsure about items it can't type, items without a
+        brand and bare or non-Latin names; a strong one (strength ≥ 1)
+        also files untyped items under Аксессуары.
+        """
+        raw   = record.get("n", "")
+        text  = f"{raw} {record.get('c', '')}".lower()
+        brand = record.get("b", "")
+        prefix, category = "Product", ""
+        for keywords, p, c in _SYNTHETIC_TYPES:
+            if any(k in text for k in keywords):
+                prefix, category = p, c
+                break
+        words = [w for w in _WORD_RE.split(raw) if w and w.lower() != brand.lower()]
+        name  = " ".join([prefix, brand, *words[:6]]).replace("  ", " ").strip()[:150]
+        if prefix == "Product" and strength >= 1:
+            category = "Аксессуары"
+        item = {"name": name, "sku": record.get("m", ""),
+                "category": category if category in CATEGORIES else "", "brand": brand}
+        if confidence:
+            flags = []
+            if prefix == "Product":
+                flags.append("category_unsure")
+            if not brand:
+                flags.append("brand_guessed")
+            if len(raw.split()) < 3 or not raw.isascii():
+                flags.append("unclear_input")
+            if strength >= 1:
+                item["confidence"] = 0.9 if flags else 0.97
+                item["flags"] = []
+            else:
+                item["confidence"] = round(0.95 - 0.2 * len(flags), 2)
+                item["flags"] = flags
+        return item
+
+    def _pick_fault(self) -> str | None:
+        roll = self._rng.random()
+        for fault in ("rate_limit", "truncated", "length_mismatch", "malformed", "fenced"):
+            p = self.settings[fault]
+            if roll < p:
+                return fault
+            roll -= p
+        return None
+
+    def _begin(self, payload: str, system_prompt: str):
+        """Prompt-cache bookkeeping plus this request's latency and fault draws."""
+        batch = json.loads(payload)
+        key, handle = self._prompt_handle(system_prompt)
+        if handle:
+            self._cached_requests += 1
+            every = self.settings["prompt_cache_expire_every"]
+            if every and self._cached_requests % every == 0:
+                self._forget_prompt_handle(key)
+                raise RuntimeError(f"404 NOT_FOUND (synthetic): CachedContent {handle} not found")
+        with self._lock:    # keeps fault/latency draws reproducible under threads
+            latency = self._latency(len(batch))
+            fault   = self._pick_fault()
+            if fault:
+                self.faults[fault] += 1
+            drop_last = self._rng.random() < 0.5
+        return batch, handle, latency, fault, drop_last
+
+    def _render(self, batch: list[dict], handle, fault: str | None, drop_last: bool,
+                payload: str, system_prompt: str) -> tuple[str, dict]:
+        confidence = '"confidence"' in system_prompt
+        items = [self.normalise(r, confidence, self.settings["strength"]) for r in batch]
+        if fault == "length_mismatch":
+            items = items[:-1] if drop_last or not items else items + [items[-1]]
+        text = json.dumps(items, ensure_ascii=False)
+        if fault == "truncated":
+            text = text[: max(1, len(text) * 2 // 3)]
+        elif fault == "malformed":
+            text = text.replace('", "', '" "', 1) if '", "' in text else text + ","
+        elif fault == "fenced":
+            text = f"```json\n{text}\n```"
+        # As with the real API, prompt_tokens includes the cached part
+        prompt_tokens = estimate_tokens(system_prompt)
+        usage = {"prompt_tokens": prompt_tokens + estimate_tokens(payload),
+                 "output_tokens": estimate_tokens(text),
+                 "cached_tokens": prompt_tokens if handle else 0,
+                 "prompt_cache":  "cached" if handle else "inline"}
+        return text, usage
+
+    def generate(self, payload: str, system_prompt: str) -> tuple[str, dict]:
+        batch, handle, latency, fault, drop_last = self._begin(payload, system_prompt)
+        if latency > 0:
+            time.sleep(latency)
+        if fault == "rate_limit":
+            raise RateLimitError("429 RESOURCE_EXHAUSTED (synthetic): quota exceeded")
+        return self._render(batch, handle, fault, drop_last, payload, system_prompt)
+
+    def stream(self, payload: str, system_prompt: str):
+        # Same total latency as generate(), but the first chunk arrives after
+        # ttft_frac of it and the rest trickles in evenly.  A "truncated"
+        # fault looks like a stream that stops mid-array.
+        batch, handle, latency, fault, drop_last = self._begin(payload, system_prompt)
+        ttft = latency * self.settings["ttft_frac"]
+        if ttft > 0:
+            time.sleep(ttft)
+        if fault == "rate_limit":
+            raise RateLimitError("429 RESOURCE_EXHAUSTED (synthetic): quota exceeded")
+        text, usage = self._render(batch, handle, fault, drop_last, payload, system_prompt)
+        size   = self.settings["stream_chunk_chars"]
+        chunks = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+        gap    = (latency - ttft) / len(chunks)
+        for n, chunk in enumerate(chunks):
+            if n and gap > 0:
+                time.sleep(gap)
+            yield chunk, None
+        yield "", usage
+
+
+def make_backend(mode: str, prompt_cache: bool = GEMINI_PROMPT_CACHE,
+                 model: str = GEMINI_MODEL, synthetic: dict | None = None):
+    """Create the backend for a --gemini-backend / GEMINI_BACKEND value.
+
+    synthetic overrides GEMINI_SYNTHETIC (per-tier settings, see GEMINI_TIERS).
+    """
+    if mode == "live":
+        return LiveBackend(model, prompt_cache)
+    if mode == "record":
+        return RecordBackend(model=model, prompt_cache=prompt_cache)
+    if mode == "replay":
+        return ReplayBackend(model=model)
+    if mode == "synthetic":
+        return SyntheticBackend(synthetic, prompt_cache)
+    raise ValueError(f"Unknown Gemini backend {mode!r}; use one of {BACKENDS}")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Batch jobs (backfill.py)
+# ─────────────────────────────────────────────────────────────────────────────
+# A job is a JSONL file of GenerateContent requests, one per line:
+#     {"key": "b00001", "request": {"contents": [...], "system_instruction": {...},
+#                                   "generation_config": {...}}}
+# and produces a JSONL file of {"key", "response": GenerateContentResponse}
+# or {"key", "error": {"code", "message"}} lines, in any order.
+
+JOB_DONE_STATES = {"JOB_STATE_SUCCEEDED", "JOB_STATE_FAILED", "JOB_STATE_CANCELLED",
+                   "JOB_STATE_EXPIRED"}
+BATCH_BACKENDS  = ["gemini", "local"]
+
+
+class GeminiBatchJobs:
+    """Gemini Batch API: upload the JSONL file, create the job, poll, download."""
+    name = "gemini"
+
+    def __init__(self):
+        if not GEMINI_API_KEY:
+            raise RuntimeError("GEMINI_API_KEY not set (or use --backend local with "
+                               "batch_job_server.py)")
+        from google import genai
+        from google.genai import types as genai_types
+        self._client = genai.Client(api_key=GEMINI_API_KEY)
+        self._types  = genai_types
+
+    def submit(self, path: str, model: str, display_name: str) -> str:
+        uploaded = self._client.files.upload(
+            file=path, config=self._types.UploadFileConfig(display_name=display_name,
+                                                           mime_type="jsonl"))
+        job = self._client.batches.create(model=model, src=uploaded.name,
+                                          config={"display_name": display_name})
+        return job.name
+
+    def status(self, handle: str) -> tuple[str, str]:
+        """→ (JOB_STATE_* name, error message or "")."""
+        job = self._client.batches.get(name=handle)
+        return job.state.name, str(job.error or "")
+
+    def download(self, handle: str, path: str) -> None:
+        job = self._client.batches.get(name=handle)
+        data = self._client.files.download(file=job.dest.file_name)
+        pathlib.Path(path).write_bytes(data)
+
+    def cancel(self, handle: str) -> None:
+        self._client.batches.cancel(name=handle)
+
+
+class LocalBatchJobs:
+    """Same calls against batch_job_server.py (offline, synthetic answers)."""
+    name = "local"
+
+    def __init__(self, url: str):
+        import requests
+        self._session = requests.Session()
+        self.url = url.rstrip("/")
+
+    def _call(self, method: str, path: str, **kwargs):
+        response = self._session.request(method, f"{self.url}/{path}", timeout=60, **kwargs)
+        response.raise_for_status()
+        return response
+
+    def submit(self, path: str, model: str, display_name: str) -> str:
+        with open(path, "rb") as f:
+            uploaded = self._call("POST", "files", data=f).json()
+        job = self._call("POST", "batches", json={"model": model, "src": uploaded["name"],
+                                                  "display_name": display_name}).json()
+        return job["name"]
+
+    def status(self, handle: str) -> tuple[str, str]:
+        job = self._call("GET", handle).json()
+        return job["state"], job.get("error", "")
+
+    def download(self, handle: str, path: str) -> None:
+        job = self._call("GET", handle).json()
+        pathlib.Path(path).write_bytes(self._call("GET", job["dest"]).content)
+
+    def cancel(self, handle: str) -> None:
+        self._call("POST", f"{handle}:cancel")
+
+
+def make_batch_jobs(mode: str, url: str = ""):
+    if mode == "gemini":
+        return GeminiBatchJobs()
+    if mode == "local":
+        return LocalBatchJobs(url)
+    raise ValueError(f"Unknown batch backend {mode!r}; use one of {BATCH_BACKENDS}")
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+import_server.py
+────────────────
+Local stand-in for the portal's import API (server/routes.ts), so
+portal_upload.py can be run end to end offline — without the portal,
+PostgreSQL or an admin account.
+
+    POST /api/auth/login                          any credentials are accepted
+    POST /api/products/import-sessions            → {"token", "nextSeq"}
+    GET  /api/products/import-sessions/<token>    → {"token", "nextSeq", "received"}
+    POST /api/products/import-sessions/<token>/chunks    {"seq", "products"}
+    POST /api/products/import-sessions/<token>/complete  {"expectedCount", "expectedChunks"}
+    POST /api/products/delta-import               {"added", "changed", "removed"}
+    GET  /api/products                            → the catalog
+
+The session rules are the portal's: a chunk whose seq was already applied is
+answered without being applied again, a chunk ahead of nextSeq gets 409, and
+complete gets 409 unless exactly the expected products and chunks arrived —
+only then are products the upload did not touch removed.  A repeated complete
+(its response was lost) gets the same answer again.  Request bodies may be
+gzip-encoded, as portal_upload.py sends them.
+
+Faults (IMPORT_SERVER_FAULTS, or --rate-limit / --server-error / --dropped)
+hit chunk, complete and delta requests at the given rates: 429 (with
+Retry-After) and 503 are answered before the request is applied; a dropped
+connection closes the socket after it was applied, so the client retries a
+request the server already has.
+
+The catalog is kept in IMPORT_SERVER_DIR/products.json and survives a restart;
+sessions live in memory, as on the portal.
+
+Run from repo root:
+    python scripts/import_server.py                               # 127.0.0.1:8767
+    python scripts/import_server.py --rate-limit 0.1 --server-error 0.1 --dropped 0.1
+"""
+
+import argparse
+import gzip
+import json
+import os
+import pathlib
+import random
+import secrets
+import signal
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+from config import IMPORT_SERVER_URL, IMPORT_SERVER_FAULTS, IMPORT_SERVER_DIR
+
+_REQUIRED = ("name", "price", "stock")   # insertProductSchema fields without a default
+
+
+class RequestError(Exception):
+    """A request the portal would refuse: (HTTP status, message, extra body fields)."""
+
+    def __init__(self, status: int, message: str, **extra):
+        super().__init__(message)
+        self.status = status
+        self.extra  = extra
+
+
+def check_product(product: dict, partial: bool = False) -> None:
+    """Raise RequestError(400) for a product insertProductSchema would reject."""
+    if not isinstance(product, dict) or not product.get("id"):
+        raise RequestError(400, "Products must have an id")
+    for field in () if partial else _REQUIRED:
+        if product.get(field) in (None, ""):
+            raise RequestError(400, f"{product['id']}: {field} is required")
+    price = product.get("price")
+    if price is not None and (not isinstance(price, int) or isinstance(price, bool)):
+        raise RequestError(400, f"{product['id']}: price must be an integer")
+
+
+class Catalog:
+    def __init__(self, root: str):
+        self.path     = pathlib.Path(root) / "products.json"
+        self.lock     = threading.Lock()
+        self.sessions = {}     # token → {"nextSeq", "received", "touched", "result"}
+        self.products = {}     # id → product
+        if self.path.exists():
+            self.products = json.loads(self.path.read_text(encoding="utf-8"))
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(self.products, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def _session(self, token: str) -> dict:
+        session = self.sessions.get(token)
+        if session is None:
+            raise RequestError(404, "Import session not found")
+        return session
+
+    def open(self) -> dict:
+        token = secrets.token_hex(16)
+        with self.lock:
+            self.sessions[token] = {"nextSeq": 0, "received": 0, "touched": set(), "result": None}
+        return {"token": token, "nextSeq": 0}
+
+    def status(self, token: str) -> dict:
+        with self.lock:
+            session = self._session(token)
+            return {"token": token, "nextSeq": session["nextSeq"], "received": session["received"]}
+
+    def chunk(self, token: str, body: dict) -> dict:
+        seq, products = body.get("seq"), body.get("products")
+        if not isinstance(seq, int) or not isinstance(products, list):
+            raise RequestError(400, "seq must be a number and products an array")
+        with self.lock:
+            session = self._session(token)
+            if session["result"] is not None:
+                raise RequestError(409, "Import session already completed")
+            if seq > session["nextSeq"]:
+                raise RequestError(409, "Chunk out of order", nextSeq=session["nextSeq"])
+            if seq == session["nextSeq"]:       # lower seqs were applied already (a retry)
+                for product in products:
+                    check_product(product)
+                for product in products:
+                    self.products[product["id"]] = {k: v for k, v in product.items() if k != "id"}
+                    session["touched"].add(product["id"])
+                session["nextSeq"]  = seq + 1
+                session["received"] += len(products)
+            return {"nextSeq": session["nextSeq"], "received": session["received"]}
+
+    def complete(self, token: str, body: dict) -> dict:
+        count, chunks = body.get("expectedCount"), body.get("expectedChunks")
+        with self.lock:
+            session = self._session(token)
+            if session["result"] is not None:
+                return session["result"]
+            if not isinstance(count, int) or not isinstance(chunks, int) or count < 1:
+                raise RequestError(400, "expectedCount (≥ 1) and expectedChunks must be numbers")
+            if session["received"] != count or session["nextSeq"] != chunks:
+                raise RequestError(
+                    409, f"Upload incomplete: {session['received']} of {count} products, "
+                         f"{session['nextSeq']} of {chunks} chunks received",
+                    received=session["received"], nextSeq=session["nextSeq"])
+            gone = [pid for pid in self.products if pid not in session["touched"]]
+            for pid in gone:
+                del self.products[pid]
+            self._save()
+            session["touched"] = set()
+            session["result"]  = {
+                "message": f"Successfully imported {session['received']} products "
+                           f"({len(gone)} removed)",
+                "count":   session["received"],
+                "removed": len(gone),
+            }
+            return session["result"]
+
+    def delta(self, body: dict) -> dict:
+        added, changed, removed = (body.get(k, []) for k in ("added", "changed", "removed"))
+        if not all(isinstance(v, list) for v in (added, changed, removed)):
+            raise RequestError(400, "added, changed and removed must be arrays")
+        for product in added:
+            check_product(product)
+        for product in changed:
+            check_product(product, partial=True)
+        if not all(isinstance(pid, str) and pid for pid in removed):
+            raise RequestError(400, "Removed entries must be product ids")
+        with self.lock:
+            for product in added:
+                self.products[product["id"]] = {k: v for k, v in product.items() if k != "id"}
+            for product in changed:
+                if product["id"] in self.products:
+                    self.products[product["id"]].update(
+                        {k: v for k, v in product.items() if k != "id"})
+            for pid in removed:
+                self.products.pop(pid, None)
+            self._save()
+        return {
+            "message": f"Catalog delta applied: {len(added)} added, {len(changed)} changed, "
+                       f"{len(removed)} removed",
+            "added": len(added), "changed": len(changed), "removed": len(removed),
+        }
+
+    def listing(self) -> list[dict]:
+        with self.lock:
+            return [{"id": pid, **product} for pid, product in self.products.items()]
+
+
+def make_handler(catalog: Catalog, faults: dict, rng: random.Random, verbose: bool = False):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, status: int, body, headers: dict | None = None) -> None:
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _body(self) -> dict:
+            data = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if self.headers.get("Content-Encoding") == "gzip":
+                data = gzip.decompress(data)
+            return json.loads(data or b"{}")
+
+        def _route(self) -> tuple[str, ...]:
+            return tuple(urlsplit(self.path).path.strip("/").split("/"))
+
+        def do_GET(self):
+            route = self._route()
+            try:
+                if route == ("api", "products"):
+                    self._reply(200, catalog.listing())
+                elif route[:3] == ("api", "products", "import-sessions") and len(route) == 4:
+                    self._reply(200, catalog.status(route[3]))
+                else:
+                    self._reply(404, {"message": f"Unknown path {self.path}"})
+            except RequestError as e:
+                self._reply(e.status, {"message": str(e), **e.extra})
+
+        def do_POST(self):
+            route = self._route()
+            try:
+                body = self._body()
+            except (ValueError, OSError) as e:
+                self._reply(400, {"message": f"Bad request body: {e}"})
+                return
+            if route == ("api", "auth", "login"):
+                self._reply(200, {"message": "Logged in (import_server.py stand-in)"})
+                return
+            if route == ("api", "products", "import-sessions"):
+                self._reply(200, catalog.open())
+                return
+
+            session = route[:3] == ("api", "products", "import-sessions") and len(route) == 5
+            if session and route[4] == "chunks":
+                apply = lambda: catalog.chunk(route[3], body)
+            elif session and route[4] == "complete":
+                apply = lambda: catalog.complete(route[3], body)
+            elif route == ("api", "products", "delta-import"):
+                apply = lambda: catalog.delta(body)
+            else:
+                self._reply(404, {"message": f"Unknown path {self.path}"})
+                return
+
+            fault = rng.random()
+            if fault < faults["rate_limit"]:
+                self._reply(429, {"message": "Too many requests (injected)"}, {"Retry-After": "1"})
+                return
+            if fault < faults["rate_limit"] + faults["server_error"]:
+                self._reply(503, {"message": "Service unavailable (injected)"})
+                return
+            try:
+                result = apply()
+            except RequestError as e:
+                self._reply(e.status, {"message": str(e), **e.extra})
+                return
+            if rng.random() < faults["dropped"]:
+                self.close_connection = True      # applied, but the response is lost
+                return
+            self._reply(200, result)
+
+        def log_message(self, format, *args):
+            if verbose:
+                super().log_message(format, *args)
+
+    return Handler
+
+
+def main():
+    url = urlsplit(IMPORT_SERVER_URL)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=url.hostname)
+    parser.add_argument("--port", type=int, default=url.port)
+    parser.add_argument("--dir", default=IMPORT_SERVER_DIR, help="Where the catalog is kept")
+    parser.add_argument("--rate-limit", type=float, default=IMPORT_SERVER_FAULTS["rate_limit"],
+                        help="Share of requests answered 429")
+    parser.add_argument("--server-error", type=float, default=IMPORT_SERVER_FAULTS["server_error"],
+                        help="Share of requests answered 503")
+    parser.add_argument("--dropped", type=float, default=IMPORT_SERVER_FAULTS["dropped"],
+                        help="Share of requests applied, then dropped without a response")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the fault injection")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    faults  = {"rate_limit": args.rate_limit, "server_error": args.server_error,
+               "dropped": args.dropped}
+    catalog = Catalog(args.dir)
+    server  = ThreadingHTTPServer((args.host, args.port),
+                                  make_handler(catalog, faults, random.Random(args.seed),
+                                               args.verbose))
+    print(f"Portal import stand-in on http://{args.host}:{args.port} "
+          f"({len(catalog.products)} products in {catalog.path}; faults: "
+          + ", ".join(f"{k} {v:.0%}" for k, v in faults.items()) + ")")
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
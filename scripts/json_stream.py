@@ -0,0 +1,93 @@
+"""
+json_stream.py
+──────────────
+Incremental parser for a streamed top-level JSON array of objects
+(the shape of every Gemini response in ai_transform.py).
+
+    parser = JsonArrayStream()
+    for chunk in response_chunks:
+        for item in parser.feed(chunk):
+            ...                      # each object as soon as its closing brace arrives
+
+Text before the opening "[" (e.g. a ```json fence) and after the closing "]"
+is ignored.  Items must be separated by exactly one comma (a trailing comma
+before "]" is tolerated).  If the stream stops early, every object completed
+so far has already been returned and parser.closed stays False.  If it turns
+invalid, JsonStreamError carries the objects the failing chunk completed
+before the bad character, so nothing that was parsed is lost.
+"""
+
+import json
+
+
+class JsonStreamError(ValueError):
+    """Text that can't be part of an array of objects; .completed holds the
+    objects the same feed() call finished before it."""
+
+    def __init__(self, message: str, completed: list):
+        super().__init__(message)
+        self.completed = completed
+
+
+class JsonArrayStream:
+    def __init__(self):
+        self.started = False     # "[" seen
+        self.closed  = False     # matching "]" seen
+        self.items   = 0         # objects returned so far
+        self._buf    = []        # characters of the object being read
+        self._depth  = 0         # nesting depth inside the current object
+        self._comma  = True      # between items: a comma (or the "[") came last
+        self._in_str = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> list[dict]:
+        """Consume the next piece of text and return the objects it completed.
+
+        Raises JsonStreamError (a ValueError) on text that can't be part of an
+        array of objects, with the objects completed before it in .completed.
+        """
+        done = []
+        for ch in chunk:
+            if self.closed:
+                break
+            if not self.started:
+                if ch == "[":
+                    self.started = True
+                continue
+
+            if self._depth == 0:
+                # Between items: whitespace, one comma, the next "{" or the final "]"
+                if ch == "{" and self._comma:
+                    self._depth = 1
+                    self._buf = [ch]
+                elif ch == "," and not self._comma:
+                    self._comma = True
+                elif ch == "]":
+                    self.closed = True
+                elif not ch.isspace():
+                    self.items += len(done)
+                    what = "missing ',' before" if ch == "{" else "unexpected"
+                    raise JsonStreamError(f"{what} {ch!r} between array items", done)
+                continue
+
+            self._buf.append(ch)
+            if self._in_str:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_str = False
+            elif ch == '"':
+                self._in_str = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    item = json.loads("".join(self._buf))
+                    self._buf = []
+                    self._comma = False
+                    done.append(item)
+        self.items += len(done)
+        return done
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+load_test.py
+────────────
+End-to-end load test: synthetic multi-supplier raw exports (synthetic_data.py,
+the exact format try_parse_row expects) at LOAD_TEST_SIZES rows, run through
+preprocess.py and ai_transform.py as the nightly run would.
+
+Each size runs in its own sandbox (LOAD_TEST_DIR/<rows>/: a copy of the
+scripts and registries with the raw export next to it), so the real raw
+export, caches and outputs are never touched.  Per size:
+
+    generate       synthetic raw export
+    preprocess     python preprocess.py
+    warm_cache     every product normalised in-process by the synthetic
+                   Gemini stand-in (no latency, no faults) into the sandbox's
+                   product_cache.csv — the nightly run is mostly cache hits,
+                   and a cold run's time is the 0.5 s pause between Gemini
+                   batches, not the pipeline
+    ai_transform   python ai_transform.py --gemini-backend synthetic --cb-rate …
+
+For every stage: wall time, rows/s, peak RSS (the child process's own, from
+wait4) and the size of each output file.  preprocess and ai_transform are
+checked against LOAD_TEST_CEILINGS — a stage fails when it runs below
+min_rows_per_s or its peak RSS exceeds rss_base_mb + rss_kb_per_row × rows —
+and the harness exits with status 1 if any check failed.
+
+Results go to LOAD_TEST_RESULTS_JSON.  Sandboxes are deleted after each size
+unless --keep (a 2M-row sandbox takes about 1 GB).
+
+Run from repo root:
+    python scripts/load_test.py                          # 100k, 500k, 2M rows
+    python scripts/load_test.py --sizes 100000 --keep
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+from config import (
+    AI_BATCH_SIZE, LOAD_TEST_SIZES, LOAD_TEST_CEILINGS, LOAD_TEST_DIR, LOAD_TEST_RESULTS_JSON,
+)
+from gemini_backend import SyntheticBackend
+from preprocess import IntermediateRow
+from records import read_records
+from synthetic_data import write_raw_export
+import ai_transform
+
+_SCRIPTS_DIR = pathlib.Path(__file__).parent
+CB_RATE      = 390.0
+
+# Stage → the sandbox files it writes (relative to the sandbox root)
+STAGE_FILES = {
+    "generate":     ["raw_product_export_data.csv"],
+    "preprocess":   ["scripts/intermediate.csv", "scripts/parse_errors.csv"],
+    "warm_cache":   ["scripts/product_cache.csv"],
+    "ai_transform": ["scripts/output_import.csv", "scripts/price_debug.csv",
+                     "scripts/output_import.ndjson.gz", "scripts/output_delta.json",
+                     "scripts/price_audit.sqlite", "scripts/product_cache.csv"],
+}
+
+# Registries the sandboxed scripts read next to themselves
+_REGISTRIES = ("suppliers.csv", "brands.csv", "delivery_times.csv")
+
+# Faultless, instant stand-in for warming the cache
+_WARM_SETTINGS = {"latency_scale": 0.0, "rate_limit": 0.0, "truncated": 0.0,
+                  "length_mismatch": 0.0, "malformed": 0.0}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Sandbox
+# ─────────────────────────────────────────────────────────────────────────────
+
+def make_sandbox(root: pathlib.Path) -> pathlib.Path:
+    """Fresh copy of the scripts and registries under root → root."""
+    if root.exists():
+        shutil.rmtree(root)
+    scripts = root / "scripts"
+    scripts.mkdir(parents=True)
+    for path in _SCRIPTS_DIR.iterdir():
+        if path.suffix == ".py" or path.name in _REGISTRIES:
+            shutil.copy2(path, scripts / path.name)
+    for name in _REGISTRIES:
+        if not (scripts / name).exists():
+            print(f"⚠  {name} not found in {_SCRIPTS_DIR} — the sandboxed run will fail without it")
+    return root
+
+
+def run_script(sandbox: pathlib.Path, script: str, args: list[str]) -> tuple[float, int]:
+    """Run a sandboxed script as a child process → (wall seconds, peak RSS bytes)."""
+    log = sandbox / f"{pathlib.Path(script).stem}.log"
+    env = {**os.environ, "GEMINI_BACKEND": "synthetic"}
+    started = time.perf_counter()
+    with open(log, "w", encoding="utf-8") as f:
+        proc = subprocess.Popen([sys.executable, str(sandbox / "scripts" / script), *args],
+                                stdout=f, stderr=subprocess.STDOUT, env=env)
+        _, status, usage = os.wait4(proc.pid, 0)
+    seconds = time.perf_counter() - started
+    if os.waitstatus_to_exitcode(status) != 0:
+        raise SystemExit(f"❌  {script} failed — see {log}")
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    rss = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    return seconds, rss
+
+
+def warm_cache(sandbox: pathlib.Path) -> int:
+    """Normalise every product of the sandbox's intermediate.csv → cached products."""
+    rows = read_records(str(sandbox / "scripts" / "intermediate.csv"), IntermediateRow)
+    products = list({r["model"].strip().lower(): r for r in rows
+                     if r["model"].strip()}.values())
+    backend = SyntheticBackend(_WARM_SETTINGS, prompt_cache=False)
+    stats   = ai_transform.new_run_stats()
+    cache   = {}
+    for start in range(0, len(products), AI_BATCH_SIZE):
+        batch = products[start:start + AI_BATCH_SIZE]
+        items = [{"brand": r["brand_raw"], "model": r["model"], "name_raw": r["name_raw"],
+                  "category_raw": r["category_raw"]} for r in batch]
+        text, _ = backend.generate(ai_transform.encode_payload(items), ai_transform.SYSTEM_PROMPT)
+        for r, result in zip(batch, ai_transform.parse_answer(text)):
+            ai_transform.store_result(r, result, cache, stats)
+    ai_transform.save_product_cache(str(sandbox / "scripts" / "product_cache.csv"), cache)
+    return len(cache)
+
+
+def count_lines(path: pathlib.Path) -> int:
+    with open(path, "rb") as f:
+        return sum(1 for _ in f) - 1          # header
+
+
+def file_sizes(sandbox: pathlib.Path, stage: str) -> dict:
+    return {pathlib.Path(name).name: (sandbox / name).stat().st_size
+            for name in STAGE_FILES[stage] if (sandbox / name).exists()}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Run + ceilings
+# ─────────────────────────────────────────────────────────────────────────────
+
+def check(stage: str, result: dict, rows: int) -> list[str]:
+    """Ceiling violations of a stage's result (empty if none or not checked)."""
+    ceiling = LOAD_TEST_CEILINGS.get(stage)
+    if not ceiling:
+        return []
+    failures = []
+    if result["rows_per_s"] < ceiling["min_rows_per_s"]:
+        failures.append(f"{result['rows_per_s']:,} rows/s < {ceiling['min_rows_per_s']:,}")
+    rss_limit = ceiling["rss_base_mb"] + ceiling["rss_kb_per_row"] * rows / 1024
+    if result["peak_rss_mb"] > rss_limit:
+        failures.append(f"peak RSS {result['peak_rss_mb']:,.0f} MB > {rss_limit:,.0f} MB")
+    return failures
+
+
+def run_size(n: int, seed: int, work_dir: pathlib.Path, keep: bool) -> dict:
+    sandbox = make_sandbox(work_dir / str(n))
+    stages  = {}
+
+    def record(stage: str, seconds: float, rows: int, rss: int | None = None) -> None:
+        stages[stage] = {"rows": rows, "seconds": round(seconds, 2),
+                         "rows_per_s": round(rows / seconds) if seconds else 0,
+                         "peak_rss_mb": round(rss / 2**20, 1) if rss is not None else None,
+                         "files": file_sizes(sandbox, stage)}
+        failures = check(stage, stages[stage], n)
+        stages[stage]["failures"] = failures
+        s = stages[stage]
+        print(f"  {stage:<13} {seconds:>8.1f}s  {s['rows_per_s']:>9,} rows/s"
+              + (f"  {s['peak_rss_mb']:>7,.0f} MB RSS" if rss is not None else " " * 17)
+              + f"  {sum(s['files'].values()) / 2**20:>8,.1f} MB out"
+              + ("  ✗ " + "; ".join(failures) if failures else ""))
+
+    print(f"\n{n:,} rows  (sandbox {sandbox})")
+    t0 = time.perf_counter()
+    write_raw_export(str(sandbox / "raw_product_export_data.csv"), n, seed)
+    record("generate", time.perf_counter() - t0, n)
+
+    seconds, rss = run_script(sandbox, "preprocess.py", [])
+    record("preprocess", seconds, n, rss)
+    inter_rows = count_lines(sandbox / "scripts" / "intermediate.csv")
+
+    t0 = time.perf_counter()
+    cached = warm_cache(sandbox)
+    record("warm_cache", time.perf_counter() - t0, cached)
+
+    seconds, rss = run_script(sandbox, "ai_transform.py",
+                              ["--gemini-backend", "synthetic", "--cb-rate", str(CB_RATE)])
+    record("ai_transform", seconds, inter_rows, rss)
+
+    if not keep:
+        shutil.rmtree(sandbox)
+    return {"intermediate_rows": inter_rows, "cached_products": cached, "stages": stages}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default=",".join(map(str, LOAD_TEST_SIZES)),
+                        help="Comma-separated raw row counts")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dir", default=LOAD_TEST_DIR, help="Where the sandboxes are created")
+    parser.add_argument("--keep", action="store_true", help="Keep each sandbox (data + logs)")
+    parser.add_argument("--out", default=LOAD_TEST_RESULTS_JSON)
+    args = parser.parse_args()
+
+    sizes   = [int(s) for s in args.sizes.split(",") if s]
+    results = {"meta": {"timestamp": datetime.now().isoformat(timespec="seconds"),
+                        "python": platform.python_version(), "platform": platform.platform(),
+                        "seed": args.seed, "ceilings": LOAD_TEST_CEILINGS},
+               "sizes": {}}
+    print(f"Load test at {', '.join(f'{s:,}' for s in sizes)} rows")
+    for n in sizes:
+        results["sizes"][str(n)] = run_size(n, args.seed, pathlib.Path(args.dir), args.keep)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=1)
+
+    failed = [(n, stage, msg) for n, r in results["sizes"].items()
+              for stage, s in r["stages"].items() for msg in s["failures"]]
+    print(f"\n{'─'*72}")
+    print(f"Results             : {args.out}")
+    if failed:
+        for n, stage, msg in failed:
+            print(f"  ✗ {int(n):>9,} rows  {stage:<13} {msg}")
+        print(f"{'─'*72}")
+        sys.exit(1)
+    print("All stages within their ceilings")
+    print(f"{'─'*72}")
+
+
+if __name__ == "__main__":
+    main()
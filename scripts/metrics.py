@@ -0,0 +1,201 @@
+"""
+metrics.py
+──────────
+Run metrics for preprocess.py, ai_transform.py and pipeline.py
+(--profile prints the report, --metrics-out metrics.json saves it).
+
+Collected on every run (the bookkeeping costs ~1 µs per row):
+  • wall and CPU time per stage (read, parse, filter, brand, supplier rewrite,
+    cache load, Gemini, pricing, write, …) and rows/s through each stage
+  • counters: skips by reason and by supplier, parse failures, unknown
+    suppliers, Gemini retries / fallbacks / tokens, cache hits / misses
+  • Gemini call latency histogram
+  • peak RSS of the process
+
+CPU time is per thread (time.thread_time), so in pipeline.py the preprocessing
+thread's stages and the AI stage are measured independently.
+"""
+
+import json
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource          # not available on Windows
+except ImportError:
+    resource = None
+
+# Upper bounds (seconds) of the Gemini latency histogram buckets
+LATENCY_BUCKETS_S = (0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+
+
+def peak_rss_mb() -> float | None:
+    """Peak resident set size of this process in MB (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class Histogram:
+    def __init__(self, bounds=LATENCY_BUCKETS_S):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.values = []
+
+    def observe(self, value: float) -> None:
+        self.values.append(value)
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def percentile(self, p: float) -> float | None:
+        if not self.values:
+            return None
+        ordered = sorted(self.values)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def to_dict(self) -> dict:
+        labels = [f"<={b}s" for b in self.bounds] + [f">{self.bounds[-1]}s"]
+        n = len(self.values)
+        return {
+            "count":   n,
+            "sum_s":   round(sum(self.values), 3),
+            "min_s":   round(min(self.values), 3) if n else None,
+            "p50_s":   round(self.percentile(50), 3) if n else None,
+            "p95_s":   round(self.percentile(95), 3) if n else None,
+            "max_s":   round(max(self.values), 3) if n else None,
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class Metrics:
+    def __init__(self, script: str):
+        self.script     = script
+        self.started    = time.perf_counter()
+        self.cpu_start  = time.process_time()
+        self.stages     = {}   # name → {"wall_s", "cpu_s", "rows"}   (insertion = report order)
+        self.counters   = {}   # group → {key: n}
+        self.histograms = {}   # name → Histogram
+        self.values     = {}   # free-form scalars (cache size, rate, …)
+
+    # ── Stage timing ──────────────────────────────────────────────────────────
+
+    @staticmethod
+    def mark() -> tuple[float, float]:
+        return time.perf_counter(), time.thread_time()
+
+    def lap(self, stage: str, mark: tuple[float, float], rows: int = 1) -> tuple[float, float]:
+        """Charge the time since `mark` to `stage` and return a new mark.
+
+        Used inside per-row loops:  m = metrics.lap("parse", m)
+        """
+        now = self.mark()
+        s = self.stages.get(stage)
+        if s is None:
+            s = self.stages[stage] = {"wall_s": 0.0, "cpu_s": 0.0, "rows": 0}
+        s["wall_s"] += now[0] - mark[0]
+        s["cpu_s"]  += now[1] - mark[1]
+        s["rows"]   += rows
+        return now
+
+    @contextmanager
+    def stage(self, name: str, rows: int = 0):
+        """Time a block:  with metrics.stage("write", rows=len(rows)): …"""
+        mark = self.mark()
+        try:
+            yield
+        finally:
+            self.lap(name, mark, rows)
+
+    # ── Counters / histograms ─────────────────────────────────────────────────
+
+    def count(self, group: str, key: str = "total", n: int = 1) -> None:
+        g = self.counters.setdefault(group, {})
+        g[key] = g.get(key, 0) + n
+
+    def total(self, group: str) -> int:
+        return sum(self.counters.get(group, {}).values())
+
+    def observe(self, name: str, value: float) -> None:
+        h = self.histograms.get(name)
+        if h is None:
+            h = self.histograms[name] = Histogram()
+        h.observe(value)
+
+    def set(self, key: str, value) -> None:
+        self.values[key] = value
+
+    # ── Output ────────────────────────────────────────────────────────────────
+
+    def to_dict(self) -> dict:
+        stages = {}
+        for name, s in self.stages.items():
+            stages[name] = {
+                "wall_s":       round(s["wall_s"], 4),
+                "cpu_s":        round(s["cpu_s"], 4),
+                "rows":         s["rows"],
+                "rows_per_sec": round(s["rows"] / s["wall_s"]) if s["wall_s"] > 0 and s["rows"] else None,
+            }
+        return {
+            "script":      self.script,
+            "finished":    datetime.now().isoformat(timespec="seconds"),
+            "wall_s":      round(time.perf_counter() - self.started, 3),
+            "cpu_s":       round(time.process_time() - self.cpu_start, 3),
+            "peak_rss_mb": peak_rss_mb(),
+            "stages":      stages,
+            "counters":    {g: dict(sorted(c.items(), key=lambda kv: -kv[1]))
+                            for g, c in self.counters.items()},
+            "histograms":  {n: h.to_dict() for n, h in self.histograms.items()},
+            "values":      self.values,
+        }
+
+    def write_json(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        print(f"Metrics             : {path}")
+
+    def print_report(self, top: int = 8) -> None:
+        d = self.to_dict()
+        print(f"\n{'─'*72}")
+        print(f"Profile — {self.script}: {d['wall_s']:.1f}s wall, {d['cpu_s']:.1f}s CPU, "
+              f"peak RSS {d['peak_rss_mb'] if d['peak_rss_mb'] is not None else 'n/a'} MB")
+        print(f"{'stage':<20} {'wall s':>9} {'cpu s':>9} {'rows':>10} {'rows/s':>11}")
+        for name, s in d["stages"].items():
+            rps = f"{s['rows_per_sec']:,}" if s["rows_per_sec"] else "—"
+            print(f"{name:<20} {s['wall_s']:>9.3f} {s['cpu_s']:>9.3f} {s['rows']:>10,} {rps:>11}")
+        for group, counts in d["counters"].items():
+            items = list(counts.items())
+            shown = ", ".join(f"{k}={v}" for k, v in items[:top])
+            more  = f", … (+{len(items) - top})" if len(items) > top else ""
+            print(f"{group:<20} {shown}{more}")
+        for name, h in d["histograms"].items():
+            if h["count"]:
+                print(f"{name:<20} n={h['count']} p50={h['p50_s']}s p95={h['p95_s']}s "
+                      f"max={h['max_s']}s  " + " ".join(f"{k}:{v}" for k, v in h["buckets"].items() if v))
+        for key, value in d["values"].items():
+            print(f"{key:<20} {value}")
+        print(f"{'─'*72}")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Command-line glue
+# ─────────────────────────────────────────────────────────────────────────────
+
+def add_metrics_args(parser) -> None:
+    parser.add_argument("--profile", action="store_true",
+                        help="Print per-stage timings, counters and peak memory at the end")
+    parser.add_argument("--metrics-out", metavar="PATH",
+                        help="Write the run metrics as JSON (e.g. metrics.json)")
+
+
+def finish_metrics(metrics: Metrics, args) -> None:
+    if args.profile:
+        metrics.print_report()
+    if args.metrics_out:
+        metrics.write_json(args.metrics_out)
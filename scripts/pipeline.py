@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+pipeline.py
+───────────
+Steps 1 + 2 of the CSV conversion pipeline in a single process.
+
+Reads  : raw_product_export_data.csv
+Writes : scripts/output_import.csv, price_debug.csv, output_import.ndjson.gz,
+         output_delta.json, price_audit.sqlite   (same as ai_transform.py)
+         scripts/parse_errors.csv          (rows that could not be parsed)
+         scripts/intermediate.csv          (only with --write-intermediate)
+
+Instead of handing rows over through intermediate.csv, a preprocessing thread
+streams rows into a bounded queue while the main thread batches them, resolves
+cache hits, calls Gemini and prices each batch as it finishes.  Parsing
+continues while a Gemini call is in flight, so total time approaches the
+slower of the two stages instead of their sum.  The output files are written
+once every row is priced (consolidation needs the whole catalog; repeated
+product IDs are resolved as rows are priced, see consolidate.PricedRows).
+
+Run from repo root:
+    python scripts/pipeline.py                        # full run
+    python scripts/pipeline.py --test                 # first 10 rows only
+    python scripts/pipeline.py --write-intermediate   # also keep intermediate.csv
+    python scripts/pipeline.py --profile --metrics-out metrics.json
+    python scripts/pipeline.py --stream                # process Gemini items as they stream in
+"""
+
+import argparse
+import csv
+import os
+import queue
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+from config import (
+    RAW_CSV, SUPPLIERS_CSV, BRANDS_CSV, INTERMEDIATE_CSV, ERROR_LOG,
+    PRODUCT_CACHE_CSV, GEMINI_FAILED_CSV, AI_BATCH_SIZE, PIPELINE_QUEUE_SIZE,
+    CONSOLIDATE_OFFERS, CONSOLIDATION_POLICY,
+)
+from consolidate import PricedRows, apply_consolidation, apply_dedupe
+from metrics import Metrics, add_metrics_args, finish_metrics
+import preprocess
+import ai_transform
+import price_audit
+
+_DONE = object()   # end-of-stream marker put on the queue by the producer
+
+
+def _produce(rows_q: queue.Queue, stats: dict, supplier_config: dict,
+             known_brands: list, limit: int, failure: list) -> None:
+    """Preprocessing thread: parse the raw export and feed intermediate rows to the queue."""
+    try:
+        rows = preprocess.iter_intermediate_rows(RAW_CSV, supplier_config, known_brands, stats)
+        for n, row in enumerate(rows, start=1):
+            # Same string values ai_transform.py would read back from intermediate.csv
+            rows_q.put(preprocess.IntermediateRow({k: str(v) for k, v in row.items()}))
+            if limit and n >= limit:
+                break
+    except BaseException as e:   # re-raised in the main thread
+        failure.append(e)
+    finally:
+        rows_q.put(_DONE)
+
+
+def iter_batches(rows_q: queue.Queue, size: int, metrics: Metrics):
+    """Group queued rows into AI batches as they arrive.
+
+    Time spent waiting on an empty queue is charged to the "queue_wait" stage —
+    if it is large, preprocessing is the bottleneck.
+    """
+    batch = []
+    while True:
+        mark = metrics.mark()
+        row  = rows_q.get()
+        metrics.lap("queue_wait", mark, rows=0)
+        if row is _DONE:
+            break
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--test", action="store_true",
+                        help="Process only the first 10 rows (for inspection)")
+    parser.add_argument("--write-intermediate", action="store_true",
+                        help=f"Also write {INTERMEDIATE_CSV} (as preprocess.py would)")
+    parser.add_argument("--queue-size", type=int, default=PIPELINE_QUEUE_SIZE,
+                        help="Max preprocessed rows buffered ahead of the AI stage")
+    parser.add_argument("--consolidate", action=argparse.BooleanOptionalAction,
+                        default=CONSOLIDATE_OFFERS,
+                        help="Collapse offers with the same SKU to one product (see consolidate.py)")
+    ai_transform.add_gemini_args(parser)
+    price_audit.add_audit_args(parser)
+    add_metrics_args(parser)
+    args = parser.parse_args()
+    ai_transform.set_gemini_backend(args.gemini_backend, args.prompt_cache, args.tiered)
+    try:
+        run(args)
+    finally:
+        ai_transform.close_gemini_backend()   # also when a stage fails
+
+
+def run(args: argparse.Namespace) -> None:
+    """One pipeline run with the parsed arguments; main() owns the Gemini backend."""
+    started = time.perf_counter()
+    metrics = Metrics("pipeline")
+
+    supplier_config = preprocess.load_supplier_config(SUPPLIERS_CSV)
+    print(f"Loaded {len(supplier_config)} supplier(s) from {SUPPLIERS_CSV}")
+    known_brands = preprocess.load_brands(BRANDS_CSV)
+    print(f"Loaded {len(known_brands)} brand(s) from {BRANDS_CSV}")
+    if args.test:
+        print("🔬  TEST MODE — processing 10 rows only")
+
+    with metrics.stage("context"):
+        ctx = ai_transform.load_run_context(args.cb_rate)
+    with metrics.stage("cache_load"):
+        product_cache = ai_transform.load_product_cache(PRODUCT_CACHE_CSV)
+    print(f"Product cache: {len(product_cache)} entries loaded")
+    similar = None
+    if args.similar:
+        with metrics.stage("similarity_index", rows=len(product_cache)):
+            similar = ai_transform.load_similarity_index(product_cache, args.similar_threshold)
+
+    # ── Start preprocessing in the background ────────────────────────────────
+    pre_stats = preprocess.new_stats(metrics)
+    failure   = []
+    rows_q    = queue.Queue(maxsize=args.queue_size)
+    producer  = threading.Thread(
+        target=_produce,
+        args=(rows_q, pre_stats, supplier_config, known_brands, 10 if args.test else 0, failure),
+        daemon=True,
+    )
+    producer.start()
+
+    # ── AI stage: enrich and price each batch as it completes ────────────────
+    paths       = ai_transform.output_paths(args.test)
+    stats       = ai_transform.new_run_stats(
+        metrics, ai_transform.load_failed_cache(GEMINI_FAILED_CSV), similar)
+    priced      = PricedRows(dedupe=not args.consolidate)
+    n_inter     = 0
+
+    inter_f = inter_writer = None
+    if args.write_intermediate:
+        inter_f = open(INTERMEDIATE_CSV, "w", newline="", encoding="utf-8-sig")
+        inter_writer = csv.DictWriter(inter_f, fieldnames=preprocess.INTERMEDIATE_HEADERS)
+        inter_writer.writeheader()
+
+    try:
+        batches = iter_batches(rows_q, AI_BATCH_SIZE, metrics)
+        for batch_idx, batch_rows in enumerate(batches, start=1):
+            n_inter += len(batch_rows)
+            if inter_writer:
+                inter_writer.writerows(batch_rows)
+
+            label = f"Batch {batch_idx}"
+            if args.stream:
+                # Each row is priced as soon as Gemini completes it
+                misses_before = stats["cache_misses"]
+                ai_stream = ai_transform.enrich_batch_stream(batch_rows, product_cache,
+                                                             stats, label)
+                for out_row, dbg_row in ai_transform.price_stream(batch_rows, ai_stream, ctx,
+                                                                  stats, priced):
+                    priced.add(out_row, dbg_row)
+                called_gemini = stats["cache_misses"] > misses_before
+            else:
+                ai_results, called_gemini = ai_transform.enrich_batch(
+                    batch_rows, product_cache, stats, label)
+                priced.extend(*ai_transform.price_batch(batch_rows, ai_results, ctx, stats,
+                                                        priced))
+
+            # Small delay only when Gemini was actually called (to avoid rate-limiting);
+            # preprocessing keeps filling the queue meanwhile.  Skipped after the last
+            # batch: the producer has finished and at most its _DONE marker is left.
+            if called_gemini and (producer.is_alive() or rows_q.qsize() > 1):
+                time.sleep(0.5)
+    finally:
+        if inter_f:
+            inter_f.close()
+
+    producer.join()
+    if failure:
+        raise failure[0]
+    preprocess.report_unknown_suppliers(pre_stats)
+
+    # Outputs are only written once the producer finished cleanly (a failed parse
+    # must not leave a short catalog behind), and then through .tmp files, see
+    # write_csv.  Consolidation and duplicate IDs need the whole catalog anyway.
+    output_rows, debug_rows = priced.output_rows, priced.debug_rows
+    if args.consolidate:
+        output_rows = apply_consolidation(output_rows, debug_rows, CONSOLIDATION_POLICY,
+                                          paths["alternatives"])
+    else:
+        stats["duplicates"] = apply_dedupe(priced, paths["duplicates"])
+    with metrics.stage("write", rows=len(output_rows)):
+        ai_transform.write_csv(paths["output"], ai_transform.OUTPUT_HEADERS, output_rows)
+        ai_transform.write_price_debug(paths["debug"], debug_rows, args.debug_csv)
+    if args.price_audit and not args.test:
+        with metrics.stage("price_audit", rows=len(debug_rows)):
+            price_audit.record_run(debug_rows, ai_transform.DEBUG_HEADERS, "pipeline",
+                                   ctx["cb_rate"])
+
+    error_rows = pre_stats["errors"]
+    if error_rows:
+        preprocess.write_error_log(ERROR_LOG, error_rows)
+
+    print(f"\n{'─'*50}")
+    print(f"Raw lines processed : {pre_stats['total_raw']}")
+    print(f"Skipped (headers/zero-stock): {pre_stats['skipped']}")
+    print(f"Parse errors        : {len(error_rows)}  → {ERROR_LOG}")
+    print(f"Intermediate rows   : {n_inter}"
+          + (f"  → {INTERMEDIATE_CSV}" if args.write_intermediate else ""))
+    print(f"{'─'*50}")
+
+    ai_transform.finish_run(output_rows, paths, args.test, stats, product_cache)
+    print(f"Elapsed             : {time.perf_counter() - started:.1f}s")
+    finish_metrics(metrics, args)
+
+
+if __name__ == "__main__":
+    main()
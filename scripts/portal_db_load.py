@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+portal_db_load.py
+─────────────────
+Loads the catalog straight into the portal's PostgreSQL `products` table —
+the fast path next to portal_upload.py for whoever has DATABASE_URL.
+
+Reads  : scripts/output_import.ndjson.gz   (written by ai_transform.py)
+         or scripts/output_import.csv
+Writes : the products table of shared/schema.ts (DATABASE_URL in scripts/.env)
+
+The export is checked against the table's constraints first (required
+fields, integer columns, varchar lengths, unique ids); any bad row stops the
+load before the database is touched.  Then, in one transaction:
+  1. COPY every product into a temporary staging table shaped like products
+     (visibleCustomerTypes → the visible_customer_types text[] column)
+  2. upsert staging → products by id; rows whose fields didn't change are
+     left alone (updated_at included), image_url is never touched — it isn't
+     part of the export and is managed in the portal
+  3. delete products missing from the export, unless --keep-missing
+The portal keeps serving the previous catalog until the commit, and sees
+the new one all at once.  A committed load without --keep-missing also
+advances the catalog manifest (catalog_delta.py), as a full upload does.
+
+Testing against a local PostgreSQL: create the schema with
+`DATABASE_URL=postgresql://localhost/b2b npm run db:push`, then load with
+--database-url (and --dry-run to roll back instead of committing).
+
+Run from repo root:
+    python scripts/portal_db_load.py                          # output_import.ndjson.gz
+    python scripts/portal_db_load.py --dry-run                # report, roll back
+    python scripts/portal_db_load.py scripts/output_import.csv --keep-missing
+    python scripts/portal_db_load.py --database-url postgresql://postgres@localhost/b2b
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import os
+import sys
+import time
+
+import psycopg
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+from config import OUTPUT_NDJSON_GZ, PORTAL_DATABASE_URL, CATALOG_MANIFEST
+from catalog_delta import to_portal_product, mark_replaced
+
+# Export field → products column, in COPY order (image_url is not exported)
+COLUMNS = {
+    "id":                   "id",
+    "name":                 "name",
+    "sku":                  "sku",
+    "price":                "price",
+    "stock":                "stock",
+    "eta":                  "eta",
+    "description":          "description",
+    "availableQuantity":    "available_quantity",
+    "moq":                  "moq",
+    "brand":                "brand",
+    "category":             "category",
+    "visibleCustomerTypes": "visible_customer_types",
+}
+_REQUIRED     = ("id", "name", "stock", "price")
+_INT_FIELDS   = ("price", "availableQuantity", "moq")
+_ZERO_DEFAULT = ("availableQuantity", "moq")        # NOT NULL DEFAULT 0
+_MAX_LENGTH   = {"name": 500, "sku": 100, "stock": 20, "eta": 100, "brand": 255, "category": 100}
+
+_STAGING = "products_staging"
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Export
+# ─────────────────────────────────────────────────────────────────────────────
+
+def load_products(path: str) -> list[dict]:
+    """Products of an NDJSON(.gz) export or output_import.csv, in portal field types."""
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            return [{"id": row["id"], **to_portal_product(row)} for row in csv.DictReader(f)]
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def validate(products: list[dict]) -> list[str]:
+    """Rows the products table would reject → error messages (empty if none)."""
+    errors = []
+    seen   = set()
+    for i, p in enumerate(products, 1):
+        where = f"row {i} ({p.get('id') or 'no id'})"
+        for field in _REQUIRED:
+            if p.get(field) in (None, ""):
+                errors.append(f"{where}: {field} is required")
+        for field in _INT_FIELDS:
+            value = p.get(field)
+            if value is not None and (not isinstance(value, int) or isinstance(value, bool)):
+                errors.append(f"{where}: {field} is not an integer ({value!r})")
+        for field, limit in _MAX_LENGTH.items():
+            if len(str(p.get(field) or "")) > limit:
+                errors.append(f"{where}: {field} longer than {limit} characters")
+        types = p.get("visibleCustomerTypes")
+        if types is not None and not isinstance(types, list):
+            errors.append(f"{where}: visibleCustomerTypes is not a list")
+        if p.get("id") in seen:
+            errors.append(f"{where}: duplicate id")
+        seen.add(p.get("id"))
+    return errors
+
+
+def copy_row(p: dict) -> tuple:
+    """One product as a COPY row in COLUMNS order."""
+    return tuple(p.get(field) or 0 if field in _ZERO_DEFAULT else p.get(field)
+                 for field in COLUMNS)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Load
+# ─────────────────────────────────────────────────────────────────────────────
+
+def load(conn: psycopg.Connection, products: list[dict], keep_missing: bool = False,
+         dry_run: bool = False) -> dict:
+    """Stage, upsert and (unless keep_missing) prune in one transaction → counters.
+
+    The counters include per-step seconds; with dry_run the transaction is
+    rolled back after the counts are taken.
+    """
+    cols    = ", ".join(COLUMNS.values())
+    data    = [c for c in COLUMNS.values() if c != "id"]
+    changed = " OR ".join(f"p.{c} IS DISTINCT FROM s.{c}" for c in data)
+    counts  = {"staged": 0, "inserted": 0, "updated": 0, "deleted": 0, "timings": {}}
+    t = time.perf_counter()
+
+    def lap(step: str) -> None:
+        nonlocal t
+        now = time.perf_counter()
+        counts["timings"][step] = round(now - t, 3)
+        t = now
+
+    tx = conn.transaction(force_rollback=dry_run)
+    with tx, conn.cursor() as cur:
+        # Other writers (admin edits, the import API) wait for the commit; readers don't
+        cur.execute("LOCK TABLE products IN SHARE ROW EXCLUSIVE MODE")
+        cur.execute(f"CREATE TEMP TABLE {_STAGING} (LIKE products INCLUDING DEFAULTS) "
+                    f"ON COMMIT DROP")
+        with cur.copy(f"COPY {_STAGING} ({cols}) FROM STDIN") as copy:
+            for p in products:
+                copy.write_row(copy_row(p))
+        counts["staged"] = len(products)
+        cur.execute(f"ANALYZE {_STAGING}")
+        lap("copy")
+
+        cur.execute(
+            f"UPDATE products p SET {', '.join(f'{c} = s.{c}' for c in data)}, "
+            f"updated_at = now() FROM {_STAGING} s WHERE p.id = s.id AND ({changed})")
+        counts["updated"] = cur.rowcount
+        cur.execute(
+            f"INSERT INTO products ({cols}) SELECT {cols} FROM {_STAGING} s "
+            f"WHERE NOT EXISTS (SELECT 1 FROM products p WHERE p.id = s.id)")
+        counts["inserted"] = cur.rowcount
+        lap("upsert")
+
+        if not keep_missing:
+            cur.execute(f"DELETE FROM products p WHERE NOT EXISTS "
+                        f"(SELECT 1 FROM {_STAGING} s WHERE s.id = p.id)")
+            counts["deleted"] = cur.rowcount
+        lap("delete")
+    lap("commit")
+    return counts
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Main
+# ─────────────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", nargs="?", default=OUTPUT_NDJSON_GZ,
+                        help="Export to load: .ndjson.gz (default) or output_import.csv")
+    parser.add_argument("--database-url", default=PORTAL_DATABASE_URL,
+                        help="PostgreSQL connection string (default: DATABASE_URL)")
+    parser.add_argument("--keep-missing", action="store_true",
+                        help="Only upsert — keep products that are not in the export")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Run the load and report, then roll back")
+    args = parser.parse_args()
+
+    if not args.database_url:
+        raise RuntimeError(
+            "DATABASE_URL not set.\n"
+            "Add it to scripts/.env or pass --database-url to load into the portal database."
+        )
+
+    t0 = time.perf_counter()
+    products = load_products(args.path)
+    print(f"{len(products)} products in {args.path} ({time.perf_counter() - t0:.1f}s)")
+    if not products:
+        sys.exit("❌  Export is empty — refusing to load (it would empty the catalog)")
+    errors = validate(products)
+    if errors:
+        for message in errors[:20]:
+            print(f"  ✗ {message}")
+        if len(errors) > 20:
+            print(f"  … and {len(errors) - 20} more")
+        sys.exit(f"❌  {len(errors)} invalid rows — nothing loaded")
+
+    with psycopg.connect(args.database_url) as conn:
+        counts = load(conn, products, keep_missing=args.keep_missing, dry_run=args.dry_run)
+
+    timings = counts["timings"]
+    print(f"\n{'─'*50}")
+    print(f"Staged (COPY)       : {counts['staged']}  ({timings['copy']:.2f}s)")
+    print(f"Inserted            : {counts['inserted']}")
+    print(f"Updated             : {counts['updated']}  ({timings['upsert']:.2f}s)")
+    print(f"Unchanged           : {counts['staged'] - counts['inserted'] - counts['updated']}")
+    print(f"Deleted             : " + ("— (--keep-missing)" if args.keep_missing
+                                       else f"{counts['deleted']}  ({timings['delete']:.2f}s)"))
+    print(f"Total               : {time.perf_counter() - t0:.1f}s")
+    print(f"{'─'*50}")
+    if args.dry_run:
+        print("Dry run — rolled back, the portal database is unchanged")
+    elif not args.keep_missing:
+        # The portal now holds exactly this export: the next delta is computed against it
+        mark_replaced(CATALOG_MANIFEST, {p["id"]: {k: v for k, v in p.items() if k != "id"}
+                                         for p in products})
+
+
+if __name__ == "__main__":
+    main()
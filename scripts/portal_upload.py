@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+portal_upload.py
+────────────────
+Step 3 of the CSV conversion pipeline (replaces the manual CSV upload).
+
+Reads  : scripts/output_import.ndjson.gz   (written by ai_transform.py)
+Sends  : the catalog to the portal's chunked import API
+         (/api/products/import-sessions, see server/routes.ts)
+
+The export is streamed in size-bounded chunks over one pooled HTTP connection.
+Each chunk carries a sequence number, so failed requests are retried with
+backoff, and an interrupted upload resumes from the last chunk the portal
+accepted (token kept in scripts/upload_state.json).  When every chunk is in,
+the session is completed with the export's product and chunk counts; the
+portal checks them against what it received before removing products
+missing from the export.  An empty export is never uploaded.
+
+--delta posts output_delta.json to /api/products/delta-import instead.  Once
+the portal confirms either kind of import, the catalog manifest is advanced
+(see catalog_delta.py), so the next delta is computed against what the
+portal actually holds.
+
+Run from repo root:
+    python scripts/portal_upload.py                      # upload output_import.ndjson.gz
+    python scripts/portal_upload.py --restart            # ignore a saved resume token
+    python scripts/portal_upload.py --url http://localhost:5000
+    python scripts/portal_upload.py --delta              # apply output_delta.json only
+
+Offline end-to-end run against import_server.py, a local stand-in for the
+portal's import API (any credentials; 429 / 503 / dropped connections injected):
+    python scripts/import_server.py --rate-limit 0.1 --server-error 0.1 --dropped 0.1 &
+    PORTAL_ADMIN_EMAIL=admin PORTAL_ADMIN_PASSWORD=x \\
+        python scripts/portal_upload.py --url http://127.0.0.1:8767 --chunk-bytes 200000
+    curl -s http://127.0.0.1:8767/api/products | python -m json.tool | head
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import pathlib
+import sys
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+from config import (
+    PORTAL_URL, PORTAL_ADMIN_EMAIL, PORTAL_ADMIN_PASSWORD,
+    UPLOAD_CHUNK_BYTES, UPLOAD_MAX_RETRIES,
+    OUTPUT_NDJSON_GZ, UPLOAD_STATE_JSON,
+    CATALOG_MANIFEST, CATALOG_MANIFEST_PENDING, OUTPUT_DELTA_JSON,
+)
+from catalog_delta import to_portal_product, mark_applied, mark_replaced
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Export (called from ai_transform.py)
+# ─────────────────────────────────────────────────────────────────────────────
+
+def write_ndjson_gz(path: str, output_rows: list[dict]) -> None:
+    """Write output rows as gzip NDJSON, one insertProductSchema object (+ id) per line.
+
+    Written via path.tmp and moved into place when complete, so the uploader
+    never picks up a cut-short export.
+    """
+    tmp = f"{path}.tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+        for row in output_rows:
+            product = {"id": row["id"], **to_portal_product(row)}
+            f.write(json.dumps(product, ensure_ascii=False, separators=(",", ":")))
+            f.write("\n")
+    os.replace(tmp, path)
+
+
+def iter_chunks(path: str, chunk_bytes: int):
+    """Yield (seq, [ndjson line bytes]) with each chunk's payload ≤ chunk_bytes.
+
+    A single line larger than chunk_bytes still goes out as its own chunk.
+    Chunk boundaries depend only on the file and chunk_bytes, which is what
+    makes sequence numbers valid across a resumed upload.
+    """
+    seq, lines, size = 0, [], 0
+    with gzip.open(path, "rb") as f:
+        for line in f:
+            line = line.rstrip(b"\n")
+            if not line:
+                continue
+            if lines and size + len(line) + 1 > chunk_bytes:
+                yield seq, lines
+                seq, lines, size = seq + 1, [], 0
+            lines.append(line)
+            size += len(line) + 1
+    if lines:
+        yield seq, lines
+
+
+def export_counts(path: str, chunk_bytes: int) -> tuple[int, int]:
+    """→ (products, chunks) of an export, as iter_chunks will send it."""
+    products = chunks = 0
+    for _, lines in iter_chunks(path, chunk_bytes):
+        products += len(lines)
+        chunks   += 1
+    return products, chunks
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# HTTP
+# ─────────────────────────────────────────────────────────────────────────────
+
+def make_session(max_retries: int = UPLOAD_MAX_RETRIES) -> requests.Session:
+    """One keep-alive connection, retrying connection errors and 429/5xx on every method.
+
+    Retrying POSTs is safe here: chunk requests are idempotent by sequence number.
+    """
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=1,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=None,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def login(session: requests.Session, base_url: str, email: str, password: str) -> None:
+    resp = session.post(f"{base_url}/api/auth/login",
+                        json={"email": email, "password": password}, timeout=30)
+    resp.raise_for_status()
+
+
+def post_chunk(session: requests.Session, base_url: str, token: str,
+               seq: int, lines: list[bytes]) -> dict:
+    """Send one chunk; the JSON body is assembled from the NDJSON lines without re-parsing."""
+    body = b'{"seq":%d,"products":[' % seq + b",".join(lines) + b"]}"
+    resp = session.post(
+        f"{base_url}/api/products/import-sessions/{token}/chunks",
+        data=gzip.compress(body),
+        headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+        timeout=120,
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Resume state
+# ─────────────────────────────────────────────────────────────────────────────
+
+def load_state(path: str) -> dict:
+    p = pathlib.Path(path)
+    if not p.exists():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(path: str, state: dict) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=1)
+
+
+def open_session(session: requests.Session, base_url: str, state: dict) -> tuple[str, int]:
+    """Return (token, next_seq) — resuming the saved session when the portal still has it."""
+    token = state.get("token")
+    if token:
+        resp = session.get(f"{base_url}/api/products/import-sessions/{token}", timeout=30)
+        if resp.status_code == 200:
+            next_seq = resp.json()["nextSeq"]
+            print(f"Resuming upload {token[:8]}… from chunk {next_seq + 1}")
+            return token, next_seq
+        print("  ⚠  Saved upload session no longer exists on the portal — starting over")
+
+    resp = session.post(f"{base_url}/api/products/import-sessions", json={}, timeout=30)
+    resp.raise_for_status()
+    return resp.json()["token"], 0
+
+
+def upload(path: str, base_url: str, email: str, password: str,
+           chunk_bytes: int = UPLOAD_CHUNK_BYTES, state_path: str = UPLOAD_STATE_JSON,
+           restart: bool = False) -> dict:
+    """Upload one NDJSON export, resuming a previous attempt of the same file."""
+    base_url = base_url.rstrip("/")
+    products, chunks = export_counts(path, chunk_bytes)
+    if not products:
+        # Completing an empty session would remove the whole catalog
+        raise SystemExit(f"❌  {path} has no products — refusing to upload")
+    digest   = file_digest(path)
+    state    = {} if restart else load_state(state_path)
+    if state.get("file") != digest or state.get("chunk_bytes") != chunk_bytes:
+        state = {}
+
+    session = make_session()
+    login(session, base_url, email, password)
+
+    token, next_seq = open_session(session, base_url, state)
+    save_state(state_path, {"file": digest, "chunk_bytes": chunk_bytes, "token": token})
+
+    sent = 0
+    for seq, lines in iter_chunks(path, chunk_bytes):
+        if seq < next_seq:
+            continue
+        result = post_chunk(session, base_url, token, seq, lines)
+        sent += len(lines)
+        print(f"  Chunk {seq + 1} — {len(lines)} products ({result['received']} total) ✓")
+
+    # The portal only prunes the catalog if it received exactly this many products and chunks
+    resp = session.post(f"{base_url}/api/products/import-sessions/{token}/complete",
+                        json={"expectedCount": products, "expectedChunks": chunks}, timeout=300)
+    resp.raise_for_status()
+    pathlib.Path(state_path).unlink(missing_ok=True)
+    return {**resp.json(), "sent": sent}
+
+
+def read_catalog(path: str) -> dict:
+    """{id: product} of an NDJSON.gz export — what the portal holds after uploading it."""
+    catalog = {}
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                product = json.loads(line)
+                catalog[product.pop("id")] = product
+    return catalog
+
+
+def upload_delta(path: str, base_url: str, email: str, password: str) -> dict:
+    """Post a catalog delta (output_delta.json) to /api/products/delta-import."""
+    base_url = base_url.rstrip("/")
+    with open(path, "rb") as f:
+        body = f.read()
+    session = make_session()
+    login(session, base_url, email, password)
+    resp = session.post(
+        f"{base_url}/api/products/delta-import",
+        data=gzip.compress(body),
+        headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+        timeout=300,
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Main
+# ─────────────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", nargs="?", default=OUTPUT_NDJSON_GZ,
+                        help="NDJSON.gz export to upload (default: output_import.ndjson.gz)")
+    parser.add_argument("--url", default=PORTAL_URL, help="Portal base URL")
+    parser.add_argument("--chunk-bytes", type=int, default=UPLOAD_CHUNK_BYTES,
+                        help="Max uncompressed bytes per chunk request")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore a saved resume token and start a new upload")
+    parser.add_argument("--delta", action="store_true",
+                        help=f"Apply {OUTPUT_DELTA_JSON} instead of uploading the full export")
+    args = parser.parse_args()
+
+    if not PORTAL_ADMIN_EMAIL or not PORTAL_ADMIN_PASSWORD:
+        raise RuntimeError(
+            "PORTAL_ADMIN_EMAIL / PORTAL_ADMIN_PASSWORD not set.\n"
+            "Add them to scripts/.env to upload to the portal."
+        )
+
+    if args.delta:
+        print(f"Applying {OUTPUT_DELTA_JSON} → {args.url}")
+        result = upload_delta(OUTPUT_DELTA_JSON, args.url, PORTAL_ADMIN_EMAIL, PORTAL_ADMIN_PASSWORD)
+        print(f"  {result['message']}")
+        if mark_applied(CATALOG_MANIFEST, CATALOG_MANIFEST_PENDING, OUTPUT_DELTA_JSON):
+            print(f"Manifest advanced → {CATALOG_MANIFEST}")
+        else:
+            print("  ⚠  No pending manifest for this delta (already applied?) — manifest unchanged")
+        return
+
+    print(f"Uploading {args.path} → {args.url}")
+    result = upload(args.path, args.url, PORTAL_ADMIN_EMAIL, PORTAL_ADMIN_PASSWORD,
+                    chunk_bytes=args.chunk_bytes, restart=args.restart)
+    # The portal now holds exactly this export: the next delta is computed against it
+    mark_replaced(CATALOG_MANIFEST, read_catalog(args.path))
+
+    print(f"\n{'─'*50}")
+    print(f"Products sent       : {result['sent']}")
+    print(f"Catalog size        : {result['count']}")
+    print(f"Removed from portal : {result['removed']}")
+    print(f"{'─'*50}")
+
+
+if __name__ == "__main__":
+    main()
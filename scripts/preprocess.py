@@ -10,8 +10,10 @@ Writes : scripts/intermediate.csv     (clean, normalised, ready for AI step)
 
 Run from repo root:
     python scripts/preprocess.py
+    python scripts/preprocess.py --profile --metrics-out metrics.json   # per-stage timings
 """
 
+import argparse
 import csv
 import math
 import re
@@ -29,6 +31,8 @@ from config import (
     IMCOPEX_BLOCKED_BRANDS, IMCOPEX_BLOCKED_CATEGORIES,
     REFURB_KEYWORDS,
 )
+from metrics import Metrics, add_metrics_args, finish_metrics
+from records import record_type
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Load supplier registry
@@ -303,6 +307,7 @@ INTERMEDIATE_HEADERS = [
     "price_raw", "currency", "availableQuantity", "moq",
     "stock", "visibleCustomerTypes",
 ]
+IntermediateRow = record_type("IntermediateRow", INTERMEDIATE_HEADERS)
 
 DEFAULT_SUPPLIER = {
     "type":                 "international",
@@ -311,266 +316,347 @@ DEFAULT_SUPPLIER = {
 }
 
 
-def main():
-    supplier_config = load_supplier_config(SUPPLIERS_CSV)
-    print(f"Loaded {len(supplier_config)} supplier(s) from {SUPPLIERS_CSV}")
-    known_brands = load_brands(BRANDS_CSV)
-    print(f"Loaded {len(known_brands)} brand(s) from {BRANDS_CSV}")
+def skip_reason(row: dict) -> str | None:
+    """Why a parsed raw row is filtered out, or None if it should be kept."""
+    # ── Filter: separator rows ──
+    if is_separator_row(row):
+        return "separator"
+
+    # ── Filter: zero-stock products (user decision: exclude) ──
+    if is_zero_stock(row):
+        return "zero_stock"
+
+    # ── Global brand blocklist ────────────────────────────────────────────
+    if row.get("Brand", "").strip().upper() in GLOBAL_BLOCKED_BRANDS:
+        return "blocked_brand"
+
+    supplier = row.get("Supplier", "").strip()
+
+    # ── Phonix: skip non-IT products (blocked brand, category, or refurb) ──
+    if supplier == "Phonix":
+        if row.get("Category", "").strip().upper() in PHONIX_BLOCKED_CATEGORIES:
+            return "blocked_category"
+        if row.get("Brand", "").strip().upper() in PHONIX_BLOCKED_BRANDS:
+            return "blocked_brand"
+        _phonix_text = (row.get("Name", "") + " " + row.get("Model", "")).upper()
+        if any(kw in _phonix_text for kw in REFURB_KEYWORDS):
+            return "refurb"
+
+    # ── HubX: skip empty-category rows and refurb products ───────────────
+    elif supplier == "HubX":
+        if row.get("Category", "").strip() in HUBX_BLOCKED_CATEGORIES:
+            return "blocked_category"
+        _hubx_text = (row.get("Name", "") + " " + row.get("Model", "")).upper()
+        if any(kw in _hubx_text for kw in REFURB_KEYWORDS):
+            return "refurb"
+
+    # ── BitSet: only keep rows where Notes contains a manufacturer SKU ──
+    elif supplier == "BitSet":
+        if "SKU: " not in row.get("Notes", ""):
+            return "no_sku"
+
+    # ── Imcopex: skip non-IT categories and non-IT brands ────────────────
+    elif supplier == "Imcopex":
+        if row.get("Category", "").strip() in IMCOPEX_BLOCKED_CATEGORIES:
+            return "blocked_category"
+        if row.get("Brand", "").strip() in IMCOPEX_BLOCKED_BRANDS:
+            return "blocked_brand"
+
+    # ── ELKO Group: skip refurb/preowned products (GRADE A/A+, REFURB.) ──
+    elif supplier == "ELKO Group":
+        _elko_text = (row.get("Name", "") + " " + row.get("Model", "")).upper()
+        if any(kw in _elko_text for kw in REFURB_KEYWORDS):
+            return "refurb"
+
+    return None
+
+
+def process_row(row: dict, lineno: int, supplier_config: dict, known_brands: list,
+                stats: dict) -> dict | None:
+    """Filter and map one parsed raw row to an intermediate row.
+
+    Returns None for rows that are filtered out (counted in stats["skipped"]
+    and, by reason and supplier, in stats["metrics"]).
+    """
+    metrics = stats["metrics"]
+    mark    = metrics.mark()
+    reason  = skip_reason(row)
+    mark    = metrics.lap("filter", mark)
+    if reason:
+        stats["skipped"] += 1
+        metrics.count("skipped_by_reason", reason)
+        metrics.count("skipped_by_supplier", row.get("Supplier", "").strip() or "?")
+        return None
 
-    ok_rows    = []
-    error_rows = []
-    skipped    = 0
-    total_raw  = 0
-
-    with open(RAW_CSV, newline="", encoding="utf-8-sig") as f:
-        lines = f.readlines()
-
-    # First line is the header — skip it
-    data_lines = lines[1:]
-    total_raw  = len(data_lines)
-
-    for lineno, line in enumerate(data_lines, start=2):
-        line = line.rstrip("\n").rstrip("\r")
-        if not line.strip():
-            continue
-
-        row = try_parse_row(line)
-        if row is None:
-            error_rows.append({"lineno": lineno, "raw": line, "reason": "parse_failed"})
-            continue
-
-        # ── Filter: separator rows ──
-        if is_separator_row(row):
-            skipped += 1
-            continue
-
-        # ── Filter: zero-stock products (user decision: exclude) ──
-        if is_zero_stock(row):
-            skipped += 1
-            continue
-
-        # ── Global brand blocklist ────────────────────────────────────────────
-        if row.get("Brand", "").strip().upper() in GLOBAL_BLOCKED_BRANDS:
-            skipped += 1
-            continue
-
-        # ── Phonix: skip non-IT products (blocked brand, category, or refurb) ──
-        if row.get("Supplier", "").strip() == "Phonix":
-            if row.get("Category", "").strip().upper() in PHONIX_BLOCKED_CATEGORIES:
-                skipped += 1
-                continue
-            if row.get("Brand", "").strip().upper() in PHONIX_BLOCKED_BRANDS:
-                skipped += 1
-                continue
-            _phonix_text = (row.get("Name", "") + " " + row.get("Model", "")).upper()
-            if any(kw in _phonix_text for kw in REFURB_KEYWORDS):
-                skipped += 1
+    # ── Supplier lookup ──
+    supplier_name = row.get("Supplier", "").strip()
+    cfg = supplier_config.get(supplier_name)
+    if cfg is None:
+        # Reported once per supplier at the end of the run (see report_unknown_suppliers)
+        stats["unknown_suppliers"].setdefault(supplier_name, lineno)
+        metrics.count("unknown_supplier", supplier_name or "?")
+        cfg = DEFAULT_SUPPLIER.copy()
+
+    # ── Field mapping ──
+    qty_parsed = parse_stock_quantity(row.get("Stock", ""))
+    if qty_parsed is None:
+        # Supplier provided no stock info — estimate as ceil(5000 / price)
+        try:
+            price_val = float(row.get("Price", "0").strip())
+            qty_parsed = math.ceil(5000.0 / price_val) if price_val > 0 else 0
+        except (ValueError, TypeError):
+            qty_parsed = 0
+    quantity = qty_parsed
+    moq      = parse_moq(row.get("MOQ", "NO"))
+    stock    = map_stock_status(quantity, cfg["type"])
+    mark     = metrics.lap("map", mark)
+    brand    = extract_brand(row.get("Brand", ""), row.get("Name", ""), known_brands)
+    mark     = metrics.lap("brand", mark)
+
+    model    = row.get("Model", "").strip()
+    name_raw = row.get("Name",  "").strip()
+
+    # ── Supplier-specific offer-name parsing ──────────────────────────────
+    # GHz Service S.r.l. packs qty + SKU + product name + EUR price into
+    # the Name field with no Model column.  Extract the SKU so it becomes
+    # the cache key, and clean the name so Gemini gets tidy input.
+    # Add elif blocks here for other offer-format suppliers as needed.
+    if supplier_name == "GHz Service S.r.l.":
+        if not model:
+            model = extract_sku_from_offer_name(name_raw)
+        name_raw = clean_offer_name(name_raw)
+
+    elif supplier_name == "Summit Sincerity Global LTD":
+        # Extract MOQ if embedded in name ("Moq 200pcs" / "MOQ 10pcs")
+        moq_m = _SUMMIT_MOQ_RE.search(name_raw)
+        if moq_m and not moq:
+            moq = moq_m.group(1)
+
+        if not model:
+            # ── Crucial SSD: "CT4000P310SSD8 P310 PCIe Gen4 NVMe 2280 M.2 Moq 200pcs"
+            ct_m = re.match(r'^(CT[A-Z0-9]+)', name_raw, re.IGNORECASE)
+            if ct_m:
+                model    = ct_m.group(1)
+                name_raw = _SUMMIT_MOQ_STRIP.sub('', name_raw).strip()
+
+            # ── AMD CPU boxed: "AMD Ryzen 9850x3d ENG BOX" / "AMD Ryzen 9850x3d CN BOX"
+            #    ENG BOX and CN BOX have different retail SKUs → separate cache entries
+            elif _SUMMIT_AMD_BOX_RE.match(name_raw):
+                m2       = _SUMMIT_AMD_BOX_RE.match(name_raw)
+                cpu_id   = m2.group(1).upper()
+                box_type = m2.group(2).upper()
+                model    = f"{cpu_id} {box_type} BOX"
+                name_raw = f"AMD Ryzen {cpu_id} {box_type} BOX"
+
+            # ── AMD CPU tray: "AMD Ryzen Tray 9950X3D"
+            #    Tray SKU differs from boxed → separate cache entry with TRAY suffix
+            elif _SUMMIT_AMD_TRAY_RE.match(name_raw):
+                cpu_id   = _SUMMIT_AMD_TRAY_RE.match(name_raw).group(1).upper()
+                model    = f"{cpu_id} TRAY"
+                name_raw = f"AMD Ryzen {cpu_id} Tray"
+
+            # ── AMD GPU offer: "AMD GPU Radeon Offer : (...MOQ 10pcs) Powercolor RX9070XT 16G-A -"
+            elif name_raw.upper().startswith("AMD GPU RADEON OFFER"):
+                gpu_m = re.search(r'\)\s*(.+?)\s*-\s*$', name_raw)
+                if gpu_m:
+                    gpu_part = gpu_m.group(1).strip()
+                    name_raw = gpu_part
+                    parts    = gpu_part.split(None, 1)
+                    model    = parts[1].strip() if len(parts) > 1 else gpu_part
+
+            # ── Intel CPU boxed/tray: "14900KF", "14700F tray", "Ultra 245 Tray"
+            else:
+                model    = re.sub(r'\s+tray$', '', name_raw, flags=re.IGNORECASE).strip()
+                name_raw = model
+
+    elif supplier_name == "Siewert & Kau":
+        # Offer rows pack all data into Name as tab-separated fields:
+        #   "CT1000P310SSD8\tSSD Crucial P310 M.2 1TB PCIe Gen4x4 2280\t100"
+        # Price List rows already have Model/Name/Category populated — leave untouched.
+        if row.get("Source", "").strip() == "Offer" and not model:
+            parts = name_raw.split("\t")
+            if len(parts) >= 2:
+                model    = parts[0].strip()
+                name_raw = parts[1].strip()
+                if len(parts) >= 3 and not moq:
+                    moq = parts[2].strip()
+
+    elif supplier_name == "BitSet":
+        # Replace internal BitSet article number with the real manufacturer SKU
+        # from Notes: "SKU: G27C4 E3 | Features: ..."
+        m = re.search(r'SKU:\s*([^|]+)', row.get("Notes", ""))
+        if m:
+            model = m.group(1).strip()
+
+    elif supplier_name == "ELKO Group":
+        # Offer rows: Name is tab-separated "p1\tp2\tqty_delivery"
+        # Pattern A: "1102Z43NL0\tKyocera ECOSYS MA4000CIX\t36 1-3 weeks"
+        #   → p1 is SKU (no spaces, matches part-num pattern)
+        # Pattern B: "HP LaserJet Pro M501dn (J8H61A#B19)\tJ8H61A#B19\t100 3-4 weeks"
+        #   → p1 is product name, p2 is SKU
+        # Price List rows already have Model populated — leave untouched.
+        if row.get("Source", "").strip() == "Offer":
+            parts = name_raw.split("\t")
+            if len(parts) >= 2:
+                p1           = parts[0].strip()
+                p2           = parts[1].strip()
+                qty_delivery = parts[2].strip() if len(parts) >= 3 else ""
+
+                if _ELKO_OFFER_SKU_RE.match(p1):
+                    # Pattern A: SKU first
+                    model    = p1
+                    name_raw = p2
+                else:
+                    # Pattern B: name first, SKU second; strip "(SKU)" from name
+                    model    = p2
+                    name_raw = re.sub(
+                        r'\s*\([A-Z0-9#][^)]*\)\s*$', '', p1,
+                        flags=re.IGNORECASE,
+                    ).strip() or p1
+
+                # Extract stock qty from "N delivery_info" (e.g. "36 1-3 weeks")
+                if qty_delivery:
+                    qty_m = re.match(r'^(\d+)', qty_delivery)
+                    if qty_m:
+                        quantity = int(qty_m.group(1))
+                        stock    = map_stock_status(quantity, cfg["type"])
+
+    # ── Numeric-only model: prefix with brand to avoid cache collisions ──────
+    # Also handles Excel scientific notation exports: "1.96E+11" → "microsoft-196000000000"
+    if model and _NUMERIC_MODEL_RE.match(model.strip()) and brand:
+        try:
+            numeric_str = str(int(float(model.strip())))
+        except (ValueError, OverflowError):
+            numeric_str = model.strip()
+        model = f"{brand.upper()}-{numeric_str}"
+    metrics.lap("supplier_rewrite", mark)
+
+    return IntermediateRow({
+        "supplier":             supplier_name,
+        "brand_raw":            brand,
+        "model":                model,
+        "name_raw":             name_raw,
+        "category_raw":         row.get("Category", "").strip(),
+        "price_raw":            row.get("Price", "0").strip(),
+        "currency":             row.get("Currency", cfg["currency"]).strip().upper(),
+        "availableQuantity":    quantity,
+        "moq":                  moq,
+        "stock":                stock,
+        "visibleCustomerTypes": cfg["visibleCustomerTypes"],
+    })
+
+
+def iter_intermediate_rows(path: str, supplier_config: dict, known_brands: list,
+                           stats: dict):
+    """Stream the raw export and yield intermediate rows one by one.
+
+    The file is read line by line, so consumers (ai_transform via pipeline.py)
+    can start on the first rows while later ones are still being parsed.
+    Counters and parse errors are accumulated in stats (see new_stats()).
+    """
+    metrics = stats["metrics"]
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        mark = metrics.mark()
+        for lineno, line in enumerate(f, start=1):
+            # First line is the header — skip it
+            if lineno == 1:
                 continue
+            stats["total_raw"] += 1
 
-        # ── HubX: skip empty-category rows and refurb products ───────────────
-        elif row.get("Supplier", "").strip() == "HubX":
-            if row.get("Category", "").strip() in HUBX_BLOCKED_CATEGORIES:
-                skipped += 1
-                continue
-            _hubx_text = (row.get("Name", "") + " " + row.get("Model", "")).upper()
-            if any(kw in _hubx_text for kw in REFURB_KEYWORDS):
-                skipped += 1
+            line = line.rstrip("\n").rstrip("\r")
+            mark = metrics.lap("read", mark)
+            if not line.strip():
                 continue
 
-        # ── BitSet: only keep rows where Notes contains a manufacturer SKU ──
-        elif row.get("Supplier", "").strip() == "BitSet":
-            if "SKU: " not in row.get("Notes", ""):
-                skipped += 1
+            row  = try_parse_row(line)
+            mark = metrics.lap("parse", mark)
+            if row is None:
+                stats["errors"].append({"lineno": lineno, "raw": line, "reason": "parse_failed"})
+                metrics.count("parse_failed_by_supplier", _guess_supplier(line))
                 continue
 
-        # ── Imcopex: skip non-IT categories and non-IT brands ────────────────
-        elif row.get("Supplier", "").strip() == "Imcopex":
-            if row.get("Category", "").strip() in IMCOPEX_BLOCKED_CATEGORIES:
-                skipped += 1
-                continue
-            if row.get("Brand", "").strip() in IMCOPEX_BLOCKED_BRANDS:
-                skipped += 1
-                continue
+            inter = process_row(row, lineno, supplier_config, known_brands, stats)
+            if inter is not None:
+                yield inter
+            # Time spent by the consumer between yields is not ours
+            mark = metrics.mark()
 
-        # ── ELKO Group: skip refurb/preowned products (GRADE A/A+, REFURB.) ──
-        elif row.get("Supplier", "").strip() == "ELKO Group":
-            _elko_text = (row.get("Name", "") + " " + row.get("Model", "")).upper()
-            if any(kw in _elko_text for kw in REFURB_KEYWORDS):
-                skipped += 1
-                continue
 
-        # ── Supplier lookup ──
-        supplier_name = row.get("Supplier", "").strip()
-        cfg = supplier_config.get(supplier_name)
-        if cfg is None:
-            print(f"  ⚠  Unknown supplier '{supplier_name}' on line {lineno} — using international defaults")
-            cfg = DEFAULT_SUPPLIER.copy()
-
-        # ── Field mapping ──
-        qty_parsed = parse_stock_quantity(row.get("Stock", ""))
-        if qty_parsed is None:
-            # Supplier provided no stock info — estimate as ceil(5000 / price)
-            try:
-                price_val = float(row.get("Price", "0").strip())
-                qty_parsed = math.ceil(5000.0 / price_val) if price_val > 0 else 0
-            except (ValueError, TypeError):
-                qty_parsed = 0
-        quantity = qty_parsed
-        moq      = parse_moq(row.get("MOQ", "NO"))
-        stock    = map_stock_status(quantity, cfg["type"])
-        brand    = extract_brand(row.get("Brand", ""), row.get("Name", ""), known_brands)
-
-        model    = row.get("Model", "").strip()
-        name_raw = row.get("Name",  "").strip()
-
-        # ── Supplier-specific offer-name parsing ──────────────────────────────
-        # GHz Service S.r.l. packs qty + SKU + product name + EUR price into
-        # the Name field with no Model column.  Extract the SKU so it becomes
-        # the cache key, and clean the name so Gemini gets tidy input.
-        # Add elif blocks here for other offer-format suppliers as needed.
-        if supplier_name == "GHz Service S.r.l.":
-            if not model:
-                model = extract_sku_from_offer_name(name_raw)
-            name_raw = clean_offer_name(name_raw)
-
-        elif supplier_name == "Summit Sincerity Global LTD":
-            # Extract MOQ if embedded in name ("Moq 200pcs" / "MOQ 10pcs")
-            moq_m = _SUMMIT_MOQ_RE.search(name_raw)
-            if moq_m and not moq:
-                moq = moq_m.group(1)
-
-            if not model:
-                # ── Crucial SSD: "CT4000P310SSD8 P310 PCIe Gen4 NVMe 2280 M.2 Moq 200pcs"
-                ct_m = re.match(r'^(CT[A-Z0-9]+)', name_raw, re.IGNORECASE)
-                if ct_m:
-                    model    = ct_m.group(1)
-                    name_raw = _SUMMIT_MOQ_STRIP.sub('', name_raw).strip()
-
-                # ── AMD CPU boxed: "AMD Ryzen 9850x3d ENG BOX" / "AMD Ryzen 9850x3d CN BOX"
-                #    ENG BOX and CN BOX have different retail SKUs → separate cache entries
-                elif _SUMMIT_AMD_BOX_RE.match(name_raw):
-                    m2       = _SUMMIT_AMD_BOX_RE.match(name_raw)
-                    cpu_id   = m2.group(1).upper()
-                    box_type = m2.group(2).upper()
-                    model    = f"{cpu_id} {box_type} BOX"
-                    name_raw = f"AMD Ryzen {cpu_id} {box_type} BOX"
-
-                # ── AMD CPU tray: "AMD Ryzen Tray 9950X3D"
-                #    Tray SKU differs from boxed → separate cache entry with TRAY suffix
-                elif _SUMMIT_AMD_TRAY_RE.match(name_raw):
-                    cpu_id   = _SUMMIT_AMD_TRAY_RE.match(name_raw).group(1).upper()
-                    model    = f"{cpu_id} TRAY"
-                    name_raw = f"AMD Ryzen {cpu_id} Tray"
-
-                # ── AMD GPU offer: "AMD GPU Radeon Offer : (...MOQ 10pcs) Powercolor RX9070XT 16G-A -"
-                elif name_raw.upper().startswith("AMD GPU RADEON OFFER"):
-                    gpu_m = re.search(r'\)\s*(.+?)\s*-\s*$', name_raw)
-                    if gpu_m:
-                        gpu_part = gpu_m.group(1).strip()
-                        name_raw = gpu_part
-                        parts    = gpu_part.split(None, 1)
-                        model    = parts[1].strip() if len(parts) > 1 else gpu_part
-
-                # ── Intel CPU boxed/tray: "14900KF", "14700F tray", "Ultra 245 Tray"
-                else:
-                    model    = re.sub(r'\s+tray$', '', name_raw, flags=re.IGNORECASE).strip()
-                    name_raw = model
-
-        elif supplier_name == "Siewert & Kau":
-            # Offer rows pack all data into Name as tab-separated fields:
-            #   "CT1000P310SSD8\tSSD Crucial P310 M.2 1TB PCIe Gen4x4 2280\t100"
-            # Price List rows already have Model/Name/Category populated — leave untouched.
-            if row.get("Source", "").strip() == "Offer" and not model:
-                parts = name_raw.split("\t")
-                if len(parts) >= 2:
-                    model    = parts[0].strip()
-                    name_raw = parts[1].strip()
-                    if len(parts) >= 3 and not moq:
-                        moq = parts[2].strip()
-
-        elif supplier_name == "BitSet":
-            # Replace internal BitSet article number with the real manufacturer SKU
-            # from Notes: "SKU: G27C4 E3 | Features: ..."
-            m = re.search(r'SKU:\s*([^|]+)', row.get("Notes", ""))
-            if m:
-                model = m.group(1).strip()
-
-        elif supplier_name == "ELKO Group":
-            # Offer rows: Name is tab-separated "p1\tp2\tqty_delivery"
-            # Pattern A: "1102Z43NL0\tKyocera ECOSYS MA4000CIX\t36 1-3 weeks"
-            #   → p1 is SKU (no spaces, matches part-num pattern)
-            # Pattern B: "HP LaserJet Pro M501dn (J8H61A#B19)\tJ8H61A#B19\t100 3-4 weeks"
-            #   → p1 is product name, p2 is SKU
-            # Price List rows already have Model populated — leave untouched.
-            if row.get("Source", "").strip() == "Offer":
-                parts = name_raw.split("\t")
-                if len(parts) >= 2:
-                    p1           = parts[0].strip()
-                    p2           = parts[1].strip()
-                    qty_delivery = parts[2].strip() if len(parts) >= 3 else ""
-
-                    if _ELKO_OFFER_SKU_RE.match(p1):
-                        # Pattern A: SKU first
-                        model    = p1
-                        name_raw = p2
-                    else:
-                        # Pattern B: name first, SKU second; strip "(SKU)" from name
-                        model    = p2
-                        name_raw = re.sub(
-                            r'\s*\([A-Z0-9#][^)]*\)\s*$', '', p1,
-                            flags=re.IGNORECASE,
-                        ).strip() or p1
-
-                    # Extract stock qty from "N delivery_info" (e.g. "36 1-3 weeks")
-                    if qty_delivery:
-                        qty_m = re.match(r'^(\d+)', qty_delivery)
-                        if qty_m:
-                            quantity = int(qty_m.group(1))
-                            stock    = map_stock_status(quantity, cfg["type"])
-
-        # ── Numeric-only model: prefix with brand to avoid cache collisions ──────
-        # Also handles Excel scientific notation exports: "1.96E+11" → "microsoft-196000000000"
-        if model and _NUMERIC_MODEL_RE.match(model.strip()) and brand:
-            try:
-                numeric_str = str(int(float(model.strip())))
-            except (ValueError, OverflowError):
-                numeric_str = model.strip()
-            model = f"{brand.upper()}-{numeric_str}"
-
-        ok_rows.append({
-            "supplier":             supplier_name,
-            "brand_raw":            brand,
-            "model":                model,
-            "name_raw":             name_raw,
-            "category_raw":         row.get("Category", "").strip(),
-            "price_raw":            row.get("Price", "0").strip(),
-            "currency":             row.get("Currency", cfg["currency"]).strip().upper(),
-            "availableQuantity":    quantity,
-            "moq":                  moq,
-            "stock":                stock,
-            "visibleCustomerTypes": cfg["visibleCustomerTypes"],
-        })
+def _guess_supplier(raw_line: str) -> str:
+    """Supplier column of an unparseable line, for per-supplier failure counts."""
+    parts = raw_line.split(",", 3)
+    if len(parts) < 4:
+        return "?"
+    return parts[2].strip().strip('"') or "?"
 
-    # ── Write intermediate CSV ──
-    with open(INTERMEDIATE_CSV, "w", newline="", encoding="utf-8-sig") as f:
+
+def new_stats(metrics: Metrics | None = None) -> dict:
+    """Run counters shared by iter_intermediate_rows() and process_row().
+
+    {"total_raw": int, "skipped": int, "errors": [{"lineno", "raw", "reason"}],
+     "unknown_suppliers": {name: first lineno}, "metrics": Metrics}
+    """
+    return {"total_raw": 0, "skipped": 0, "errors": [], "unknown_suppliers": {},
+            "metrics": metrics or Metrics("preprocess")}
+
+
+def report_unknown_suppliers(stats: dict) -> None:
+    """One warning per unknown supplier name (instead of one per row)."""
+    counts = stats["metrics"].counters.get("unknown_supplier", {})
+    for name, first_line in stats["unknown_suppliers"].items():
+        print(f"  ⚠  Unknown supplier '{name}' on {counts.get(name or '?', 0)} row(s) "
+              f"(first: line {first_line}) — using international defaults")
+
+
+def write_intermediate(path: str, rows: list[dict]) -> None:
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
         writer = csv.DictWriter(f, fieldnames=INTERMEDIATE_HEADERS)
         writer.writeheader()
-        writer.writerows(ok_rows)
+        writer.writerows(rows)
+
+
+def write_error_log(path: str, error_rows: list[dict]) -> None:
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=["lineno", "raw", "reason"])
+        writer.writeheader()
+        writer.writerows(error_rows)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    add_metrics_args(parser)
+    args = parser.parse_args()
+
+    metrics = Metrics("preprocess")
+    with metrics.stage("load_registries"):
+        supplier_config = load_supplier_config(SUPPLIERS_CSV)
+        known_brands = load_brands(BRANDS_CSV)
+    print(f"Loaded {len(supplier_config)} supplier(s) from {SUPPLIERS_CSV}")
+    print(f"Loaded {len(known_brands)} brand(s) from {BRANDS_CSV}")
+
+    stats   = new_stats(metrics)
+    ok_rows = list(iter_intermediate_rows(RAW_CSV, supplier_config, known_brands, stats))
+    error_rows = stats["errors"]
+    report_unknown_suppliers(stats)
+
+    # ── Write intermediate CSV ──
+    with metrics.stage("write", rows=len(ok_rows)):
+        write_intermediate(INTERMEDIATE_CSV, ok_rows)
 
     # ── Write error log ──
     if error_rows:
-        with open(ERROR_LOG, "w", newline="", encoding="utf-8-sig") as f:
-            writer = csv.DictWriter(f, fieldnames=["lineno", "raw", "reason"])
-            writer.writeheader()
-            writer.writerows(error_rows)
+        write_error_log(ERROR_LOG, error_rows)
 
     print(f"\n{'─'*50}")
-    print(f"Raw lines processed : {total_raw}")
-    print(f"Skipped (headers/zero-stock): {skipped}")
+    print(f"Raw lines processed : {stats['total_raw']}")
+    print(f"Skipped (headers/zero-stock): {stats['skipped']}")
     print(f"Parse errors        : {len(error_rows)}  → {ERROR_LOG}")
     print(f"Output rows         : {len(ok_rows)}  → {INTERMEDIATE_CSV}")
     print(f"{'─'*50}")
 
+    metrics.set("output_rows", len(ok_rows))
+    finish_metrics(metrics, args)
+
 
 if __name__ == "__main__":
     main()
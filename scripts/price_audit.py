@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+price_audit.py
+──────────────
+Indexed store of every run's price breakdowns (the price_debug.csv rows:
+freight, duty, broker fee, margin, final AMD price …) and a CLI to explain
+one SKU's price and how it changed across runs without opening a CSV.
+
+Runs of ai_transform.py, pipeline.py, daemon.py and build.py (price stage)
+record their rows in PRICE_AUDIT_DB (SQLite) unless --no-price-audit; test
+runs are not recorded.  A breakdown is stored once and every run references
+the breakdowns it produced, so a run that changes a hundred prices adds a
+hundred rows plus one small reference per product.  Breakdowns are indexed
+by SKU, supplier and product type; the last PRICE_AUDIT_KEEP_RUNS runs are
+kept.
+
+price_debug.csv is still written for spreadsheets unless --no-debug-csv
+(WRITE_PRICE_DEBUG_CSV).
+
+Run from repo root:
+    python scripts/price_audit.py J8H500A                  # latest breakdown + history
+    python scripts/price_audit.py J8H500A --supplier DG --runs 20
+    python scripts/price_audit.py --product-type Laptops   # latest run, one product type
+    python scripts/price_audit.py --list-runs
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+from config import PRICE_AUDIT_DB, PRICE_AUDIT, PRICE_AUDIT_KEEP_RUNS, WRITE_PRICE_DEBUG_CSV
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id  INTEGER PRIMARY KEY AUTOINCREMENT,
+    created TEXT NOT NULL,
+    source  TEXT NOT NULL,
+    cb_rate REAL,
+    rows    INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS breakdowns (
+    id      INTEGER PRIMARY KEY,        -- content hash of the row
+    sku_key TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS run_rows (
+    run_id       INTEGER NOT NULL,
+    breakdown_id INTEGER NOT NULL,
+    PRIMARY KEY (run_id, breakdown_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS run_rows_breakdown ON run_rows (breakdown_id);
+CREATE INDEX IF NOT EXISTS breakdowns_sku ON breakdowns (sku_key);
+"""
+# Indexed breakdown columns (besides sku_key), if the rows have them
+_INDEXED = ["supplier", "product_type"]
+
+
+def add_audit_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--debug-csv", action=argparse.BooleanOptionalAction,
+                        default=WRITE_PRICE_DEBUG_CSV,
+                        help="Write price_debug.csv (the price audit store has the same rows)")
+    parser.add_argument("--price-audit", action=argparse.BooleanOptionalAction,
+                        default=PRICE_AUDIT,
+                        help=f"Record the run's price breakdowns in {PRICE_AUDIT_DB}")
+
+
+def _row_id(values: tuple) -> int:
+    data = "\x1f".join("" if v is None else str(v) for v in values).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big") >> 1
+
+
+class PriceAudit:
+    def __init__(self, path: str = PRICE_AUDIT_DB):
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(_SCHEMA)
+        self.columns = [r["name"] for r in self.db.execute("PRAGMA table_info(breakdowns)")][2:]
+
+    def close(self) -> None:
+        self.db.close()
+
+    def _ensure_columns(self, fields: list[str]) -> None:
+        """Add breakdown columns the store doesn't have yet (DEBUG_HEADERS grew)."""
+        for field in fields:
+            if field not in self.columns:
+                self.db.execute(f'ALTER TABLE breakdowns ADD COLUMN "{field}"')
+                self.columns.append(field)
+                if field in _INDEXED:
+                    self.db.execute(f'CREATE INDEX IF NOT EXISTS breakdowns_{field} '
+                                    f'ON breakdowns ("{field}")')
+
+    def record(self, rows: list, fields: list[str], source: str, cb_rate: float | None = None,
+               keep: int = PRICE_AUDIT_KEEP_RUNS) -> int:
+        """Store one run's debug rows (one transaction) → run id."""
+        with self.db:
+            self._ensure_columns(fields)
+            run_id = self.db.execute(
+                "INSERT INTO runs (created, source, cb_rate) VALUES (?, ?, ?)",
+                (datetime.now().isoformat(timespec="seconds"), source, cb_rate)).lastrowid
+            breakdowns, refs = [], set()
+            for r in rows:
+                values = tuple(r.get(f) for f in fields)
+                row_id = _row_id(values)
+                breakdowns.append((row_id, str(r.get("sku") or "").strip().lower(), *values))
+                refs.add((run_id, row_id))
+            cols = ", ".join(f'"{f}"' for f in fields)
+            self.db.executemany(
+                f"INSERT OR IGNORE INTO breakdowns (id, sku_key, {cols}) "
+                f"VALUES (?, ?, {', '.join('?' * len(fields))})", breakdowns)
+            self.db.executemany("INSERT INTO run_rows (run_id, breakdown_id) VALUES (?, ?)", refs)
+            self.db.execute("UPDATE runs SET rows = ? WHERE run_id = ?", (len(rows), run_id))
+            self._prune(keep)
+        return run_id
+
+    def _prune(self, keep: int) -> None:
+        old = [r[0] for r in self.db.execute(
+            "SELECT run_id FROM runs ORDER BY run_id DESC LIMIT -1 OFFSET ?", (keep,))]
+        if not old:
+            return
+        marks = ", ".join("?" * len(old))
+        self.db.execute(f"DELETE FROM run_rows WHERE run_id IN ({marks})", old)
+        self.db.execute(f"DELETE FROM runs WHERE run_id IN ({marks})", old)
+        self.db.execute("DELETE FROM breakdowns WHERE NOT EXISTS "
+                        "(SELECT 1 FROM run_rows WHERE breakdown_id = breakdowns.id)")
+
+    # ── Queries ──────────────────────────────────────────────────────────────
+
+    def runs(self, limit: int = 0) -> list[sqlite3.Row]:
+        return self.db.execute("SELECT * FROM runs ORDER BY run_id DESC LIMIT ?",
+                               (limit or -1,)).fetchall()
+
+    def sku_history(self, sku: str, supplier: str = "", runs: int = 0) -> list[sqlite3.Row]:
+        """Breakdowns of sku (case-insensitive) in the last `runs` runs, oldest first."""
+        first = 0
+        if runs:
+            recent = self.runs(runs)
+            first  = recent[-1]["run_id"] if recent else 0
+        query = ("SELECT r.run_id, r.created, r.source, b.* FROM breakdowns b "
+                 "JOIN run_rows rr ON rr.breakdown_id = b.id JOIN runs r ON r.run_id = rr.run_id "
+                 "WHERE b.sku_key = ? AND r.run_id >= ?")
+        params = [sku.strip().lower(), first]
+        if supplier:
+            query += " AND b.supplier = ?"
+            params.append(supplier)
+        return self.db.execute(query + " ORDER BY r.run_id, b.supplier", params).fetchall()
+
+    def product_type(self, product_type: str, run_id: int) -> list[sqlite3.Row]:
+        return self.db.execute(
+            "SELECT b.* FROM breakdowns b JOIN run_rows rr ON rr.breakdown_id = b.id "
+            "WHERE rr.run_id = ? AND b.product_type = ? ORDER BY b.sku_key, b.supplier",
+            (run_id, product_type)).fetchall()
+
+
+def record_run(rows: list, fields: list[str], source: str, cb_rate: float | None = None,
+               path: str = PRICE_AUDIT_DB) -> int:
+    """Record a run in the audit store and print where it went → run id."""
+    audit = PriceAudit(path)
+    try:
+        run_id = audit.record(rows, fields, source, cb_rate)
+    finally:
+        audit.close()
+    print(f"Price audit         : run #{run_id}, {len(rows)} rows  → {path}")
+    return run_id
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# CLI
+# ─────────────────────────────────────────────────────────────────────────────
+
+_SKIP = {"id", "sku_key", "run_id", "created", "source"}
+
+
+def print_sku(audit: PriceAudit, sku: str, supplier: str, runs: int) -> None:
+    history = audit.sku_history(sku, supplier, runs)
+    if not history:
+        print(f"No price rows for SKU {sku!r}" + (f" from {supplier}" if supplier else ""))
+        return
+    last_run = history[-1]["run_id"]
+    print(f"SKU {history[-1]['sku']} — latest run #{last_run} ({history[-1]['created']}, "
+          f"{history[-1]['source']})")
+    for row in (h for h in history if h["run_id"] == last_run):
+        print(f"\n  {row['supplier']}")
+        for key in row.keys():
+            if key not in _SKIP and key != "supplier" and row[key] not in (None, ""):
+                print(f"    {key:<14} {row[key]}")
+
+    print(f"\nHistory ({len({h['run_id'] for h in history})} runs, "
+          f"a supplier's row only when its breakdown changed):")
+    print(f"  {'run':>5}  {'date':<19}  {'supplier':<28} {'price_usd':>10} {'dp_usd':>10} "
+          f"{'margin':>7} {'price_amd':>10} {'change':>8}")
+    previous = {}
+    for h in history:
+        before = previous.get(h["supplier"])
+        if before is not None and before["id"] == h["id"]:
+            continue
+        previous[h["supplier"]] = h
+        change = "" if before is None else f"{int(h['price_amd']) - int(before['price_amd']):+d}"
+        print(f"  {h['run_id']:>5}  {h['created']:<19}  {h['supplier']:<28} "
+              f"{h['price_usd'] if h['price_usd'] is not None else '':>10} "
+              f"{h['dp_usd'] if h['dp_usd'] is not None else '':>10} "
+              f"{h['margin_pct'] if h['margin_pct'] is not None else '':>7} "
+              f"{h['price_amd']:>10} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sku", nargs="?", help="SKU to explain (case-insensitive)")
+    parser.add_argument("--supplier", default="", help="Only this supplier's rows")
+    parser.add_argument("--runs", type=int, default=0, help="Only the last N runs")
+    parser.add_argument("--product-type", help="List a product type's prices in the latest run")
+    parser.add_argument("--list-runs", action="store_true", help="List the recorded runs")
+    parser.add_argument("--db", default=PRICE_AUDIT_DB)
+    args = parser.parse_args()
+    if not os.path.exists(args.db):
+        sys.exit(f"❌  {args.db} not found — run the pipeline first")
+
+    audit = PriceAudit(args.db)
+    if args.list_runs or not (args.sku or args.product_type):
+        for run in audit.runs(args.runs):
+            print(f"#{run['run_id']:<5} {run['created']}  {run['source']:<14} "
+                  f"{run['rows']:>7} rows  cb_rate {run['cb_rate']}")
+    if args.sku:
+        print_sku(audit, args.sku, args.supplier, args.runs)
+    if args.product_type:
+        latest = audit.runs(1)
+        rows   = audit.product_type(args.product_type, latest[0]["run_id"]) if latest else []
+        rows   = [r for r in rows if not args.supplier or r["supplier"] == args.supplier]
+        for row in rows:
+            print(f"  {row['sku']:<24} {row['supplier']:<28} {row['price_amd']:>10}  "
+                      f"{row['ai_name']}")
+        print(f"{len(rows)} rows of type {args.product_type!r}")
+    audit.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+quote_service.py
+────────────────
+Local HTTP service for one-off quotes: the AMD price and ETA of a single item
+a supplier just offered, without hand-editing CSVs and running the pipeline.
+
+    /quote       supplier, brand, model, name, category, price, currency,
+                 stock, moq, source, notes  →  portal row + price breakdown
+    /normalize   brand, model, name, category  →  name, sku, category, brand
+    /health      cache size, exchange rate, request counters
+
+Parameters come from the query string (GET) or a JSON object (POST); field
+names are the raw export columns in lower case.  A quote goes through exactly
+the batch code: preprocess.process_row (supplier rewrites and filters), the
+product cache (one Gemini call on a miss, cached like a batch result),
+calculate_price_amd, get_intl_eta and _compute_intl_moq via price_row.
+
+Everything is loaded once and kept warm: supplier and brand registries,
+delivery times, the product cache (+ negative cache, + similarity index with
+--similar) and the exchange rate (re-fetched when the date changes).  Cache
+hits are answered in well under a millisecond of service time; new cache
+entries are saved at most every QUOTE_CACHE_SAVE_S seconds and on shutdown.
+
+Requests are served one at a time under a lock — quotes are rare and a miss
+is one Gemini call anyway.  There is no authentication: bind to localhost
+(the default) and let the portal server call it from the same host.
+
+Run from repo root:
+    python scripts/quote_service.py                         # 127.0.0.1:8765
+    python scripts/quote_service.py --port 9000 --gemini-backend synthetic
+
+    curl 'localhost:8765/quote?supplier=DG&brand=Kingston&model=KVR32N22S8/8&price=25.5&currency=USD'
+    curl -d '{"brand": "HP", "model": "8A5D4EA", "name": "HP EliteBook 840 G10"}' localhost:8765/normalize
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+from config import (
+    SUPPLIERS_CSV, BRANDS_CSV, PRODUCT_CACHE_CSV, GEMINI_FAILED_CSV,
+    QUOTE_SERVICE_HOST, QUOTE_SERVICE_PORT, QUOTE_CACHE_SAVE_S, SIMILARITY_THRESHOLD,
+)
+from metrics import Metrics
+import preprocess
+import ai_transform
+
+# Request field → raw export column (process_row input)
+_RAW_COLUMNS = {
+    "supplier": "Supplier", "brand": "Brand", "model": "Model", "name": "Name",
+    "category": "Category", "price": "Price", "currency": "Currency", "stock": "Stock",
+    "moq": "MOQ", "source": "Source", "notes": "Notes",
+}
+
+
+class QuoteError(Exception):
+    """Request that can't be quoted; answered with HTTP 422 and the message."""
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Engine (warm state)
+# ─────────────────────────────────────────────────────────────────────────────
+
+class QuoteEngine:
+    def __init__(self, cb_rate: float | None = None, similar: bool = False,
+                 similar_threshold: float = SIMILARITY_THRESHOLD):
+        self.fixed_rate      = cb_rate
+        self.supplier_config = preprocess.load_supplier_config(SUPPLIERS_CSV)
+        self.known_brands    = preprocess.load_brands(BRANDS_CSV)
+        self.ctx             = ai_transform.load_run_context(cb_rate)
+        self.rate_day        = date.today()
+        self.product_cache   = ai_transform.load_product_cache(PRODUCT_CACHE_CSV)
+        index = (ai_transform.load_similarity_index(self.product_cache, similar_threshold)
+                 if similar else None)
+        self.stats = ai_transform.new_run_stats(
+            Metrics("quote_service"), ai_transform.load_failed_cache(GEMINI_FAILED_CSV), index)
+        self.pre_stats = preprocess.new_stats(self.stats["metrics"])
+        self.lock      = threading.Lock()
+        self.saved_at  = time.monotonic()
+        print(f"Loaded {len(self.supplier_config)} supplier(s), {len(self.known_brands)} brand(s), "
+              f"{len(self.product_cache)} cached products")
+
+    def _refresh_rate(self) -> None:
+        if self.fixed_rate is None and self.rate_day != date.today():
+            self.ctx      = ai_transform.load_run_context()
+            self.rate_day = date.today()
+
+    def _enrich(self, inter) -> tuple[dict, bool]:
+        """AI fields for one intermediate row → (ai, from cache)."""
+        hits = self.stats["cache_hits"]
+        (ai,), _ = ai_transform.enrich_batch([inter], self.product_cache, self.stats, None)
+        cached = self.stats["cache_hits"] > hits
+        if not cached and time.monotonic() - self.saved_at > QUOTE_CACHE_SAVE_S:
+            self.save()
+        return ai, cached
+
+    def _intermediate(self, params: dict):
+        raw = {col: str(params[field]) for field, col in _RAW_COLUMNS.items() if field in params}
+        raw.setdefault("Source", "Price List")
+        raw.setdefault("Stock", "")       # unknown → estimated like a batch row, not zero stock
+        if not raw.get("Model") and not raw.get("Name"):
+            raise QuoteError("model or name is required")
+        reason = preprocess.skip_reason(raw)
+        if reason:
+            raise QuoteError(f"filtered out by the pipeline: {reason}")
+        inter = preprocess.process_row(raw, 0, self.supplier_config, self.known_brands,
+                                       self.pre_stats)
+        # Same string values as the batch path (see pipeline.py)
+        return preprocess.IntermediateRow({k: str(v) for k, v in inter.items()})
+
+    def normalize(self, params: dict) -> dict:
+        with self.lock:
+            inter = self._intermediate({**params, "price": params.get("price", "1")})
+            ai, cached = self._enrich(inter)
+            return {**{k: ai.get(k, "") for k in ("name", "sku", "category", "brand")},
+                    "cached": cached}
+
+    def quote(self, params: dict) -> dict:
+        if "price" not in params:
+            raise QuoteError("price is required")
+        with self.lock:
+            self._refresh_rate()
+            inter = self._intermediate(params)
+            ai, cached = self._enrich(inter)
+            priced = ai_transform.price_row(inter, ai, self.ctx, self.stats)
+            if priced is None:
+                raise QuoteError("price converts to 0 AMD")
+            out, dbg = priced
+            return {**out, "supplier": inter["supplier"], "cached": cached,
+                    "cb_rate": self.ctx["cb_rate"], "breakdown": dict(dbg)}
+
+    def health(self) -> dict:
+        return {"cached_products": len(self.product_cache), "cb_rate": self.ctx["cb_rate"],
+                "cache_hits": self.stats["cache_hits"], "cache_misses": self.stats["cache_misses"]}
+
+    def save(self) -> None:
+        if self.stats["seen"]:
+            ai_transform.mark_seen(self.product_cache, self.stats["seen"])
+            self.stats["seen"].clear()
+            self.stats["cache_updated"] = True
+        with_changes = self.stats["cache_updated"] or self.stats["failed_updated"]
+        if self.stats["cache_updated"]:
+            ai_transform.save_product_cache(PRODUCT_CACHE_CSV, self.product_cache)
+            self.stats["cache_updated"] = False
+        if self.stats["failed_updated"]:
+            ai_transform.save_failed_cache(GEMINI_FAILED_CSV, self.stats["failed"])
+            self.stats["failed_updated"] = False
+        if self.stats["similar"] is not None:
+            self.stats["similar"].save()
+        if with_changes:
+            print(f"Product cache saved ({len(self.product_cache)} entries)")
+        self.saved_at = time.monotonic()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# HTTP
+# ─────────────────────────────────────────────────────────────────────────────
+
+def make_handler(engine: QuoteEngine, verbose: bool = False):
+    routes = {"/quote": engine.quote, "/normalize": engine.normalize,
+              "/health": lambda params: engine.health()}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"     # keep-alive: no TCP setup per quote
+        disable_nagle_algorithm = True    # headers and body go out as separate writes
+
+        def _reply(self, status: int, body: dict) -> None:
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _handle(self, params: dict) -> None:
+            url   = urlsplit(self.path)
+            route = routes.get(url.path)
+            if route is None:
+                self._reply(404, {"error": f"unknown path {url.path}"})
+                return
+            params = {**dict(parse_qsl(url.query)), **params}
+            started = time.perf_counter()
+            try:
+                body = route(params)
+            except QuoteError as e:
+                self._reply(422, {"error": str(e)})
+                return
+            except Exception as e:
+                print(f"  ⚠  {url.path} failed: {e!r}")
+                self._reply(500, {"error": str(e)})
+                return
+            body["ms"] = round((time.perf_counter() - started) * 1000, 3)
+            self._reply(200, body)
+
+        def do_GET(self):
+            self._handle({})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                params = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError as e:
+                self._reply(400, {"error": f"invalid JSON: {e}"})
+                return
+            if not isinstance(params, dict):
+                self._reply(400, {"error": "expected a JSON object"})
+                return
+            self._handle(params)
+
+        def log_message(self, format, *args):
+            if verbose:
+                super().log_message(format, *args)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=QUOTE_SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=QUOTE_SERVICE_PORT)
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    ai_transform.add_gemini_args(parser)
+    args = parser.parse_args()
+    ai_transform.set_gemini_backend(args.gemini_backend, args.prompt_cache, args.tiered)
+
+    engine = QuoteEngine(args.cb_rate, args.similar, args.similar_threshold)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(engine, args.verbose))
+    print(f"Quote service on http://{args.host}:{args.port} (/quote, /normalize, /health)")
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))   # save the cache on `kill` too
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping")
+    finally:
+        server.server_close()
+        engine.save()
+        ai_transform.close_gemini_backend()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+seed_cache.py
+─────────────
+Seeds the product cache from the portal's own catalog, so a fresh pipeline
+environment doesn't pay Gemini to re-derive names, SKUs, brands and
+categories that are already reviewed in the portal's `products` table.
+
+Reads  : a portal products export — CSV or JSON (array, {"products": [...]}
+         or NDJSON such as output_import.ndjson.gz; .gz is read transparently),
+         columns as in shared/schema.ts (name, sku, brand, category and
+         updatedAt / updated_at if present)
+         scripts/intermediate.csv (run preprocess.py first)
+Writes : scripts/product_cache.csv
+
+Cache keys are the suppliers' raw models, which the portal doesn't have, so
+every product of intermediate.csv is matched to the portal by its SKU — the
+raw model and the BRAND-12345 form the pipeline exports, compared without
+case, spaces and punctuation — and its brand:
+  sku+brand   one portal product (or several identical ones) with that SKU
+              and brand
+  sku only    no brand match, but every portal product with that SKU agrees
+  ambiguous   portal products with that SKU disagree → left to Gemini
+When several portal rows match (one per supplier), the most recently updated
+one is used.
+
+Matches are stored with status PORTAL_SEED_STATUS — reviewed, so a cache
+snapshot merge (cache_snapshot.py) prefers them over NEW entries — and merged
+into the cache by the same rules: existing NEW entries are replaced, entries
+reviewed locally are kept unless the portal row is newer.
+
+Run from repo root:
+    python scripts/preprocess.py
+    python scripts/seed_cache.py products.csv            # report + load
+    python scripts/seed_cache.py products.json --dry-run # report only
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import os
+import re
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+from config import INTERMEDIATE_CSV, PRODUCT_CACHE_CSV, PORTAL_SEED_STATUS
+from cache_snapshot import merge_entries
+from preprocess import IntermediateRow
+from records import read_records
+import ai_transform
+
+_LOOSE_RE = re.compile(r"[^0-9a-zа-я]")
+
+
+def _loose(value: str) -> str:
+    return _LOOSE_RE.sub("", value.strip().lower())
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Portal export
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _open_text(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8-sig")
+    return open(path, newline="", encoding="utf-8-sig")
+
+
+def load_portal_products(path: str) -> list[dict]:
+    """Portal products as {name, sku, brand, category, updated} dicts."""
+    with _open_text(path) as f:
+        if ".csv" in path:
+            raw = list(csv.DictReader(f))
+        else:
+            text = f.read()
+            try:
+                data = json.loads(text)
+                raw  = data.get("products", []) if isinstance(data, dict) else data
+            except json.JSONDecodeError:        # NDJSON
+                raw = [json.loads(line) for line in text.splitlines() if line.strip()]
+    products = []
+    for p in raw:
+        sku = str(p.get("sku") or "").strip()
+        if not sku or not p.get("name"):
+            continue
+        products.append({
+            "name":     str(p["name"]).strip(),
+            "sku":      sku,
+            "brand":    str(p.get("brand") or "").strip(),
+            "category": str(p.get("category") or "").strip(),
+            "updated":  str(p.get("updatedAt") or p.get("updated_at") or "")[:19].replace(" ", "T"),
+        })
+    return products
+
+
+def index_portal(products: list[dict]) -> tuple[dict, dict]:
+    """→ ({(sku, brand): product}, {sku: [distinct products]}) on loose SKU / brand.
+
+    Of several rows with the same SKU and brand the latest updated one is kept.
+    """
+    by_sku_brand = {}
+    for p in products:
+        k = (_loose(p["sku"]), _loose(p["brand"]))
+        if k not in by_sku_brand or p["updated"] > by_sku_brand[k]["updated"]:
+            by_sku_brand[k] = p
+    by_sku = {}
+    for (sku, _), p in by_sku_brand.items():
+        by_sku.setdefault(sku, []).append(p)
+    return by_sku_brand, by_sku
+
+
+def _same_fields(products: list[dict]) -> bool:
+    return len({(p["name"], p["category"], p["brand"]) for p in products}) == 1
+
+
+def match_row(r, by_sku_brand: dict, by_sku: dict) -> tuple[str, dict | None]:
+    """→ (kind, portal product) for an intermediate row; kind is "sku+brand",
+    "sku", "ambiguous" or "unmatched"."""
+    brand = _loose(r["brand_raw"])
+    skus  = dict.fromkeys(s for s in (_loose(r["model"]),
+                                      _loose(ai_transform._normalize_sku(r["model"], r["brand_raw"])))
+                          if s)
+    for sku in skus:
+        p = by_sku_brand.get((sku, brand))
+        if p is not None:
+            return "sku+brand", p
+    for sku in skus:
+        candidates = by_sku.get(sku)
+        if candidates:
+            if _same_fields(candidates):
+                return "sku", max(candidates, key=lambda p: p["updated"])
+            return "ambiguous", None
+    return "unmatched", None
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Seeding
+# ─────────────────────────────────────────────────────────────────────────────
+
+def seed_entry(r, p: dict):
+    entry = ai_transform.new_cache_entry({"name_raw": r["name_raw"], "name": p["name"],
+                                          "sku": p["sku"], "category": p["category"],
+                                          "brand": p["brand"]})
+    entry["status"]  = PORTAL_SEED_STATUS
+    entry["updated"] = p["updated"]     # unknown → "", so re-seeding the same export is a no-op
+    return entry
+
+
+def seed(rows: list, products: list[dict], product_cache: dict) -> tuple[dict, dict]:
+    """Merge portal matches into product_cache (in place) → (counts, per-supplier counts)."""
+    by_sku_brand, by_sku = index_portal(products)
+    counts   = Counter()
+    supplier = {}
+    seen     = set()
+    for r in rows:
+        key = r["model"].strip().lower()
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        s = supplier.setdefault(r["supplier"], Counter())
+        s["products"] += 1
+        counts["products"] += 1
+        kind, p = match_row(r, by_sku_brand, by_sku)
+        counts[kind] += 1
+        if p is None:
+            continue
+        s["matched"] += 1
+        entry = seed_entry(r, p)
+        local = product_cache.get(key)
+        if local is None:
+            product_cache[key] = entry
+            counts["added"] += 1
+        else:
+            merged = merge_entries(local, entry)
+            if merged == local:
+                counts["kept"] += 1
+            else:
+                product_cache[key] = merged
+                counts["replaced"] += 1
+    return counts, supplier
+
+
+def _pct(n: int, total: int) -> str:
+    return f"{100 * n / total:.1f}%" if total else "—"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("export", help="Portal products export (.csv, .json, .ndjson, optionally .gz)")
+    parser.add_argument("--rows", default=INTERMEDIATE_CSV,
+                        help="Pipeline rows to match (intermediate.csv from preprocess.py)")
+    parser.add_argument("--dry-run", action="store_true", help="Report match rates only")
+    args = parser.parse_args()
+
+    products = load_portal_products(args.export)
+    print(f"Portal export: {len(products)} products with a SKU ({args.export})")
+    rows = read_records(args.rows, IntermediateRow)
+    product_cache = ai_transform.load_product_cache(PRODUCT_CACHE_CSV)
+    print(f"{len(rows)} rows in {args.rows}, {len(product_cache)} cached products")
+
+    counts, supplier = seed(rows, products, product_cache)
+    total = counts["products"]
+    print(f"\n{'─'*50}")
+    print(f"Pipeline products   : {total}")
+    print(f"  sku + brand match : {counts['sku+brand']:>6}  ({_pct(counts['sku+brand'], total)})")
+    print(f"  sku-only match    : {counts['sku']:>6}  ({_pct(counts['sku'], total)})")
+    print(f"  ambiguous sku     : {counts['ambiguous']:>6}  ({_pct(counts['ambiguous'], total)})")
+    print(f"  unmatched         : {counts['unmatched']:>6}  ({_pct(counts['unmatched'], total)})")
+    print("Match rate by supplier:")
+    for name, s in sorted(supplier.items(), key=lambda kv: -kv[1]["products"]):
+        print(f"  {name:<28} {s['matched']:>6} / {s['products']:<6} {_pct(s['matched'], s['products'])}")
+    print(f"Cache               : +{counts['added']} added, ~{counts['replaced']} replaced, "
+          f"{counts['kept']} kept")
+    print(f"{'─'*50}")
+
+    if args.dry_run:
+        print("Dry run — product cache not written")
+        return
+    if counts["added"] or counts["replaced"]:
+        ai_transform.save_product_cache(PRODUCT_CACHE_CSV, product_cache)
+        print(f"Product cache saved → {len(product_cache)} entries")
+
+
+if __name__ == "__main__":
+    main()
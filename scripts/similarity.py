@@ -0,0 +1,270 @@
+"""
+similarity.py
+─────────────
+Near-duplicate lookup over the product cache (ai_transform.py / pipeline.py --similar).
+
+Suppliers describe the same product in slightly different words ("Kingston
+ValueRAM 16GB DDR4 3200 DIMM" vs "KINGSTON 16GB DDR4-3200 VALUERAM DIMM") and
+sometimes with a slightly different model string ("KVR32N22S8/16" vs
+"KVR32N22S8-16"), so the exact-key product cache misses them.
+SimilarityIndex finds the closest cached product for a new row, scored by the
+Jaccard similarity of
+
+    • the words of brand + raw name (lower-cased, split on punctuation)
+    • character trigrams of the model with separators removed
+
+Candidates come from a MinHash LSH index (NUM_PERM hashes in BANDS bands of
+ROWS) and are then scored exactly over 32-bit token hashes, so a returned
+score is not an LSH estimate; LSH only decides which products get compared.
+A pair at 0.8 is a candidate ~99.5% of the time, one at 0.5 ~48%.  At most
+MAX_CANDIDATES are scored per lookup — those sharing the most bands with the
+query — so a cache full of near-identical names can't make a lookup slow.
+
+Memory: per band one sorted array of (band hash << 24 | product id) — 8 bytes
+per product and band, ~16 MB at 200k cached products — plus each product's
+token hashes in one flat array (~4 bytes per token, ~14 MB at 200k), so a
+lookup never re-tokenises a candidate.  Products added during a run go to
+small per-band dicts until the index is saved.
+
+The band and token hashes are saved next to the cache (PRODUCT_CACHE_INDEX)
+with a CRC of each product's text; on the next start only new or changed
+products are hashed ("incremental rebuild").  Deleting the file just forces a
+full rebuild.
+"""
+
+import array
+import base64
+import bisect
+import collections
+import hashlib
+import json
+import pathlib
+import re
+import struct
+import zlib
+
+NUM_PERM = 40
+BANDS    = 10
+ROWS     = NUM_PERM // BANDS
+MAX_CANDIDATES = 100                 # scored per lookup (most shared bands first)
+INDEX_VERSION  = 2
+
+_ID_BITS  = 24                       # up to 16.7M products
+_ID_MASK  = (1 << _ID_BITS) - 1
+_SIG_FMT  = f"<{NUM_PERM}I"
+_SIG_SIZE = struct.calcsize(_SIG_FMT)
+
+_WORD_RE        = re.compile(r"\w+")
+_MODEL_NOISE_RE = re.compile(r"[\W_]+")
+
+
+def shingles(brand: str, model: str, name: str) -> set[str]:
+    """Word tokens of brand + name plus "#"-prefixed trigrams of the model."""
+    tokens = set(_WORD_RE.findall(f"{brand} {name}".lower()))
+    m = _MODEL_NOISE_RE.sub("", model.lower())
+    if len(m) > 3:
+        tokens.update("#" + m[i:i + 3] for i in range(len(m) - 2))
+    elif m:
+        tokens.add("#" + m)
+    return tokens
+
+
+def token_hashes(tokens: set[str]) -> list[int]:
+    """Sorted, distinct 32-bit hashes of tokens — the compact form a product is scored by."""
+    return sorted({zlib.crc32(t.encode("utf-8")) for t in tokens})
+
+
+def band_hashes(tokens: set[str]) -> list[int]:
+    """MinHash signature of tokens folded into one 40-bit hash per band.
+
+    Each token gets NUM_PERM independent 32-bit hashes from one SHAKE-128
+    digest; the signature is their column-wise minimum.
+    """
+    if not tokens:
+        return []
+    digests = (hashlib.shake_128(t.encode("utf-8")).digest(_SIG_SIZE) for t in tokens)
+    sig = list(map(min, zip(*(struct.unpack(_SIG_FMT, d) for d in digests))))
+    bands = []
+    for j in range(BANDS):
+        packed = struct.pack(f"<B{ROWS}Q", j, *sig[j * ROWS:(j + 1) * ROWS])
+        bands.append(int.from_bytes(hashlib.blake2b(packed, digest_size=5).digest(), "little"))
+    return bands
+
+
+def entry_text(key: str, entry: dict) -> tuple[str, str, str]:
+    """(brand, model, name) of a cache entry — the raw name if it was recorded."""
+    return entry.get("brand", ""), key, entry.get("name_raw") or entry.get("name", "")
+
+
+def _text_crc(text: tuple[str, str, str]) -> int:
+    return zlib.crc32("\0".join(text).encode("utf-8"))
+
+
+class SimilarityIndex:
+    def __init__(self, product_cache: dict, path: str | None = None, threshold: float = 0.0,
+                 max_candidates: int = MAX_CANDIDATES):
+        self.cache     = product_cache
+        self.path      = path
+        self.threshold = threshold
+        self.max_candidates = max_candidates
+        self.keys    = []                     # id → cache key
+        self.ids     = {}                     # cache key → id
+        self.crcs    = array.array("I")       # id → CRC of the indexed text
+        self.tokens  = array.array("I")       # token hashes of every id, back to back
+        self.offsets = array.array("I", [0])  # id → start in tokens (id + 1 → end)
+        self._sorted = [array.array("Q") for _ in range(BANDS)]   # (band hash << 24) | id
+        self._added  = [{} for _ in range(BANDS)]                 # band hash → [ids] (this run)
+        self.changed = False
+
+    # ── Build / persist ───────────────────────────────────────────────────────
+
+    def build(self) -> int:
+        """Load saved band hashes and hash every cache entry not covered by them.
+
+        Returns the number of entries hashed.
+        """
+        if self.path and pathlib.Path(self.path).exists():
+            self._load()
+        fresh  = [[] for _ in range(BANDS)]
+        hashed = 0
+        for key, entry in self.cache.items():
+            text = entry_text(key, entry)
+            crc  = _text_crc(text)
+            i = self.ids.get(key)
+            if i is not None and self.crcs[i] == crc:
+                continue
+            tokens = shingles(*text)
+            i = self._new_id(key, crc, tokens)
+            hashed += 1
+            for j, h in enumerate(band_hashes(tokens)):
+                fresh[j].append((h << _ID_BITS) | i)
+        if hashed:
+            # Bulk merge instead of add(): no per-band dicts for a full rebuild
+            for j in range(BANDS):
+                self._sorted[j] = array.array("Q", sorted([*self._sorted[j], *fresh[j]]))
+            self.changed = True
+        return hashed
+
+    def _load(self) -> None:
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_VERSION or data.get("bands") != BANDS:
+            return      # different parameters → rebuild from scratch
+        self.keys = data["keys"]
+        self.ids  = {k: i for i, k in enumerate(self.keys)}
+        self.crcs = array.array("I", base64.b64decode(data["crc"]))
+        self.tokens  = array.array("I", base64.b64decode(data["tokens"]))
+        self.offsets = array.array("I", base64.b64decode(data["offsets"]))
+        for j, blob in enumerate(data["sorted"]):
+            self._sorted[j] = array.array("Q", base64.b64decode(blob))
+
+    def save(self) -> None:
+        """Merge this run's additions into the sorted arrays and write the index.
+
+        Products no longer in the cache (or re-hashed since) are dropped.
+        """
+        if not self.path or not self.changed:
+            return
+        live = {i for k, i in self.ids.items() if k in self.cache}
+        keys, remap = [], {}
+        for i in sorted(live):
+            remap[i] = len(keys)
+            keys.append(self.keys[i])
+        crcs = array.array("I", (self.crcs[i] for i in sorted(live)))
+        tokens, offsets = array.array("I"), array.array("I", [0])
+        for i in sorted(live):
+            tokens.extend(self.tokens[self.offsets[i]:self.offsets[i + 1]])
+            offsets.append(len(tokens))
+        blobs = []
+        for j in range(BANDS):
+            merged = [((v >> _ID_BITS) << _ID_BITS) | remap[v & _ID_MASK]
+                      for v in self._sorted[j] if (v & _ID_MASK) in live]
+            merged += [(h << _ID_BITS) | remap[i]
+                       for h, ids in self._added[j].items() for i in ids if i in live]
+            merged.sort()
+            arr = array.array("Q", merged)
+            self._sorted[j] = arr
+            self._added[j]  = {}
+            blobs.append(base64.b64encode(arr.tobytes()).decode("ascii"))
+        self.keys, self.crcs = keys, crcs
+        self.tokens, self.offsets = tokens, offsets
+        self.ids = {k: i for i, k in enumerate(keys)}
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "bands": BANDS, "keys": keys,
+                       "crc": base64.b64encode(crcs.tobytes()).decode("ascii"),
+                       "tokens": base64.b64encode(tokens.tobytes()).decode("ascii"),
+                       "offsets": base64.b64encode(offsets.tobytes()).decode("ascii"),
+                       "sorted": blobs}, f)
+        self.changed = False
+
+    # ── Updates / lookups ─────────────────────────────────────────────────────
+
+    def add(self, key: str, entry: dict) -> None:
+        """Index (or re-index) one cache entry."""
+        text = entry_text(key, entry)
+        crc  = _text_crc(text)
+        i = self.ids.get(key)
+        if i is not None and self.crcs[i] == crc:
+            return
+        tokens = shingles(*text)
+        i = self._new_id(key, crc, tokens)
+        for j, h in enumerate(band_hashes(tokens)):
+            self._added[j].setdefault(h, []).append(i)
+        self.changed = True
+
+    def _new_id(self, key: str, crc: int, tokens: set[str]) -> int:
+        # A re-indexed key gets a new id; postings of the old one go stale
+        # (they are skipped in lookup() and dropped by save()).
+        i = len(self.keys)
+        if i > _ID_MASK:
+            raise OverflowError("similarity index is full")
+        self.keys.append(key)
+        self.crcs.append(crc)
+        self.tokens.extend(token_hashes(tokens))
+        self.offsets.append(len(self.tokens))
+        self.ids[key] = i
+        return i
+
+    def _candidates(self, bands: list[int]) -> list[int]:
+        """Ids sharing a band with the query — at most max_candidates, most shared bands first.
+
+        A band bucket contributes at most max_candidates ids, so a huge bucket
+        (thousands of near-identical names) costs no more than a small one.
+        """
+        cap   = self.max_candidates
+        found = collections.Counter()
+        for j, h in enumerate(bands):
+            arr = self._sorted[j]
+            lo  = bisect.bisect_left(arr, h << _ID_BITS)
+            hi  = min(bisect.bisect_right(arr, (h << _ID_BITS) | _ID_MASK), lo + cap)
+            found.update([v & _ID_MASK for v in arr[lo:hi]])
+            found.update(self._added[j].get(h, ())[:cap])
+        if len(found) <= cap:
+            return list(found)
+        return [i for i, _ in found.most_common(cap)]
+
+    def lookup(self, brand: str, model: str, name: str,
+               threshold: float | None = None) -> tuple[str | None, float]:
+        """Closest cached product for a raw row → (cache key, Jaccard score).
+
+        Returns (None, best score) if nothing reaches threshold (default: the
+        index's threshold).
+        """
+        threshold = self.threshold if threshold is None else threshold
+        query  = shingles(brand, model, name)
+        hashes = set(token_hashes(query))
+        size   = len(hashes)
+        tokens, offsets = self.tokens, self.offsets
+        best_key, best = None, 0.0
+        for i in self._candidates(band_hashes(query)):
+            start, end = offsets[i], offsets[i + 1]
+            inter = len(hashes.intersection(tokens[start:end]))
+            score = inter / (size + end - start - inter) if inter else 0.0
+            if score > best:
+                key = self.keys[i]
+                if key not in self.cache or self.ids.get(key) != i:
+                    continue    # removed from the cache, or a stale id of a re-indexed key
+                best_key, best = key, score
+        if best < threshold:
+            return None, best
+        return best_key, best
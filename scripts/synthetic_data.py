@@ -0,0 +1,248 @@
+"""
+synthetic_data.py
+─────────────────
+Deterministic synthetic supplier data for benchmarks and load tests.
+
+Generates raw export lines in exactly the format try_parse_row() expects
+(Date, Source, Supplier, Category, Brand, Model, Name, Price, Currency, Stock,
+MOQ, Notes), reproducing each supplier's known quirks:
+
+  • DG / Compstyle LLC       — unquoted commas in Name (misaligned columns)
+  • GHz Service S.r.l.       — "150Pcs J8H61A HP LASERJET M501DN 249.00 EUR" offers, no Model
+  • ELKO Group / Siewert & Kau — tab-packed Offer names ("SKU\\tName\\tQty …")
+  • Summit Sincerity         — bare CPU strings, "AMD Ryzen … ENG BOX", Crucial "Moq 200pcs"
+  • BitSet                   — real SKU only in Notes ("SKU: G27C4 E3 | Features: …")
+  • numeric and Excel-scientific models ("81234567", "1.96E+11")
+  • a sprinkling of separator, zero-stock, refurb and blocked-brand rows
+
+Every catalog product carries a random variant code in its model
+("KVR32N22S8/16-3F2A1"), so almost every (supplier, model) pair is distinct,
+as in a real export — the same model under one supplier would be priced
+into a single product ID and the rest written off as duplicates.
+
+The same seed always yields the same rows.
+
+Usage:
+    python scripts/synthetic_data.py 100000 raw_synthetic.csv [--seed 42]
+"""
+
+import argparse
+import random
+
+RAW_HEADER = "Date,Source,Supplier,Category,Brand,Model,Name,Price,Currency,Stock,MOQ,Notes"
+
+_DATE = "2026-03-07"
+
+_RAM    = [("Kingston", "KVR32N22S8/{n}", "Kingston ValueRAM {n}GB DDR4 3200 DIMM"),
+           ("Kingston", "KSM48E40BD8KM-{n}HM", "Kingston Server Premier {n}GB DDR5 4800 ECC"),
+           ("Crucial", "CT{n}G4SFRA32A", "Crucial {n}GB DDR4 3200 SODIMM")]
+_SSD    = [("Samsung", "MZ-77E{n}B/EU", "Samsung 870 EVO {n}GB 2.5 SATA III"),
+           ("Western Digital", "WDS{n}G2X0E", "WD Black SN770 {n}GB NVMe M.2"),
+           ("Crucial", "CT{n}P310SSD8", "Crucial P310 {n}GB PCIe Gen4 NVMe 2280")]
+_LAPTOP = [("HP", "8A5D{n}EA", "HP EliteBook 840 G10 14 FHD i5-1335U 16GB 512GB"),
+           ("Lenovo", "21K{n}00AB", "Lenovo ThinkPad T14 Gen 4 14 WUXGA Ryzen 7 16GB"),
+           ("Dell", "N{n}L5440", "Dell Latitude 5440 14 FHD i7-1355U 16GB 512GB")]
+_MONITOR = [("Dell", "U27{n}QE", "Dell UltraSharp 27 4K IPS USB-C"),
+            ("Samsung", "LS24C{n}GAEXEN", "Samsung 24 IPS FHD 75Hz"),
+            ("Gigabyte", "G27C{n}", "Gigabyte 27 curved gaming 165Hz")]
+_PRINTER = [("HP", "J8H{n}A", "HP LASERJET M501DN"),
+            ("Kyocera", "1102Z{n}NL0", "KYOCERA ECOSYS MA5500IFX"),
+            ("Canon", "{n}C002", "Canon i-SENSYS MF455dw")]
+_FAMILIES = [("RAM", _RAM), ("SSD", _SSD), ("Laptops", _LAPTOP),
+             ("Monitors", _MONITOR), ("Printers", _PRINTER)]
+
+_SIZES = [4, 8, 16, 32, 64, 250, 500, 1000, 2000]
+
+_VARIANTS = 1 << 20                  # variant codes per model template and size
+
+_INTL_PLAIN = ["Proks SIA", "HubX", "Phonix", "Imcopex", "NX Electronics Ltd (Nextron)"]
+
+# Relative frequency of each row generator (roughly the mix of a real export)
+_WEIGHTS = {
+    "local_misaligned": 20, "intl_plain": 30, "ghz_offer": 8, "elko_offer": 8,
+    "elko_price_list": 4, "siewert_offer": 6, "summit": 6, "bitset": 6,
+    "numeric_model": 5, "noise": 7,
+}
+
+
+def _csv_field(value: str) -> str:
+    """Quote a field the way a spreadsheet export would (only when needed)."""
+    if any(c in value for c in ',"\n'):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def _line(source, supplier, category, brand, model, name, price, currency,
+          stock, moq="", notes="", quote_name=True) -> str:
+    fields = [_DATE, source, supplier, category, brand, model,
+              _csv_field(name) if quote_name else name,
+              price, currency, str(stock), str(moq), _csv_field(notes)]
+    return ",".join(fields)
+
+
+def _product(rng: random.Random):
+    category, family = rng.choice(_FAMILIES)
+    brand, model_fmt, name_fmt = rng.choice(family)
+    n = rng.choice(_SIZES) * rng.randint(1, 9)
+    model = f"{model_fmt.format(n=n)}-{rng.randrange(_VARIANTS):05X}"
+    return category, brand, model, name_fmt.format(n=n)
+
+
+def _price(rng: random.Random, lo=5.0, hi=3000.0) -> str:
+    return f"{rng.uniform(lo, hi):.2f}"
+
+
+# ── Row generators ───────────────────────────────────────────────────────────
+
+def _local_misaligned(rng):
+    # DG / Compstyle leave commas in Name unquoted → extra columns
+    category, brand, model, name = _product(rng)
+    supplier, currency, price = rng.choice([
+        ("DG", "USD", _price(rng)),
+        ("Compstyle LLC", "AMD", str(rng.randint(3_000, 900_000))),
+    ])
+    name = name.replace(" ", ", ", rng.randint(1, 3))
+    return _line("Price List", supplier, category, brand, model, name, price, currency,
+                 rng.randint(1, 50), "NO", quote_name=False)
+
+
+def _intl_plain(rng):
+    category, brand, model, name = _product(rng)
+    stock = rng.choice([str(rng.randint(1, 500)), "> 30", ""])
+    return _line("Price List", rng.choice(_INTL_PLAIN), category, brand, model, name,
+                 _price(rng), "USD", stock, rng.choice(["", "1", "5", "NO"]))
+
+
+def _ghz_offer(rng):
+    _, brand, model, name = _product(rng)
+    qty = rng.randint(5, 300)
+    pcs = rng.choice(["Pcs", "PCS", "pcs", "Pc"])
+    price = _price(rng, 20, 2000)
+    if rng.random() < 0.2:
+        offer = f"{qty}{pcs} {name} P/N : {model} {price} EUR"
+    else:
+        offer = f"{qty}{pcs} {model} {name.upper()} {price} EUR"
+    return _line("Offer", "GHz Service S.r.l.", "", "", "", offer, price, "USD", qty)
+
+
+def _elko_offer(rng):
+    _, _, model, name = _product(rng)
+    qty = rng.randint(1, 200)
+    if rng.random() < 0.5:
+        packed = f"{model}\t{name}\t{qty} 1-3 weeks"            # pattern A: SKU first
+    else:
+        packed = f"{name} ({model}#B19)\t{model}#B19\t{qty} 3-4 weeks"  # pattern B
+    return _line("Offer", "ELKO Group", "", "", "", packed, _price(rng), "USD", "")
+
+
+def _elko_price_list(rng):
+    category, brand, model, name = _product(rng)
+    if rng.random() < 0.15:
+        name += " GRADE A REFURB."
+    return _line("Price List", "ELKO Group", category, brand, model, name,
+                 _price(rng), "USD", rng.randint(1, 80))
+
+
+def _siewert_offer(rng):
+    _, _, model, name = _product(rng)
+    return _line("Offer", "Siewert & Kau", "", "", "", f"{model}\t{name}\t{rng.randint(1, 100)}",
+                 _price(rng), "USD", rng.randint(1, 100))
+
+
+def _summit(rng):
+    cpu = rng.choice(["9850x3d", "9950X3D", "9700x", "7800X3D"])
+    name = rng.choice([
+        f"AMD Ryzen {cpu} {rng.choice(['ENG', 'CN'])} BOX",
+        f"AMD Ryzen Tray {cpu.upper()}",
+        f"CT{rng.choice([500, 1000, 2000, 4000])}P310SSD8 P310 PCIe Gen4 NVMe 2280 M.2 Moq {rng.choice([10, 200])}pcs",
+        rng.choice(["14900KF", "14700F tray", "Ultra 245 Tray", "13400F"]),
+        "AMD GPU Radeon Offer : (Min order MOQ 10pcs) Powercolor RX9070XT 16G-A -",
+    ])
+    return _line("Offer", "Summit Sincerity Global LTD", "", "", "", name,
+                 _price(rng, 80, 900), "USD", "")
+
+
+def _bitset(rng):
+    category, brand, model, name = _product(rng)
+    notes = f"SKU: {model} | Features: {name}" if rng.random() < 0.85 else "Features: n/a"
+    return _line("Price List", "BitSet", category, brand, f"BS{rng.randint(10000, 99999)}", name,
+                 _price(rng), "USD", rng.randint(1, 40), "", notes)
+
+
+def _numeric_model(rng):
+    category, brand, _, name = _product(rng)
+    model = rng.choice([str(rng.randint(10_000_000, 99_999_999)),
+                        f"{rng.randint(100, 999) / 100:.2f}E+11"])
+    return _line("Price List", rng.choice(_INTL_PLAIN), category, brand, model, name,
+                 _price(rng), "USD", rng.randint(1, 100))
+
+
+def _noise(rng):
+    category, brand, model, name = _product(rng)
+    kind = rng.randrange(5)
+    if kind == 0:   # category separator
+        return _line("Price List", "Proks SIA", category, "", "PN", category.upper(), "0", "USD", "")
+    if kind == 1:   # zero stock
+        return _line("Price List", "Proks SIA", category, brand, model, name, _price(rng), "USD", 0)
+    if kind == 2:   # blocked brand
+        return _line("Price List", "Phonix", "Toys", "LEGO", model, "LEGO set", _price(rng), "USD", 5)
+    if kind == 3:   # refurb
+        return _line("Price List", "HubX", category, brand, model, name + " Grade B",
+                     _price(rng), "USD", 5)
+    return "garbage,line,without,currency"   # unparseable
+
+
+_GENERATORS = {
+    "local_misaligned": _local_misaligned, "intl_plain": _intl_plain,
+    "ghz_offer": _ghz_offer, "elko_offer": _elko_offer, "elko_price_list": _elko_price_list,
+    "siewert_offer": _siewert_offer, "summit": _summit, "bitset": _bitset,
+    "numeric_model": _numeric_model, "noise": _noise,
+}
+
+
+def generate_raw_lines(n: int, seed: int = 42):
+    """Yield n raw export lines (without header)."""
+    rng   = random.Random(seed)
+    kinds = list(_WEIGHTS)
+    gens  = [_GENERATORS[k] for k in kinds]
+    weights = [_WEIGHTS[k] for k in kinds]
+    for _ in range(n):
+        yield rng.choices(gens, weights)[0](rng)
+
+
+def generate_offer_names(n: int, seed: int = 42) -> list[str]:
+    """GHz-style offer names for extract_sku_from_offer_name()."""
+    rng = random.Random(seed)
+    names = []
+    for _ in range(n):
+        _, _, model, name = _product(rng)
+        qty, price = rng.randint(5, 300), _price(rng, 20, 2000)
+        names.append(rng.choice([
+            f"{qty}Pcs {model} {name.upper()} {price} EUR",
+            f"{qty}PCS {name} P/N : {model} {price} EUR",
+            f"{qty}pcs {name.upper()} {model} {price} USD",
+            f"{qty}Pc {name.upper()} {price} EUR",
+        ]))
+    return names
+
+
+def write_raw_export(path: str, n: int, seed: int = 42) -> None:
+    """Write a complete raw_product_export_data.csv-style file with n data rows."""
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        f.write(RAW_HEADER + "\n")
+        for line in generate_raw_lines(n, seed):
+            f.write(line + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("rows", type=int, help="Number of data rows")
+    parser.add_argument("path", help="Output CSV path")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    write_raw_export(args.path, args.rows, args.seed)
+    print(f"Wrote {args.rows} synthetic rows → {args.path}")
+
+
+if __name__ == "__main__":
+    main()
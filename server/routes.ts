@@ -6,6 +6,7 @@ import bcrypt from "bcryptjs";
 import multer from "multer";
 import path from "path";
 import fs from "fs";
+import crypto from "crypto";
 import express from "express";
 import {
   insertBusinessRegistrationSchema,
@@ -402,13 +403,14 @@ export async function registerRoutes(app: Express): Promise<Server> {
       // Delete all existing products to ensure catalog has exactly these products
       await storage.deleteAllProducts();
 
-      // Create each product (no upsert needed since we cleared everything)
+      // Create each product (table was cleared, so upsert always inserts)
       const importedProducts = await Promise.all(
         products.map(async (productData: any) => {
-          // Remove id field to let database generate new IDs, or preserve it if provided
+          // Preserve the id if provided (pipeline IDs are stable per supplier + SKU),
+          // otherwise let the database generate a new one
           const { id, ...dataWithoutId } = productData;
           const validatedData = insertProductSchema.parse(dataWithoutId);
-          return await storage.createProduct(validatedData);
+          return await storage.upsertProduct({ ...validatedData, id: id || undefined });
         })
       );
 
@@ -423,6 +425,151 @@ export async function registerRoutes(app: Express): Promise<Server> {
     }
   });
 
+  // Chunked, resumable catalog import used by scripts/portal_upload.py.
+  // A session is opened once, chunks are posted with a sequence number (re-posting an
+  // already applied chunk is a no-op, so the uploader can retry freely), and completing
+  // the session removes every product the upload did not touch.
+  // Sessions live in memory — after a server restart the uploader starts a new one.
+  // A completed session keeps its result, so a retried complete gets the same answer.
+  const importSessions = new Map<string, {
+    startedAt: Date; nextSeq: number; received: number; result?: Record<string, unknown>;
+  }>();
+
+  app.post("/api/products/import-sessions", isAdmin, async (req, res) => {
+    const token = crypto.randomBytes(16).toString("hex");
+    importSessions.set(token, { startedAt: new Date(), nextSeq: 0, received: 0 });
+    res.json({ token, nextSeq: 0 });
+  });
+
+  app.get("/api/products/import-sessions/:token", isAdmin, async (req, res) => {
+    const session = importSessions.get(req.params.token);
+    if (!session) {
+      return res.status(404).json({ message: "Import session not found" });
+    }
+    res.json({ token: req.params.token, nextSeq: session.nextSeq, received: session.received });
+  });
+
+  app.post("/api/products/import-sessions/:token/chunks", isAdmin, async (req, res) => {
+    try {
+      const session = importSessions.get(req.params.token);
+      if (!session) {
+        return res.status(404).json({ message: "Import session not found" });
+      }
+
+      if (session.result) {
+        return res.status(409).json({ message: "Import session already completed" });
+      }
+
+      const { seq, products } = req.body;
+      if (typeof seq !== "number" || !Array.isArray(products)) {
+        return res.status(400).json({ message: "seq must be a number and products an array" });
+      }
+      if (seq < session.nextSeq) {
+        // Already applied (retry after a lost response)
+        return res.json({ nextSeq: session.nextSeq, received: session.received });
+      }
+      if (seq > session.nextSeq) {
+        return res.status(409).json({ message: "Chunk out of order", nextSeq: session.nextSeq });
+      }
+
+      await Promise.all(
+        products.map(async (productData: any) => {
+          const { id, ...dataWithoutId } = productData;
+          const validatedData = insertProductSchema.parse(dataWithoutId);
+          return await storage.upsertProduct({ ...validatedData, id: id || undefined });
+        })
+      );
+
+      session.nextSeq = seq + 1;
+      session.received += products.length;
+      res.json({ nextSeq: session.nextSeq, received: session.received });
+    } catch (error: any) {
+      console.error("Import chunk error:", error);
+      res.status(400).json({ message: error.message || "Failed to import chunk" });
+    }
+  });
+
+  app.post("/api/products/import-sessions/:token/complete", isAdmin, async (req, res) => {
+    try {
+      const session = importSessions.get(req.params.token);
+      if (!session) {
+        return res.status(404).json({ message: "Import session not found" });
+      }
+      if (session.result) {
+        return res.json(session.result);
+      }
+
+      // Only a complete upload may prune the catalog: an empty or cut-short one would
+      // otherwise delete every product it didn't get to
+      const { expectedCount, expectedChunks } = req.body;
+      if (typeof expectedCount !== "number" || typeof expectedChunks !== "number" || expectedCount < 1) {
+        return res.status(400).json({ message: "expectedCount (≥ 1) and expectedChunks must be numbers" });
+      }
+      if (session.received !== expectedCount || session.nextSeq !== expectedChunks) {
+        return res.status(409).json({
+          message: `Upload incomplete: ${session.received} of ${expectedCount} products, ` +
+            `${session.nextSeq} of ${expectedChunks} chunks received`,
+          received: session.received,
+          nextSeq: session.nextSeq,
+        });
+      }
+
+      // Everything not upserted during this session is no longer in the catalog
+      const removed = await storage.deleteProductsUpdatedBefore(session.startedAt);
+      session.result = {
+        message: `Successfully imported ${session.received} products (${removed} removed)`,
+        count: session.received,
+        removed,
+      };
+
+      res.json(session.result);
+    } catch (error: any) {
+      console.error("Import complete error:", error);
+      res.status(500).json({ message: error.message || "Failed to complete import" });
+    }
+  });
+
+  // Apply a catalog delta produced by scripts/ai_transform.py (output_delta.json):
+  // { added: Product[], changed: Partial<Product>[] (id + changed fields), removed: id[] }
+  app.post("/api/products/delta-import", isAdmin, async (req, res) => {
+    try {
+      const { added = [], changed = [], removed = [] } = req.body;
+
+      if (!Array.isArray(added) || !Array.isArray(changed) || !Array.isArray(removed)) {
+        return res.status(400).json({ message: "added, changed and removed must be arrays" });
+      }
+
+      // Validate every row first, then apply the whole delta in one transaction:
+      // a bad row or a failed statement leaves the catalog exactly as it was
+      const partialProductSchema = insertProductSchema.partial();
+      const addedRows = added.map((productData: any) => {
+        const { id, ...dataWithoutId } = productData;
+        if (!id) throw new Error("Added products must have an id");
+        return { id: String(id), data: insertProductSchema.parse(dataWithoutId) };
+      });
+      const changedRows = changed.map((productData: any) => {
+        const { id, ...fields } = productData;
+        if (!id) throw new Error("Changed products must have an id");
+        return { id: String(id), data: partialProductSchema.parse(fields) };
+      });
+      if (!removed.every((id: unknown) => typeof id === "string" && id)) {
+        throw new Error("Removed entries must be product ids");
+      }
+
+      await storage.applyProductDelta(addedRows, changedRows, removed);
+
+      res.json({
+        message: `Catalog delta applied: ${added.length} added, ${changed.length} changed, ${removed.length} removed`,
+        added: added.length,
+        changed: changed.length,
+        removed: removed.length,
+      });
+    } catch (error: any) {
+      console.error("Delta import error:", error);
+      res.status(400).json({ message: error.message || "Failed to apply catalog delta" });
+    }
+  });
+
   // Order routes
   app.get("/api/orders", isAuthenticated, async (req, res) => {
     try {
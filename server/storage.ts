@@ -28,7 +28,7 @@ import {
   type SharedCart,
 } from "@shared/schema";
 import { db } from "./db";
-import { eq, desc, sql, and, gt } from "drizzle-orm";
+import { eq, desc, sql, and, gt, lt, or, isNull, inArray } from "drizzle-orm";
 import bcrypt from "bcryptjs";
 import crypto from "crypto";
 
@@ -56,7 +56,13 @@ export interface IStorage {
   updateProduct(id: string, product: Partial<InsertProduct>): Promise<Product>;
   deleteProduct(id: string): Promise<void>;
   deleteAllProducts(): Promise<void>; // Delete all products
+  deleteProductsUpdatedBefore(date: Date): Promise<number>; // Delete products not touched since date
   upsertProduct(product: InsertProduct & { id?: string }): Promise<Product>; // Create or update by ID
+  applyProductDelta( // Upsert added, update changed, delete removed — all or nothing
+    added: { id: string; data: InsertProduct }[],
+    changed: { id: string; data: Partial<InsertProduct> }[],
+    removed: string[],
+  ): Promise<void>;
 
   // Order operations
   createOrder(order: InsertOrder): Promise<Order>;
@@ -281,13 +287,21 @@ export class DatabaseStorage implements IStorage {
     await db.delete(products);
   }
 
+  async deleteProductsUpdatedBefore(date: Date): Promise<number> {
+    const deleted = await db
+      .delete(products)
+      .where(or(isNull(products.updatedAt), lt(products.updatedAt, date)))
+      .returning({ id: products.id });
+    return deleted.length;
+  }
+
   async upsertProduct(product: InsertProduct & { id?: string }): Promise<Product> {
     if (product.id) {
       // Use ON CONFLICT for true upsert — 1 query instead of SELECT + UPDATE/INSERT
       const { id, ...data } = product;
       const [result] = await db
         .insert(products)
-        .values({ ...data, id })
+        .values({ ...data, id, updatedAt: new Date() })
         .onConflictDoUpdate({
           target: products.id,
           set: { ...data, updatedAt: new Date() },
@@ -298,10 +312,32 @@ export class DatabaseStorage implements IStorage {
 
     // No ID provided — always insert new
     const { id, ...dataToInsert } = product;
-    const [newProduct] = await db.insert(products).values(dataToInsert).returning();
+    const [newProduct] = await db.insert(products).values({ ...dataToInsert, updatedAt: new Date() }).returning();
     return newProduct;
   }
 
+  async applyProductDelta(
+    added: { id: string; data: InsertProduct }[],
+    changed: { id: string; data: Partial<InsertProduct> }[],
+    removed: string[],
+  ): Promise<void> {
+    await db.transaction(async (tx) => {
+      const now = new Date();
+      for (const { id, data } of added) {
+        await tx
+          .insert(products)
+          .values({ ...data, id, updatedAt: now })
+          .onConflictDoUpdate({ target: products.id, set: { ...data, updatedAt: now } });
+      }
+      for (const { id, data } of changed) {
+        await tx.update(products).set({ ...data, updatedAt: now }).where(eq(products.id, id));
+      }
+      if (removed.length > 0) {
+        await tx.delete(products).where(inArray(products.id, removed));
+      }
+    });
+  }
+
   // Order operations
   async createOrder(data: InsertOrder): Promise<Order> {
     // Generate order number based on date, sequence, and total